@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from eventos.models import Evento
+from panel.cache_reportes import invalidar, EVENTOS
+
+
+class Command(BaseCommand):
+    help = "Recalcula desde cero los totales desnormalizados (bruto, neto, ventas, unidades) de los eventos."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--evento', type=int, help="ID de un evento puntual (por defecto, todos)")
+
+    def handle(self, *args, **options):
+        eventos = Evento.objects.all()
+        if options['evento']:
+            eventos = eventos.filter(pk=options['evento'])
+            if not eventos.exists():
+                raise CommandError(f"No existe el evento {options['evento']}")
+
+        total = 0
+        for evento in eventos.iterator():
+            evento.actualizar_recaudacion()
+            total += 1
+        invalidar(EVENTOS)
+        self.stdout.write(self.style.SUCCESS(f"Totales recalculados para {total} evento(s)."))
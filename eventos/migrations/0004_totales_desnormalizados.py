@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:27
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import F, Sum, Count, DecimalField, ExpressionWrapper
+
+
+def recalcular_totales(apps, schema_editor):
+    Evento = apps.get_model('eventos', 'Evento')
+    Venta = apps.get_model('ventas', 'Venta')
+    importe = DecimalField(max_digits=12, decimal_places=2)
+    totales = Venta.objects.filter(evento__isnull=False).values('evento').annotate(
+        bruto=Sum(ExpressionWrapper(F('cantidad') * F('precio_unitario_venta'), output_field=importe)),
+        neto=Sum(ExpressionWrapper(
+            F('cantidad') * (F('precio_unitario_venta') - F('precio_unitario_compra')), output_field=importe
+        )),
+        ventas=Count('id'),
+        unidades=Sum('cantidad'),
+    )
+    for t in totales:
+        Evento.objects.filter(pk=t['evento']).update(
+            total_bruto=t['bruto'] or Decimal('0.00'),
+            recaudacion_total=t['neto'] or Decimal('0.00'),
+            cantidad_ventas=t['ventas'],
+            unidades_vendidas=t['unidades'] or 0,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0003_alter_evento_id'),
+        ('ventas', '0004_alter_producto_options_remove_venta_precio_compra_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='evento',
+            name='cantidad_ventas',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='evento',
+            name='total_bruto',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text='Total bruto de las ventas del evento', max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='evento',
+            name='unidades_vendidas',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='evento',
+            name='recaudacion_total',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text='Ganancia neta de las ventas del evento', max_digits=12),
+        ),
+        migrations.RunPython(recalcular_totales, migrations.RunPython.noop),
+    ]
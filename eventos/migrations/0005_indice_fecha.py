@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cargos', '0002_initial'),
+        ('eventos', '0004_totales_desnormalizados'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='evento',
+            index=models.Index(fields=['fecha'], name='evento_fecha_idx'),
+        ),
+    ]
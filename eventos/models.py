@@ -1,4 +1,7 @@
+from decimal import Decimal
 from django.db import models
+from django.db.models import F
+from django.utils import timezone
 from cargos.models import Gestion
 
 class Evento(models.Model):
@@ -8,12 +11,50 @@ class Evento(models.Model):
     fecha = models.DateField()
     lugar = models.CharField(max_length=100, blank=True)
     gestion = models.ForeignKey(Gestion, on_delete=models.CASCADE, related_name="eventos")
-    recaudacion_total = models.FloatField(default=0.0)
+
+    # ----- totales desnormalizados (se mantienen por diferencia desde las signals de Venta) -----
+    recaudacion_total = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'), help_text="Ganancia neta de las ventas del evento")
+    total_bruto = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'), help_text="Total bruto de las ventas del evento")
+    cantidad_ventas = models.PositiveIntegerField(default=0)
+    unidades_vendidas = models.PositiveIntegerField(default=0)
+    # Cambia con cada escritura del evento o de sus ventas: es la versión de sus datos (panel.artefactos)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Calendario y listados: rangos de fechas y próximo evento
+            models.Index(fields=['fecha'], name='evento_fecha_idx'),
+        ]
+
+    @classmethod
+    def aplicar_delta(cls, evento_id, bruto=Decimal('0.00'), neto=Decimal('0.00'), ventas=0, unidades=0):
+        """
+        Suma (o resta, con valores negativos) una diferencia a los totales del evento
+        con un único UPDATE, sin recorrer las ventas existentes. Se llama en cada
+        escritura de sus ventas, también con diferencia cero: avanza fecha_actualizacion.
+        """
+        if evento_id is None:
+            return
+        cls.objects.filter(pk=evento_id).update(
+            fecha_actualizacion=timezone.now(),
+            total_bruto=F('total_bruto') + bruto,
+            recaudacion_total=F('recaudacion_total') + neto,
+            cantidad_ventas=F('cantidad_ventas') + ventas,
+            unidades_vendidas=F('unidades_vendidas') + unidades,
+        )
 
     def actualizar_recaudacion(self):
-        total_ganancia = sum(venta.ganancia() for venta in self.ventas.all())
-        self.recaudacion_total = total_ganancia
-        self.save(update_fields=["recaudacion_total"])
+        """Recalcula desde cero los totales del evento a partir de sus ventas."""
+        from ventas.reportes import totales_ventas  # import diferido: ventas depende de eventos
+
+        totales = totales_ventas(self.venta_set.all())
+        self.total_bruto = Decimal(totales['bruto'] or 0).quantize(Decimal('0.01'))
+        self.recaudacion_total = Decimal(totales['neto'] or 0).quantize(Decimal('0.01'))
+        self.cantidad_ventas = totales['ventas']
+        self.unidades_vendidas = totales['unidades']
+        self.save(update_fields=[
+            "total_bruto", "recaudacion_total", "cantidad_ventas", "unidades_vendidas", "fecha_actualizacion",
+        ])
 
     def __str__(self):
         return self.nombre
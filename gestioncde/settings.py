@@ -47,6 +47,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'panel.instrumentacion.InstrumentacionSQLMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -82,6 +83,15 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Varias terminales vendiendo a la vez: WAL permite leer mientras otro escribe,
+        # las transacciones toman el lock de escritura al empezar (BEGIN IMMEDIATE, así
+        # una lectura dentro de la transacción no queda vieja) y quien encuentra la base
+        # ocupada espera hasta `timeout` segundos en lugar de fallar en el acto.
+        'OPTIONS': {
+            'timeout': 5,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL',
+        },
     }
 }
 
@@ -135,5 +145,44 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # AUTH
 AUTH_USER_MODEL = 'usuarios.Usuario'
 
+# Cache de reportes (panel.cache_reportes). Los contadores que la invalidan están en la base, así
+# que cualquier backend es correcto; uno compartido entre procesos (por defecto, en archivos) evita
+# que cada worker recalcule los mismos reportes. Se cambia con CACHE_BACKEND y CACHE_LOCATION.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', str(BASE_DIR / 'cache')),
+    }
+}
+
+# Instrumentación SQL: fracción de peticiones medidas (0 = desactivada, 1 = todas)
+INSTRUMENTACION_SQL_MUESTREO = float(os.environ.get('INSTRUMENTACION_SQL_MUESTREO', '0'))
+INSTRUMENTACION_SQL_UMBRAL_REPETICIONES = 5
+
+# Servido con ASGI (p. ej. `uvicorn gestioncde.asgi:application`), VISTAS_ASYNC=1 usa las
+# versiones async del dashboard y de tesorería, que ejecutan sus consultas independientes a la vez,
+# y las del feed de stock: el stream SSE sólo se sirve así (con WSGI las terminales hacen long-poll)
+VISTAS_ASYNC = os.environ.get('VISTAS_ASYNC', '0') == '1'
+CONSULTAS_CONCURRENTES = True
+
+# Archivos generados por los trabajos en segundo plano (panel.trabajos, `manage.py procesar_trabajos`)
+TRABAJOS_DIR = Path(os.environ.get('TRABAJOS_DIR', BASE_DIR / 'trabajos'))
+
+# Cache en disco de las exportaciones (panel.artefactos): tamaño total máximo y antigüedad máxima
+ARTEFACTOS_DIR = Path(os.environ.get('ARTEFACTOS_DIR', BASE_DIR / 'artefactos'))
+ARTEFACTOS_TAMANIO_MAXIMO = int(os.environ.get('ARTEFACTOS_TAMANIO_MAXIMO', 512 * 1024 * 1024))
+ARTEFACTOS_DIAS = int(os.environ.get('ARTEFACTOS_DIAS', 30))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'panel.sql': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
 LOGIN_REDIRECT_URL = '/eventos/'
 LOGOUT_REDIRECT_URL = '/accounts/login/'
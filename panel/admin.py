@@ -3,7 +3,8 @@ from usuarios.models import Usuario
 from cargos.models import Cargo, Gestion, MiembroGestion
 from eventos.models import Evento
 from tesoreria.models import Movimiento
-from ventas.models import Producto, Venta
+from ventas.models import Producto, Venta, Ticket
+from panel import busqueda
 
 # =====================================
 # 🧍 USUARIOS
@@ -53,7 +54,7 @@ class MiembroGestionAdmin(admin.ModelAdmin):
 # =====================================
 @admin.register(Evento)
 class EventoAdmin(admin.ModelAdmin):
-    list_display = ("nombre", "fecha", "lugar", "gestion", "recaudacion_total")
+    list_display = ("nombre", "fecha", "lugar", "gestion", "cantidad_ventas", "total_bruto", "recaudacion_total")
     search_fields = ("nombre", "descripcion", "lugar")
     list_filter = ("gestion__nombre", "fecha")
     ordering = ("-fecha",)
@@ -68,9 +69,14 @@ class MovimientoAdmin(admin.ModelAdmin):
     list_display = ("tipo", "descripcion", "monto", "fecha", "evento")
     list_filter = ("tipo", "evento__nombre")
     search_fields = ("descripcion",)
+    raw_id_fields = ("venta",)
     ordering = ("-fecha",)
     date_hierarchy = "fecha"
 
+    def get_search_results(self, request, queryset, search_term):
+        # Índice de texto completo en lugar de LIKE '%...%' sobre todas las descripciones
+        return busqueda.filtrar_por_texto(queryset, busqueda.MOVIMIENTOS, search_term), False
+
 
 # =====================================
 # 🛒 VENTAS
@@ -82,6 +88,16 @@ class ProductoAdmin(admin.ModelAdmin):
     list_filter = ("stock",)
     ordering = ("nombre",)
 
+    def get_search_results(self, request, queryset, search_term):
+        return busqueda.filtrar_por_texto(queryset, busqueda.PRODUCTOS, search_term), False
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            # Sólo los campos del formulario que cambiaron: no se pisan stock ni contadores de ventas concurrentes
+            obj.guardar_campos(form.changed_data)
+        else:
+            super().save_model(request, obj, form, change)
+
 
 @admin.register(Venta)
 class VentaAdmin(admin.ModelAdmin):
@@ -90,8 +106,28 @@ class VentaAdmin(admin.ModelAdmin):
     date_hierarchy = "fecha_hora"
     search_fields = ("producto__nombre",)
 
+    def get_search_results(self, request, queryset, search_term):
+        return busqueda.filtrar_por_texto(queryset, busqueda.PRODUCTOS, search_term, "producto_id"), False
+
     def total_display(self, obj):
         return f"${obj.total():.2f}"
     total_display.short_description = "Total"
 
     ordering = ("-fecha_hora",)
+
+
+class VentaInline(admin.TabularInline):
+    model = Venta
+    fields = ("producto", "cantidad", "precio_unitario_venta")
+    readonly_fields = ("producto", "cantidad", "precio_unitario_venta")
+    extra = 0
+    can_delete = False
+
+
+@admin.register(Ticket)
+class TicketAdmin(admin.ModelAdmin):
+    list_display = ("id", "fecha_hora", "evento", "medio_de_pago", "total")
+    list_filter = ("medio_de_pago", "evento__nombre")
+    date_hierarchy = "fecha_hora"
+    inlines = (VentaInline,)
+    ordering = ("-fecha_hora",)
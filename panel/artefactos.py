@@ -0,0 +1,201 @@
+"""
+Cache en disco de las exportaciones XLSX (historial de ventas y detalle de evento).
+
+Cada archivo se guarda bajo una clave derivada de (tipo de reporte, parámetros,
+versión de los datos). La versión sale de marcas que la base ya mantiene:
+- de un evento, su fecha_actualizacion (avanza con cada escritura del evento o de
+  sus ventas) y la del último producto modificado (los nombres van en la planilla);
+- del historial sin evento, la versión del feed de stock (avanza con cada escritura
+  de ventas y con cada alta, modificación o baja de productos; nunca retrocede) y la
+  de los eventos.
+Mientras no cambien, descargar otra vez la planilla de un evento cerrado es leer un
+archivo; si no está, la genera el worker de trabajos (panel.tareas). Se sirven con ETag (If-None-Match del mismo artefacto -> 304) y se
+desalojan por antigüedad y por tamaño total, primero los usados hace más tiempo.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from django.conf import settings
+from django.db.models import Count, Max
+from django.http import FileResponse, JsonResponse
+from django.utils.cache import get_conditional_response
+from eventos.models import Evento
+from ventas.models import Producto
+from ventas.stock import version_actual
+from panel.exportaciones import CONTENT_TYPE_XLSX
+from panel.filtros import filtros_de
+from panel.trabajos import es_ajax, respuesta_trabajo
+
+# Parámetros del querystring que no cambian el contenido de una exportación
+PARAMETROS_IGNORADOS = ('despues', 'antes', 'page')
+
+# Un temporal más viejo que esto quedó de una generación interrumpida
+ANTIGUEDAD_TEMPORALES = 60 * 60
+
+
+def directorio():
+    return Path(getattr(settings, 'ARTEFACTOS_DIR', Path(settings.BASE_DIR) / 'artefactos'))
+
+
+def _marca(fecha):
+    return fecha.isoformat() if fecha else None
+
+
+def _version_productos():
+    return _marca(Producto.objects.aggregate(ultima=Max('fecha_actualizacion'))['ultima'])
+
+
+def version_evento(evento):
+    """Versión de los datos de la planilla de `evento`."""
+    return [_marca(evento.fecha_actualizacion), _version_productos()]
+
+
+def version_historial(filtros):
+    """Versión de las ventas que entran en el historial con `filtros`."""
+    if filtros['evento']:
+        evento = Evento.objects.filter(pk=filtros['evento']).only('fecha_actualizacion').first()
+        if evento is not None:
+            return version_evento(evento)
+    # Cantidad de eventos: una baja pasa sus ventas a "sin evento" sin otra marca
+    eventos = Evento.objects.aggregate(cantidad=Count('id'), ultima=Max('fecha_actualizacion'))
+    return [version_actual(), eventos['cantidad'], _marca(eventos['ultima'])]
+
+
+def clave(tipo, parametros, version):
+    texto = json.dumps([tipo, parametros, version], sort_keys=True, default=str)
+    return hashlib.sha256(texto.encode()).hexdigest()
+
+
+def clave_historial(params):
+    """Clave de la exportación del historial para el querystring `params` (QueryDict)."""
+    parametros = sorted((k, v) for k, v in params.lists() if k not in PARAMETROS_IGNORADOS)
+    return clave('historial', parametros, version_historial(filtros_de(params)))
+
+
+def clave_evento(evento):
+    return clave('evento', evento.pk, version_evento(evento))
+
+
+def _ruta(clave):
+    return directorio() / clave[:2] / f'{clave}.xlsx'
+
+
+def disponible(clave):
+    return _ruta(clave).is_file()
+
+
+def _abrir_existente(clave):
+    ruta = _ruta(clave)
+    try:
+        archivo = open(ruta, 'rb')
+    except FileNotFoundError:
+        return None
+    # La fecha de modificación marca el último uso: el desalojo por tamaño empieza por los más viejos
+    os.utime(ruta)
+    return archivo
+
+
+def _generar(clave, generar):
+    """
+    Escribe el artefacto con `generar(destino)` en un temporal del mismo directorio y lo
+    publica con un rename atómico: nunca se sirve un archivo a medio escribir.
+    """
+    ruta = _ruta(clave)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    descriptor, temporal = tempfile.mkstemp(dir=ruta.parent, suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as destino:
+            generar(destino)
+        os.replace(temporal, ruta)
+    except BaseException:
+        Path(temporal).unlink(missing_ok=True)
+        raise
+    # Se abre antes de purgar: un archivo abierto sigue legible aunque se desaloje
+    archivo = open(ruta, 'rb')
+    purgar()
+    return archivo
+
+
+def abrir(clave, generar):
+    """Archivo binario abierto del artefacto `clave`; si no está en la cache lo genera con `generar(destino)`."""
+    return _abrir_existente(clave) or _generar(clave, generar)
+
+
+def purgar(tamanio_maximo=None, dias=None):
+    """
+    Elimina los artefactos de más de `dias` días sin usar y luego, de los usados hace
+    más tiempo a los más recientes, hasta que el total no supere `tamanio_maximo` bytes.
+    Devuelve la cantidad de archivos eliminados.
+    """
+    tamanio_maximo = settings.ARTEFACTOS_TAMANIO_MAXIMO if tamanio_maximo is None else tamanio_maximo
+    dias = settings.ARTEFACTOS_DIAS if dias is None else dias
+    ahora = time.time()
+    vencidos, vigentes = [], []
+    for ruta in directorio().glob('*/*'):
+        try:
+            info = ruta.stat()
+        except FileNotFoundError:
+            continue
+        if ruta.suffix == '.tmp':
+            if info.st_mtime < ahora - ANTIGUEDAD_TEMPORALES:
+                vencidos.append(ruta)
+        elif info.st_mtime < ahora - dias * 86400:
+            vencidos.append(ruta)
+        else:
+            vigentes.append((info.st_mtime, info.st_size, ruta))
+
+    total = sum(tamanio for _, tamanio, _ in vigentes)
+    for _, tamanio, ruta in sorted(vigentes):
+        if total <= tamanio_maximo:
+            break
+        vencidos.append(ruta)
+        total -= tamanio
+
+    for ruta in vencidos:
+        ruta.unlink(missing_ok=True)
+    return len(vencidos)
+
+
+def respuesta(request, clave, nombre_archivo):
+    """
+    Sirve el artefacto ya generado con FileResponse. El ETag es la clave: identifica los
+    datos, no los bytes (un XLSX regenerado no es idéntico), por eso es débil. Si el cliente
+    ya tiene esta versión responde 304 sin abrir el archivo. None si el artefacto no está.
+    """
+    etag = f'W/"{clave}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        archivo = _abrir_existente(clave)
+        if archivo is None:
+            return None
+        response = FileResponse(archivo, as_attachment=True, filename=nombre_archivo, content_type=CONTENT_TYPE_XLSX)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def respuesta_disponible(request):
+    """
+    Respuesta a la petición AJAX de exportación cuando el artefacto ya está en la cache:
+    el mismo formato de un trabajo terminado, con la descarga en la URL pedida.
+    """
+    return JsonResponse({'estado': 'terminado', 'progreso': 100, 'descarga_url': request.get_full_path()})
+
+
+def respuesta_exportacion(request, clave, nombre_archivo, encolar_trabajo):
+    """
+    Respuesta a un pedido de exportación. La planilla nunca se arma en el worker web: si
+    el artefacto está en la cache se sirve (o, al fetch de la página, se indica dónde
+    descargarlo); si no, se encola con `encolar_trabajo()` y se responde el trabajo.
+    """
+    if disponible(clave):
+        if es_ajax(request):
+            return respuesta_disponible(request)
+        response = respuesta(request, clave, nombre_archivo)
+        # Si se desalojó entre la comprobación y la apertura, se vuelve a generar en segundo plano
+        if response is not None:
+            return response
+    return respuesta_trabajo(request, encolar_trabajo())
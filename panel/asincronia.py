@@ -0,0 +1,61 @@
+"""
+Ejecución concurrente de consultas independientes desde vistas async.
+
+Los métodos async del ORM (`acount`, `aaggregate`, ...) delegan en
+`sync_to_async(thread_sensitive=True)`: todas las consultas de la petición pasan
+por un único hilo y se ejecutan una detrás de otra aunque se lancen con
+`asyncio.gather`. Para que las consultas independientes de un reporte corran a
+la vez, cada una se ejecuta en un hilo propio (`thread_sensitive=False`), con
+su propia conexión, que se cierra al terminar.
+
+Con SQLite en WAL las lecturas de varias conexiones no se bloquean entre sí.
+Dentro de una transacción abierta (tests con TestCase, bloques atomic) otra
+conexión no vería los datos sin confirmar: en ese caso, o con
+`CONSULTAS_CONCURRENTES = False`, las consultas se ejecutan en secuencia en el
+hilo de la petición.
+"""
+import asyncio
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.shortcuts import render
+from panel.instrumentacion import medir_en_este_hilo
+
+
+def _en_conexion_propia(consulta):
+    """Ejecuta `consulta` en el hilo actual y cierra las conexiones que abrió ese hilo."""
+    try:
+        with medir_en_este_hilo():
+            return consulta()
+    finally:
+        connections.close_all()
+
+
+def _secuencial(consultas):
+    return {nombre: consulta() for nombre, consulta in consultas.items()}
+
+
+def _en_transaccion():
+    return any(conexion.in_atomic_block for conexion in connections.all(initialized_only=True))
+
+
+async def ejecutar_concurrentes(consultas):
+    """
+    Ejecuta las funciones de `consultas` ({nombre: callable sin argumentos}) y
+    devuelve {nombre: resultado}. Cada callable debe devolver datos ya evaluados
+    (listas, dicts, números), no querysets perezosos.
+    """
+    if not getattr(settings, 'CONSULTAS_CONCURRENTES', True) or await sync_to_async(_en_transaccion)():
+        return await sync_to_async(_secuencial)(consultas)
+
+    nombres = list(consultas)
+    resultados = await asyncio.gather(*(
+        sync_to_async(_en_conexion_propia, thread_sensitive=False)(consultas[nombre]) for nombre in nombres
+    ))
+    return dict(zip(nombres, resultados))
+
+
+async def render_async(request, template, context):
+    """`render` desde una vista async: se ejecuta en un hilo porque el layout lee
+    `request.user`, que puede consultar la base."""
+    return await sync_to_async(render)(request, template, context)
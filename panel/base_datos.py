@@ -0,0 +1,73 @@
+"""
+Utilidades para operar SQLite con varias terminales escribiendo a la vez.
+
+La configuración de conexión (WAL, `BEGIN IMMEDIATE`, timeout de espera) está en
+`DATABASES['default']['OPTIONS']`. Acá están el reintento acotado de las
+transacciones que igual se topan con la base bloqueada y el mantenimiento
+periódico de las estadísticas del planificador (`manage.py optimizar_base`).
+"""
+import functools
+import logging
+import random
+import time
+from django.db import OperationalError, connection
+
+logger = logging.getLogger(__name__)
+
+# Intentos totales de una transacción que encuentra la base bloqueada
+INTENTOS_BLOQUEO = 3
+
+# Espera base antes de reintentar (segundos); se duplica en cada intento, con jitter
+ESPERA_BLOQUEO = 0.05
+
+
+def es_bloqueo(error):
+    """True si el error es de SQLite por la base ocupada por otra conexión."""
+    mensaje = str(error).lower()
+    return isinstance(error, OperationalError) and ('locked' in mensaje or 'busy' in mensaje)
+
+
+def reintentar_si_bloqueada(funcion=None, *, intentos=INTENTOS_BLOQUEO, espera=ESPERA_BLOQUEO):
+    """
+    Decorador para funciones que abren su propia transacción de escritura: si SQLite
+    sigue bloqueada después del timeout de la conexión, reintenta la función entera.
+
+    Dentro de una transacción ya abierta no reintenta (el rollback corresponde a quien
+    la abrió) y deja pasar el error.
+    """
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            for intento in range(1, intentos + 1):
+                try:
+                    return funcion(*args, **kwargs)
+                except OperationalError as error:
+                    if intento == intentos or connection.in_atomic_block or not es_bloqueo(error):
+                        raise
+                    demora = espera * 2 ** (intento - 1) * random.uniform(0.5, 1.5)
+                    logger.warning("Base bloqueada en %s (intento %s/%s), reintentando en %.2fs",
+                                   funcion.__name__, intento, intentos, demora)
+                    time.sleep(demora)
+        return envoltura
+
+    return decorador(funcion) if funcion is not None else decorador
+
+
+def optimizar(analizar=False):
+    """
+    Actualiza las estadísticas que usa el planificador de SQLite.
+
+    `PRAGMA optimize` sólo analiza las tablas que lo necesitan y es barato; con
+    `analizar=True` se ejecuta un ANALYZE completo (después de cargas grandes).
+    También hace un checkpoint del WAL para que el archivo no crezca sin límite.
+    Devuelve el modo de journal de la base.
+    """
+    if connection.vendor != 'sqlite':
+        return None
+    with connection.cursor() as cursor:
+        if analizar:
+            cursor.execute('ANALYZE')
+        cursor.execute('PRAGMA optimize')
+        cursor.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        cursor.execute('PRAGMA journal_mode')
+        return cursor.fetchone()[0]
@@ -0,0 +1,231 @@
+"""
+Benchmark de las vistas del panel sobre datos sintéticos.
+
+Cada vista se ejecuta con el cliente de test de Django midiendo cantidad de
+consultas, tiempo de pared y pico de memoria (tracemalloc, en una pasada aparte
+para no distorsionar los tiempos). El resultado es un dict serializable a JSON
+con claves estables, para poder comparar corridas con un diff.
+
+Aparte, las vistas con versión async se comparan bajo carga concurrente, ambas
+por el handler y los middlewares completos: la versión sync con el cliente de
+test desde un pool de hilos (WSGI con hilos) y la async con el cliente async con
+varias peticiones en curso en un mismo event loop (ASGI).
+"""
+import asyncio
+import statistics
+import time
+import tracemalloc
+import types
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import ThreadSensitiveContext
+from django.conf import settings
+from django.db import connection, reset_queries
+from django.test import AsyncClient, Client, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path, reverse
+
+# Máximo de consultas SQL por vista: no debe depender del volumen de datos
+PRESUPUESTO_CONSULTAS = {
+    'dashboard_inicio': 10,
+    'historial_ventas': 8,
+    'historial_ventas_filtrado': 8,
+    'detalles_evento': 8,
+    'balance_tesoreria': 8,
+    'ingresos_tesoreria': 8,
+    'registrar_ventas': 6,
+    'catalogo_pos': 5,
+    'registrar_venta_ajax': 16,
+    'registrar_ticket_ajax': 18,
+    'stock_actual': 6,
+}
+
+
+def vistas_benchmark(evento_id, producto_id):
+    """(nombre, método, url, datos) de cada vista medida."""
+    return [
+        ('dashboard_inicio', 'get', reverse('inicio_dashboard'), None),
+        ('historial_ventas', 'get', reverse('historial_ventas'), None),
+        ('historial_ventas_filtrado', 'get', f"{reverse('historial_ventas')}?evento={evento_id}&medio=Efectivo", None),
+        ('detalles_evento', 'get', reverse('evento_detalles', args=[evento_id]), None),
+        ('balance_tesoreria', 'get', reverse('balance_tesoreria'), None),
+        ('ingresos_tesoreria', 'get', reverse('ingresos_tesoreria'), None),
+        ('registrar_ventas', 'get', reverse('registrar_ventas'), None),
+        ('catalogo_pos', 'get', reverse('catalogo_pos'), None),
+        ('registrar_venta_ajax', 'post', reverse('registrar_venta_ajax'), {
+            'producto_id': producto_id, 'cantidad': 1, 'medio_de_pago': 'Efectivo', 'evento_id': evento_id,
+        }),
+        ('registrar_ticket_ajax', 'json', reverse('registrar_ticket_ajax'), {
+            'lineas': [{'producto_id': producto_id, 'cantidad': 2}], 'medio_de_pago': 'Efectivo', 'evento_id': evento_id,
+        }),
+        ('stock_actual', 'get', f"{reverse('stock_actual')}?desde=0", None),
+    ]
+
+
+def _pedir(cliente, metodo, url, datos):
+    if metodo == 'json':
+        return cliente.post(url, datos, content_type='application/json')
+    if metodo == 'post':
+        return cliente.post(url, datos)
+    return cliente.get(url)
+
+
+def medir_vista(cliente, metodo, url, datos=None, repeticiones=3):
+    """Mide una vista: consultas de la última ejecución, tiempos en ms y pico de memoria en KB."""
+    tiempos = []
+    for _ in range(repeticiones):
+        # Con DEBUG el log de consultas tiene un tope; se vacía para que la captura no quede truncada
+        reset_queries()
+        with CaptureQueriesContext(connection) as consultas:
+            inicio = time.perf_counter()
+            respuesta = _pedir(cliente, metodo, url, datos)
+            # Las respuestas en streaming se consumen para medir el trabajo completo
+            if getattr(respuesta, 'streaming', False):
+                for _ in respuesta.streaming_content:
+                    pass
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+
+    tracemalloc.start()
+    try:
+        _pedir(cliente, metodo, url, datos)
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'status': respuesta.status_code,
+        'consultas': len(consultas.captured_queries),
+        'tiempo_ms': {
+            'min': round(min(tiempos), 2),
+            'mediana': round(statistics.median(tiempos), 2),
+            'max': round(max(tiempos), 2),
+        },
+        'memoria_pico_kb': round(pico / 1024, 1),
+    }
+
+
+def ejecutar_benchmark(usuario, evento_id, producto_id, repeticiones=3):
+    """Mide todas las vistas con el usuario dado y devuelve {nombre: métricas} (con el presupuesto de consultas)."""
+    cliente = Client()
+    cliente.force_login(usuario)
+    resultados = {}
+    for nombre, metodo, url, datos in vistas_benchmark(evento_id, producto_id):
+        metricas = medir_vista(cliente, metodo, url, datos, repeticiones)
+        metricas['presupuesto_consultas'] = PRESUPUESTO_CONSULTAS.get(nombre)
+        resultados[nombre] = metricas
+    return resultados
+
+
+def comparar(anterior, actual):
+    """Diferencias por vista entre dos reportes: (nombre, consultas antes/después, mediana ms antes/después)."""
+    filas = []
+    for nombre, metricas in actual['vistas'].items():
+        previas = anterior.get('vistas', {}).get(nombre)
+        if previas is None:
+            continue
+        filas.append((
+            nombre,
+            previas['consultas'], metricas['consultas'],
+            previas['tiempo_ms']['mediana'], metricas['tiempo_ms']['mediana'],
+        ))
+    return filas
+
+
+def vistas_concurrencia():
+    """(nombre, vista WSGI, vista ASGI, url) de las vistas que tienen versión async."""
+    from panel.views import inicio, tesoreria
+    return [
+        ('dashboard_inicio', inicio.dashboard_inicio, inicio.dashboard_inicio_async, reverse('inicio_dashboard')),
+        ('balance_tesoreria', tesoreria.balance_tesoreria, tesoreria.balance_tesoreria_async, reverse('balance_tesoreria')),
+        ('ingresos_tesoreria', tesoreria.ingresos_tesoreria, tesoreria.ingresos_tesoreria_async, reverse('ingresos_tesoreria')),
+        ('egresos_tesoreria', tesoreria.egresos_tesoreria, tesoreria.egresos_tesoreria_async, reverse('egresos_tesoreria')),
+    ]
+
+
+def peticion_autenticada(url, usuario):
+    """GET a `url` ya autenticado como `usuario`, para llamar a una vista sync o async sin middleware."""
+    request = RequestFactory().get(url)
+    request.user = usuario
+
+    async def auser():
+        return usuario
+
+    request.auser = auser
+    return request
+
+
+def urlconf_con(vista, url):
+    """
+    Urlconf del proyecto con `url` resuelta a `vista`. Así cada lado del benchmark pide su
+    versión de la vista por el handler y los middlewares completos, sin depender de VISTAS_ASYNC.
+    """
+    urlconf = types.ModuleType('panel_benchmark_urls')
+    urlconf.urlpatterns = [path(url.lstrip('/'), vista), path('', include(settings.ROOT_URLCONF))]
+    return urlconf
+
+
+def _estadisticas(tiempos, total_ms):
+    tiempos = sorted(tiempos)
+    return {
+        'mediana_ms': round(statistics.median(tiempos), 2),
+        'p95_ms': round(tiempos[max(0, int(len(tiempos) * 0.95) - 1)], 2),
+        'peticiones_por_segundo': round(len(tiempos) / (total_ms / 1000), 1),
+    }
+
+
+def medir_wsgi(url, cookies, concurrencia, peticiones):
+    """`peticiones` GET con el cliente de test desde `concurrencia` hilos (como un servidor WSGI con hilos)."""
+    def una(_):
+        cliente = Client()
+        cliente.cookies = cookies
+        inicio = time.perf_counter()
+        response = cliente.get(url)
+        return (time.perf_counter() - inicio) * 1000, response.status_code
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(concurrencia) as pool:
+        tiempos, estados = zip(*pool.map(una, range(peticiones)))
+    return {'estados': sorted(set(estados)), **_estadisticas(tiempos, (time.perf_counter() - inicio) * 1000)}
+
+
+def medir_asgi(url, cookies, concurrencia, peticiones):
+    """
+    `peticiones` GET con el cliente async de test, hasta `concurrencia` en curso en un mismo
+    event loop. Cada una en su ThreadSensitiveContext, como hace el handler ASGI por petición.
+    """
+    async def todas():
+        semaforo = asyncio.Semaphore(concurrencia)
+        cliente = AsyncClient()
+        cliente.cookies = cookies
+
+        async def una():
+            async with semaforo, ThreadSensitiveContext():
+                inicio = time.perf_counter()
+                response = await cliente.get(url)
+                return (time.perf_counter() - inicio) * 1000, response.status_code
+
+        inicio = time.perf_counter()
+        resultados = await asyncio.gather(*(una() for _ in range(peticiones)))
+        return resultados, (time.perf_counter() - inicio) * 1000
+
+    resultados, total_ms = asyncio.run(todas())
+    tiempos, estados = zip(*resultados)
+    return {'estados': sorted(set(estados)), **_estadisticas(tiempos, total_ms)}
+
+
+def ejecutar_benchmark_concurrencia(usuario, concurrencia=8, peticiones=48):
+    """
+    Compara latencia y throughput de las vistas sync (WSGI) y async (ASGI) con
+    `concurrencia` peticiones simultáneas. La cache de reportes se desactiva para
+    medir las consultas y no las lecturas de cache.
+    """
+    cliente = Client()
+    cliente.force_login(usuario)
+    resultados = {}
+    with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}):
+        for nombre, vista_wsgi, vista_asgi, url in vistas_concurrencia():
+            with override_settings(ROOT_URLCONF=urlconf_con(vista_wsgi, url)):
+                wsgi = medir_wsgi(url, cliente.cookies, concurrencia, peticiones)
+            with override_settings(ROOT_URLCONF=urlconf_con(vista_asgi, url)):
+                asgi = medir_asgi(url, cliente.cookies, concurrencia, peticiones)
+            resultados[nombre] = {'wsgi': wsgi, 'asgi': asgi}
+    return resultados
@@ -0,0 +1,144 @@
+"""
+Índice de búsqueda de texto completo (SQLite FTS5) sobre los nombres de productos
+y las descripciones de movimientos de tesorería.
+
+Cada índice es una tabla FTS5 con una copia del texto y rowid = id del objeto, así
+actualizar o quitar una fila es una operación por clave. Las signals de Producto y
+Movimiento lo mantienen; los caminos de escritura en lote (ventas.servicios) llaman
+a `indexar_movimientos` a mano, como hacen con el libro de saldos.
+`reconstruir_indice` (`manage.py reconstruir_busqueda`) lo rehace desde cero.
+
+Las búsquedas son por prefijo de cada palabra ("coca co" encuentra "Coca Cola"),
+sin distinguir mayúsculas ni acentos, y `buscar` ordena por relevancia (bm25).
+
+Sin FTS5 (otra base o un SQLite compilado sin la extensión) la migración crea
+tablas comunes con las mismas columnas y las búsquedas caen a LIKE por palabra:
+encuentran la palabra en cualquier posición, distinguen acentos y no ordenan por relevancia.
+"""
+import functools
+import re
+from django.apps import apps
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+PRODUCTOS = 'busqueda_producto'
+MOVIMIENTOS = 'busqueda_movimiento'
+
+# Índice -> (modelo, campo de texto)
+ORIGENES = {
+    PRODUCTOS: ('ventas.Producto', 'nombre'),
+    MOVIMIENTOS: ('tesoreria.Movimiento', 'descripcion'),
+}
+
+# Resultados que devuelven los endpoints de búsqueda
+LIMITE_RESULTADOS = 20
+
+
+def fts5_disponible(conexion):
+    """True si `conexion` es SQLite con FTS5."""
+    if conexion.vendor != 'sqlite':
+        return False
+    with conexion.cursor() as cursor:
+        cursor.execute("PRAGMA compile_options")
+        return 'ENABLE_FTS5' in {fila[0] for fila in cursor.fetchall()}
+
+
+@functools.cache
+def usa_fts5():
+    """True si los índices son tablas FTS5; si no, son tablas comunes (ver migración 0002_busqueda)."""
+    return fts5_disponible(connection)
+
+
+def expresion(texto):
+    """
+    Consulta FTS5 para lo que escribió el usuario: todas las palabras, cada una como
+    prefijo. Sólo se toman letras y dígitos, así la sintaxis de FTS5 nunca llega a la consulta.
+    """
+    return ' '.join(f'"{palabra}"*' for palabra in re.findall(r'\w+', texto or ''))
+
+
+def _indexar(indice, filas):
+    """Reemplaza el texto indexado de las filas [(id, texto)]."""
+    filas = [(pk, texto or '') for pk, texto in filas]
+    if not filas:
+        return
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.executemany(f"INSERT OR REPLACE INTO {indice} (rowid, texto) VALUES (%s, %s)", filas)
+        else:
+            cursor.executemany(f"DELETE FROM {indice} WHERE rowid = %s", [(pk,) for pk, _ in filas])
+            cursor.executemany(f"INSERT INTO {indice} (rowid, texto) VALUES (%s, %s)", filas)
+
+
+def _quitar(indice, pk):
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {indice} WHERE rowid = %s", [pk])
+
+
+def indexar_productos(productos):
+    _indexar(PRODUCTOS, [(p.pk, p.nombre) for p in productos])
+
+
+def indexar_movimientos(movimientos):
+    _indexar(MOVIMIENTOS, [(m.pk, m.descripcion) for m in movimientos])
+
+
+def quitar_producto(pk):
+    _quitar(PRODUCTOS, pk)
+
+
+def quitar_movimiento(pk):
+    _quitar(MOVIMIENTOS, pk)
+
+
+def _coincidencias(indice, texto):
+    """(sql, params) de los rowid de `indice` que coinciden con `texto`, o None si no hay palabras."""
+    if usa_fts5():
+        consulta = expresion(texto)
+        return (f"SELECT rowid FROM {indice} WHERE {indice} MATCH %s", [consulta]) if consulta else None
+    palabras = re.findall(r'\w+', (texto or '').lower())
+    if not palabras:
+        return None
+    condiciones = ' AND '.join(['LOWER(texto) LIKE %s'] * len(palabras))
+    return f"SELECT rowid FROM {indice} WHERE {condiciones}", [f'%{palabra}%' for palabra in palabras]
+
+
+def filtrar_por_texto(queryset, indice, texto, campo='pk'):
+    """
+    Restringe `queryset` a las filas cuyo `campo` (el id o una FK al objeto indexado)
+    coincide con `texto` en `indice`, con una subconsulta al índice: no hay LIKE ni JOIN.
+    Sin palabras para buscar devuelve el queryset tal cual.
+    """
+    coincidencias = _coincidencias(indice, texto)
+    if coincidencias is None:
+        return queryset
+    return queryset.filter(**{f'{campo}__in': RawSQL(*coincidencias)})
+
+
+def buscar(indice, texto, limite=LIMITE_RESULTADOS):
+    """Ids que coinciden con `texto` en `indice`, del más relevante al menos relevante."""
+    coincidencias = _coincidencias(indice, texto)
+    if coincidencias is None:
+        return []
+    sql, params = coincidencias
+    orden = 'rank' if usa_fts5() else 'rowid'
+    with connection.cursor() as cursor:
+        cursor.execute(f"{sql} ORDER BY {orden} LIMIT %s", [*params, limite])
+        return [fila[0] for fila in cursor.fetchall()]
+
+
+def reconstruir_indice():
+    """
+    Vuelve a cargar ambos índices a partir de las tablas de origen.
+    Devuelve {índice: filas indexadas}.
+    """
+    cargadas = {}
+    with connection.cursor() as cursor:
+        for indice, (modelo, campo) in ORIGENES.items():
+            tabla = apps.get_model(modelo)._meta.db_table
+            cursor.execute(f"DELETE FROM {indice}")
+            cursor.execute(
+                f"INSERT INTO {indice} (rowid, texto) SELECT id, COALESCE({campo}, '') FROM {tabla}"
+            )
+            cargadas[indice] = cursor.rowcount
+    return cargadas
@@ -0,0 +1,119 @@
+"""
+Cache de reportes invalidada por contadores de generación.
+
+Cada modelo del que dependen los reportes tiene un contador (GeneracionReporte)
+que se incrementa cada vez que se escriben sus datos (desde las signals y desde
+las escrituras en lote que no las disparan).
+Los contextos calculados se guardan con una clave que incluye esos contadores:
+mientras no haya escrituras, una recarga cuesta sólo leer los contadores y la
+cache; después de una escritura la clave cambia y el reporte se recalcula. Las
+entradas viejas no se borran, simplemente expiran.
+
+Los contadores están en la base y no en la cache: `incr` no es atómico en las
+caches en archivos o en memoria (dos procesos pueden perder un incremento) y una
+cache en archivos puede desalojar un contador y volverlo a 0, con lo que se
+servirían reportes viejos. En la base el incremento es un UPDATE con F() dentro
+de la misma transacción que la escritura, así que se ve exactamente cuando se
+ven los datos. La cache configurada en CACHES sólo guarda los reportes: si no es
+compartida entre procesos, cada uno recalcula los suyos, pero nunca sirve datos
+invalidados.
+"""
+import hashlib
+import os
+from django.core.cache import caches
+from django.db import connection
+from django.db.models import F
+from panel.models import GeneracionReporte
+
+ALIAS_CACHE = 'default'
+
+# Las entradas se recalculan al menos una vez por hora aunque no haya escrituras
+DURACION_CACHE_REPORTES = 60 * 60
+
+VENTAS = 'venta'
+MOVIMIENTOS = 'movimiento'
+PRODUCTOS = 'producto'
+EVENTOS = 'evento'
+MODELOS = (VENTAS, MOVIMIENTOS, PRODUCTOS, EVENTOS)
+
+
+def _cache():
+    return caches[ALIAS_CACHE]
+
+
+def _prefijo():
+    # Las claves dependen de la base: la base de tests o la del benchmark no comparten cache con la real
+    base = str(connection.settings_dict['NAME'])
+    if getattr(connection, 'is_in_memory_db', lambda: False)():
+        # Una base en memoria (la de los tests) existe sólo en este proceso y con el mismo nombre en
+        # cada ejecución: sin el pid, una cache compartida devolvería reportes de una ejecución anterior
+        base += f':{os.getpid()}'
+    return 'reportes:' + hashlib.md5(base.encode()).hexdigest()[:8]
+
+
+def _incrementar(modelos):
+    actualizados = GeneracionReporte.objects.filter(modelo__in=modelos).update(numero=F('numero') + 1)
+    if actualizados < len(modelos):
+        # Primera escritura de algún modelo: se crean los contadores que falten y se incrementan todos
+        GeneracionReporte.objects.bulk_create(
+            [GeneracionReporte(modelo=modelo) for modelo in modelos], ignore_conflicts=True,
+        )
+        GeneracionReporte.objects.filter(modelo__in=modelos).update(numero=F('numero') + 1)
+
+
+def invalidar(*modelos):
+    """
+    Marca como modificados los datos de `modelos` (todos si no se indica ninguno).
+
+    El incremento corre en la transacción en curso: los demás procesos ven la nueva
+    generación recién cuando la escritura se confirma, y nunca antes que los datos.
+    """
+    _incrementar(modelos or MODELOS)
+
+
+def _ordenar(modelos, filas):
+    numeros = dict(filas)
+    return tuple(numeros.get(modelo, 0) for modelo in modelos)
+
+
+def generaciones(*modelos):
+    """Contadores actuales de `modelos`, en el mismo orden, con una sola consulta."""
+    return _ordenar(modelos, GeneracionReporte.objects.filter(modelo__in=modelos).values_list('modelo', 'numero'))
+
+
+async def generaciones_async(*modelos):
+    """Como `generaciones`, para vistas async."""
+    filas = GeneracionReporte.objects.filter(modelo__in=modelos).values_list('modelo', 'numero')
+    return _ordenar(modelos, [fila async for fila in filas])
+
+
+def _clave_reporte(nombre, numeros, parametros):
+    partes = [nombre, *map(str, numeros), *map(str, parametros)]
+    return f"{_prefijo()}:{hashlib.md5('|'.join(partes).encode()).hexdigest()}"
+
+
+def reporte_cacheado(nombre, modelos, calcular, *parametros):
+    """
+    Devuelve el resultado de `calcular()` cacheado bajo (nombre, generaciones de
+    `modelos`, parametros). `parametros` identifica variantes del reporte
+    (filtros, fecha del día) y tiene que ser representable como texto.
+    """
+    cache = _cache()
+    clave = _clave_reporte(nombre, generaciones(*modelos), parametros)
+    resultado = cache.get(clave)
+    if resultado is None:
+        resultado = calcular()
+        cache.set(clave, resultado, DURACION_CACHE_REPORTES)
+    return resultado
+
+
+async def reporte_cacheado_async(nombre, modelos, calcular, *parametros):
+    """Como `reporte_cacheado`, para vistas async: `calcular` es una corrutina sin argumentos."""
+    cache = _cache()
+    clave = _clave_reporte(nombre, await generaciones_async(*modelos), parametros)
+    resultado = await cache.aget(clave)
+    if resultado is None:
+        resultado = await calcular()
+        await cache.aset(clave, resultado, DURACION_CACHE_REPORTES)
+    return resultado
+
@@ -0,0 +1,119 @@
+"""
+Generación de datos sintéticos para benchmarks y verificación de planes de consulta.
+
+Todo se inserta con bulk_create por lotes, sin pasar por las signals; después se
+reconstruyen los derivados (totales de eventos, tablas de resumen y feed de stock)
+igual que lo haría el sistema al registrar las ventas una por una.
+"""
+import random
+from datetime import timedelta
+from decimal import Decimal
+from django.db import transaction
+from django.utils import timezone
+from cargos.models import Gestion
+from eventos.models import Evento
+from tesoreria.models import Movimiento
+from tesoreria.libro import recalcular
+from ventas.models import Producto, Venta, CambioStock
+from ventas.resumenes import reconstruir_resumenes, reconstruir_contadores
+from panel.busqueda import reconstruir_indice
+from panel.cache_reportes import invalidar
+
+TAMANIO_LOTE = 2000
+
+MEDIOS_DE_PAGO = [medio for medio, _ in Venta.MEDIO_PAGO_CHOICES]
+
+
+def sembrar(gestiones=1, eventos=5, productos=20, ventas=500, egresos=None, dias=365, semilla=0):
+    """
+    Carga un volumen configurable de datos repartidos en los últimos `dias` días.
+
+    Cada venta genera su movimiento de ingreso (como hace la signal) y se agregan
+    `egresos` movimientos de egreso (por defecto, uno cada diez ventas).
+    Devuelve un dict con las cantidades creadas y los ids de referencia.
+    """
+    azar = random.Random(semilla)
+    ahora = timezone.now()
+    hoy = timezone.localdate()
+    egresos = ventas // 10 if egresos is None else egresos
+
+    with transaction.atomic():
+        lista_gestiones = Gestion.objects.bulk_create([
+            Gestion(nombre=f'Gestión {i + 1}', fecha_inicio=hoy - timedelta(days=dias * (gestiones - i) // gestiones))
+            for i in range(gestiones)
+        ])
+        lista_eventos = Evento.objects.bulk_create([
+            Evento(
+                nombre=f'Evento {i + 1}',
+                fecha=hoy - timedelta(days=dias * i // max(eventos, 1)),
+                gestion=lista_gestiones[i % gestiones],
+            )
+            for i in range(eventos)
+        ], batch_size=TAMANIO_LOTE)
+        lista_productos = Producto.objects.bulk_create([
+            Producto(
+                nombre=f'Producto {i + 1}',
+                stock=10 ** 6,
+                precio_compra=Decimal(10 + i % 40),
+                precio_venta=Decimal(15 + i % 40 + i % 7),
+                activo=i % 10 != 9,
+            )
+            for i in range(productos)
+        ], batch_size=TAMANIO_LOTE)
+
+        for inicio in range(0, ventas, TAMANIO_LOTE):
+            lote = []
+            for i in range(inicio, min(inicio + TAMANIO_LOTE, ventas)):
+                producto = lista_productos[azar.randrange(productos)]
+                lote.append(Venta(
+                    producto=producto,
+                    cantidad=azar.randint(1, 4),
+                    medio_de_pago=azar.choice(MEDIOS_DE_PAGO),
+                    evento=lista_eventos[azar.randrange(eventos)] if eventos and azar.random() < 0.8 else None,
+                    fecha_hora=ahora - timedelta(seconds=azar.randrange(dias * 86400)),
+                    precio_unitario_venta=producto.precio_venta,
+                    precio_unitario_compra=producto.precio_compra,
+                ))
+            lote = Venta.objects.bulk_create(lote)
+            Movimiento.objects.bulk_create([
+                Movimiento(
+                    tipo='Ingreso',
+                    descripcion=f'Venta de {v.producto.nombre} (venta_id={v.pk})',
+                    monto=v.total(),
+                    fecha=v.fecha_hora,
+                    evento_id=v.evento_id,
+                    venta=v,
+                )
+                for v in lote
+            ])
+
+        Movimiento.objects.bulk_create([
+            Movimiento(
+                tipo='Egreso',
+                descripcion=f'Compra de insumos {i + 1}',
+                monto=Decimal(azar.randint(500, 20000)),
+                fecha=ahora - timedelta(seconds=azar.randrange(dias * 86400)),
+                evento=lista_eventos[azar.randrange(eventos)] if eventos and azar.random() < 0.5 else None,
+            )
+            for i in range(egresos)
+        ], batch_size=TAMANIO_LOTE)
+
+        CambioStock.objects.bulk_create([CambioStock(producto=p) for p in lista_productos], batch_size=TAMANIO_LOTE)
+        for evento in lista_eventos:
+            evento.actualizar_recaudacion()
+        reconstruir_resumenes()
+        reconstruir_contadores()
+        # Los movimientos tienen fechas pasadas al azar: el libro de saldos se reconstruye entero
+        recalcular()
+        reconstruir_indice()
+        invalidar()
+
+    return {
+        'gestiones': gestiones,
+        'eventos': eventos,
+        'productos': productos,
+        'ventas': ventas,
+        'movimientos': ventas + egresos,
+        'evento_id': lista_eventos[0].pk if lista_eventos else None,
+        'producto_id': lista_productos[0].pk if lista_productos else None,
+    }
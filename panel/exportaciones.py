@@ -0,0 +1,123 @@
+"""
+Exportaciones XLSX / CSV con memoria constante.
+
+Las filas se leen de la base por bloques (`.iterator()`) y se escriben a medida
+que llegan: el CSV se envía directamente en un StreamingHttpResponse y el XLSX
+se arma con openpyxl en modo write-only sobre un archivo de la cache de
+panel.artefactos, que luego se sirve por partes con FileResponse.
+"""
+import csv
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment, PatternFill
+from ventas.reportes import IMPORTE_BRUTO, IMPORTE_NETO
+
+CONTENT_TYPE_XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+ENCABEZADOS_VENTAS = [
+    "Fecha", "Producto", "Cantidad", "Precio Unitario Venta", "Precio Unitario Compra",
+    "Total", "Ganancia", "Medio de pago", "Evento",
+]
+
+TAMANIO_BLOQUE = 2000
+
+
+def filas_ventas(ventas):
+    """Genera una fila por venta del queryset, leyendo la base por bloques."""
+    columnas = ventas.order_by('fecha_hora', 'id').annotate(
+        importe_bruto=IMPORTE_BRUTO,
+        importe_neto=IMPORTE_NETO,
+    ).values_list(
+        'fecha_hora', 'producto__nombre', 'cantidad', 'precio_unitario_venta', 'precio_unitario_compra',
+        'importe_bruto', 'importe_neto', 'medio_de_pago', 'evento__nombre',
+    )
+    for fecha, producto, cantidad, p_venta, p_compra, bruto, neto, medio, evento in columnas.iterator(chunk_size=TAMANIO_BLOQUE):
+        yield [
+            timezone.localtime(fecha).replace(tzinfo=None, microsecond=0) if fecha else None,
+            producto,
+            cantidad,
+            float(p_venta or 0),
+            float(p_compra or 0),
+            float(bruto or 0),
+            float(neto or 0),
+            medio,
+            evento or "Sin evento",
+        ]
+
+
+def hojas_historial(ventas, eventos_data, total_recaudado):
+    """Hojas del export del historial: resumen por evento y detalle de cada venta."""
+    resumen = [[evento['nombre'], evento['total']] for evento in eventos_data.values()]
+    resumen += [[], ["Total general", float(total_recaudado)]]
+    return [
+        ("Resumen", ["Evento", "Total Recaudado ($)"], resumen),
+        ("Ventas", ENCABEZADOS_VENTAS, filas_ventas(ventas)),
+    ]
+
+
+def hojas_evento(evento, productos_export, total_bruto, ganancia_neta, ventas):
+    """Hojas del export de un evento: resumen por producto y detalle de cada venta."""
+    columnas = ["Producto", "Cantidad", "Precio Unitario Venta", "Precio Unitario Compra", "Total", "Ganancia"]
+    resumen = [[item[c] for c in columnas] for item in productos_export]
+    resumen += [[], ["", "", "", "Total bruto", float(total_bruto)], ["", "", "", "Ganancia neta", float(ganancia_neta)]]
+    return [
+        (f"Evento {evento.nombre}", columnas, resumen),
+        ("Ventas", ENCABEZADOS_VENTAS, filas_ventas(ventas)),
+    ]
+
+
+def _encabezado(ws, titulos):
+    celdas = []
+    for titulo in titulos:
+        celda = WriteOnlyCell(ws, value=titulo)
+        celda.font = Font(bold=True)
+        celda.fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
+        celda.alignment = Alignment(horizontal="center")
+        celdas.append(celda)
+    return celdas
+
+
+def escribir_xlsx(destino, hojas):
+    """
+    Escribe un libro write-only en `destino` (ruta o archivo binario).
+    `hojas` es una lista de (titulo, encabezados, filas) donde filas puede ser un generador.
+    """
+    wb = Workbook(write_only=True)
+    for titulo, encabezados, filas in hojas:
+        ws = wb.create_sheet(title=titulo[:31])
+        if encabezados:
+            ws.append(_encabezado(ws, encabezados))
+        for fila in filas:
+            ws.append(fila)
+    wb.save(destino)
+
+
+class _Eco:
+    """Pseudo-archivo para csv.writer que devuelve cada línea en lugar de guardarla."""
+    def write(self, valor):
+        return valor
+
+
+def escribir_csv(destino, encabezados, filas):
+    """Escribe el CSV completo en `destino` (archivo de texto)."""
+    writer = csv.writer(destino)
+    writer.writerow(encabezados)
+    for fila in filas:
+        writer.writerow(fila)
+
+
+def respuesta_csv(nombre_archivo, encabezados, filas):
+    """CSV enviado línea por línea mientras se leen las filas."""
+    writer = csv.writer(_Eco())
+
+    def lineas():
+        yield '\ufeff'  # BOM para que Excel detecte UTF-8
+        yield writer.writerow(encabezados)
+        for fila in filas:
+            yield writer.writerow(fila)
+
+    response = StreamingHttpResponse(lineas(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{nombre_archivo}"'
+    return response
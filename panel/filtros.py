@@ -0,0 +1,72 @@
+"""
+Filtros comunes de los listados (evento, tipo, medio de pago y rango de fechas) aplicados en SQL.
+El texto buscado (`q`) se resuelve con el índice de panel.busqueda.
+"""
+from datetime import datetime, time, timedelta
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+
+def _inicio_del_dia(dia):
+    return timezone.make_aware(datetime.combine(dia, time.min))
+
+
+def leer_filtros(request):
+    """Lee y valida los filtros del querystring; los inválidos se ignoran."""
+    return filtros_de(request.GET)
+
+
+def filtros_de(params):
+    """Lee y valida los filtros de un QueryDict (o dict); los inválidos se ignoran."""
+    try:
+        evento_id = int(params.get('evento') or 0) or None
+    except ValueError:
+        evento_id = None
+    try:
+        desde = parse_date(params.get('desde') or '')
+        hasta = parse_date(params.get('hasta') or '')
+    except ValueError:
+        desde = hasta = None
+    return {
+        'evento': evento_id,
+        'tipo': params.get('tipo', '') if params.get('tipo') in ('Ingreso', 'Egreso') else '',
+        'medio': params.get('medio', ''),
+        'desde': desde,
+        'hasta': hasta,
+        'q': (params.get('q') or '').strip(),
+    }
+
+
+def inicio_del_rango(desde):
+    """Límite inferior (inicio del día) del filtro `desde`, o None."""
+    return _inicio_del_dia(desde) if desde else None
+
+
+def fin_del_rango(hasta):
+    """Límite superior exclusivo (inicio del día siguiente) del filtro `hasta`, o None."""
+    return _inicio_del_dia(hasta + timedelta(days=1)) if hasta else None
+
+
+def filtrar_por_fecha(queryset, campo, desde=None, hasta=None):
+    """Rango de días [desde, hasta] como rango de datetimes, para que use el índice de `campo`."""
+    if desde:
+        queryset = queryset.filter(**{f'{campo}__gte': _inicio_del_dia(desde)})
+    if hasta:
+        queryset = queryset.filter(**{f'{campo}__lt': fin_del_rango(hasta)})
+    return queryset
+
+
+def filtrar_movimientos(queryset, filtros, con_tipo=True):
+    if filtros['evento']:
+        queryset = queryset.filter(evento_id=filtros['evento'])
+    if con_tipo and filtros['tipo']:
+        queryset = queryset.filter(tipo=filtros['tipo'])
+    return filtrar_por_fecha(queryset, 'fecha', filtros['desde'], filtros['hasta'])
+
+
+def filtrar_ventas(queryset, filtros):
+    if filtros['evento']:
+        queryset = queryset.filter(evento_id=filtros['evento'])
+    if filtros['medio']:
+        queryset = queryset.filter(medio_de_pago=filtros['medio'])
+    return filtrar_por_fecha(queryset, 'fecha_hora', filtros['desde'], filtros['hasta'])
@@ -0,0 +1,94 @@
+"""
+Lectura de planillas de reposición de stock (CSV o XLSX).
+
+La primera fila son los encabezados; se reconocen `producto` (id o nombre),
+`cantidad` y `precio_compra` (opcional, vacío = precio de compra actual), sin
+importar mayúsculas ni el orden de las columnas. El XLSX se lee con openpyxl en
+modo read-only, fila por fila.
+"""
+import csv
+import io
+from decimal import Decimal, InvalidOperation
+from openpyxl import load_workbook
+
+COLUMNAS_REPOSICION = ('producto', 'cantidad', 'precio_compra')
+
+# Tope de líneas por archivo (una compra real tiene cientos)
+MAX_LINEAS_REPOSICION = 5000
+
+
+def _filas_csv(archivo):
+    texto = io.TextIOWrapper(archivo, encoding='utf-8-sig', newline='')
+    muestra = texto.read(4096)
+    texto.seek(0)
+    try:
+        dialecto = csv.Sniffer().sniff(muestra, delimiters=',;\t')
+    except csv.Error:
+        dialecto = csv.excel
+    yield from csv.reader(texto, dialecto)
+
+
+def _filas_xlsx(archivo):
+    libro = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        yield from libro.active.iter_rows(values_only=True)
+    finally:
+        libro.close()
+
+
+def _texto(valor):
+    return '' if valor is None else str(valor).strip()
+
+
+def _entero(valor):
+    if isinstance(valor, float) and valor.is_integer():
+        return int(valor)
+    return int(_texto(valor))
+
+
+def _decimal(valor):
+    if isinstance(valor, (int, float, Decimal)):
+        return Decimal(str(valor))
+    texto = _texto(valor)
+    # Admite coma decimal ("1234,50")
+    if ',' in texto and '.' not in texto:
+        texto = texto.replace(',', '.')
+    return Decimal(texto)
+
+
+def leer_reposicion(archivo, nombre):
+    """
+    Lee la planilla `archivo` (binario; formato según la extensión de `nombre`).
+
+    Devuelve (lineas, errores): lineas son tuplas (producto, cantidad, precio_compra)
+    listas para `ventas.servicios.reponer_stock`, con producto como int si la
+    celda es numérica; errores son mensajes por fila.
+    """
+    filas = _filas_xlsx(archivo) if nombre.lower().endswith('.xlsx') else _filas_csv(archivo)
+
+    encabezados = [_texto(c).lower().replace(' ', '_') for c in next(filas, [])]
+    faltantes = [c for c in COLUMNAS_REPOSICION[:2] if c not in encabezados]
+    if faltantes:
+        return [], [f"Faltan columnas: {', '.join(faltantes)}"]
+    posiciones = {c: encabezados.index(c) for c in COLUMNAS_REPOSICION if c in encabezados}
+
+    lineas, errores = [], []
+    for numero, fila in enumerate(filas, start=2):
+        celdas = {c: (fila[i] if i < len(fila) else None) for c, i in posiciones.items()}
+        if not any(_texto(v) for v in celdas.values()):
+            continue
+        if len(lineas) >= MAX_LINEAS_REPOSICION:
+            errores.append(f'El archivo supera las {MAX_LINEAS_REPOSICION} líneas')
+            break
+
+        producto = celdas['producto']
+        try:
+            producto = _entero(producto) if _texto(producto).isdigit() or isinstance(producto, (int, float)) else _texto(producto)
+            cantidad = _entero(celdas['cantidad'])
+            precio = celdas.get('precio_compra')
+            precio = _decimal(precio) if _texto(precio) else None
+        except (ValueError, InvalidOperation):
+            errores.append(f'Fila {numero}: producto, cantidad o precio de compra inválidos')
+            continue
+        lineas.append((producto, cantidad, precio))
+    return lineas, errores
@@ -0,0 +1,194 @@
+"""
+Instrumentación SQL por petición (opcional y muestreada).
+
+Para una fracción de las peticiones (`INSTRUMENTACION_SQL_MUESTREO`, entre 0 y 1)
+registra cada consulta con `execute_wrapper` —no necesita DEBUG=True—, y al
+terminar la petición:
+
+- agrega un header `Server-Timing` con la cantidad de consultas y el tiempo en SQL;
+- detecta la misma consulta (misma forma, distintos parámetros) repetida muchas
+  veces, el síntoma típico de un N+1, indicando desde qué vista/signal se originó;
+- escribe una línea de log estructurada (JSON) en el logger `panel.sql`.
+"""
+import json
+import logging
+import os
+import random
+import sys
+import time
+import contextvars
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('panel.sql')
+
+# Consultas más lentas que se reportan por petición
+CONSULTAS_LENTAS_REPORTADAS = 5
+
+# A partir de cuántas ejecuciones de la misma consulta se la marca como posible N+1
+UMBRAL_REPETICIONES = 5
+
+# Registro de la petición medida en curso (ver `medir_en_este_hilo`)
+_registro_actual = contextvars.ContextVar('registro_consultas', default=None)
+
+_RAIZ_PROYECTO = str(settings.BASE_DIR) + os.sep
+_ESTE_ARCHIVO = os.path.abspath(__file__)
+
+
+def _origen():
+    """Primer frame del código del proyecto (vista, signal, servicio) que disparó la consulta."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        archivo = frame.f_code.co_filename
+        if (
+            archivo.startswith(_RAIZ_PROYECTO)
+            and archivo != _ESTE_ARCHIVO
+            and 'site-packages' not in archivo
+        ):
+            return f"{os.path.relpath(archivo, _RAIZ_PROYECTO)}:{frame.f_lineno} {frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+class RegistroConsultas:
+    """execute_wrapper que acumula (sql, duración, origen) de cada consulta ejecutada."""
+
+    def __init__(self):
+        self.consultas = []
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.consultas.append((sql, (time.perf_counter() - inicio) * 1000, _origen()))
+
+    @property
+    def tiempo_total_ms(self):
+        return sum(duracion for _, duracion, _ in self.consultas)
+
+    def lentas(self, cantidad=CONSULTAS_LENTAS_REPORTADAS):
+        ordenadas = sorted(self.consultas, key=lambda c: c[1], reverse=True)[:cantidad]
+        return [{'sql': sql, 'ms': round(duracion, 2), 'origen': origen} for sql, duracion, origen in ordenadas]
+
+    def repetidas(self, umbral=UMBRAL_REPETICIONES):
+        """Consultas con la misma forma (el SQL con placeholders) ejecutadas `umbral` veces o más."""
+        por_forma = defaultdict(lambda: {'veces': 0, 'ms': 0.0, 'origenes': set()})
+        for sql, duracion, origen in self.consultas:
+            grupo = por_forma[sql]
+            grupo['veces'] += 1
+            grupo['ms'] += duracion
+            if origen:
+                grupo['origenes'].add(origen)
+        return [
+            {'sql': sql, 'veces': g['veces'], 'ms': round(g['ms'], 2), 'origenes': sorted(g['origenes'])}
+            for sql, g in sorted(por_forma.items(), key=lambda item: item[1]['veces'], reverse=True)
+            if g['veces'] >= umbral
+        ]
+
+
+def _server_timing(registro, repetidas, total_ms):
+    metricas = [
+        f'sql;desc="{len(registro.consultas)} consultas";dur={registro.tiempo_total_ms:.1f}',
+        f'total;dur={total_ms:.1f}',
+    ]
+    if repetidas:
+        metricas.append(f'n1;desc="{len(repetidas)} consultas repetidas"')
+    return ', '.join(metricas)
+
+
+def _muestrear():
+    muestreo = getattr(settings, 'INSTRUMENTACION_SQL_MUESTREO', 0)
+    return bool(muestreo) and random.random() < muestreo
+
+
+@contextmanager
+def medir_en_este_hilo():
+    """
+    Registra también las consultas de las conexiones de este hilo en la medición de la
+    petición en curso (si hay una). Las conexiones son propias de cada hilo: con ASGI el
+    ORM corre en otro hilo que el middleware, y panel.asincronia usa hilos aparte.
+    """
+    registro = _registro_actual.get()
+    with ExitStack() as pila:
+        if registro is not None:
+            for alias in connections:
+                pila.enter_context(connections[alias].execute_wrapper(registro))
+        yield
+
+
+class _Medicion:
+    """Medición de una petición: el registro de consultas queda en el contexto mientras dura el bloque `with`."""
+
+    def __enter__(self):
+        self.registro = RegistroConsultas()
+        self._token = _registro_actual.set(self.registro)
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *excepcion):
+        self.total_ms = (time.perf_counter() - self.inicio) * 1000
+        _registro_actual.reset(self._token)
+
+    def informar(self, request, response):
+        """Agrega el Server-Timing a `response` y escribe la línea de log."""
+        registro, total_ms = self.registro, self.total_ms
+        repetidas = registro.repetidas(getattr(settings, 'INSTRUMENTACION_SQL_UMBRAL_REPETICIONES', UMBRAL_REPETICIONES))
+        response['Server-Timing'] = _server_timing(registro, repetidas, total_ms)
+
+        match = getattr(request, 'resolver_match', None)
+        datos = {
+            'metodo': request.method,
+            'ruta': request.path,
+            'vista': match.view_name if match else None,
+            'status': response.status_code,
+            'consultas': len(registro.consultas),
+            'sql_ms': round(registro.tiempo_total_ms, 2),
+            'total_ms': round(total_ms, 2),
+            'lentas': registro.lentas(),
+            'repetidas': repetidas,
+        }
+        nivel = logging.WARNING if repetidas else logging.INFO
+        logger.log(nivel, json.dumps(datos, ensure_ascii=False), extra={'instrumentacion_sql': datos})
+        return response
+
+
+class InstrumentacionSQLMiddleware:
+    """
+    Mide las consultas de una fracción de las peticiones; no hace nada si el muestreo es 0.
+    Es sync y async: con ASGI no obliga a Django a adaptar la cadena de middlewares,
+    así las vistas async no pasan por un hilo.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.es_async = iscoroutinefunction(get_response)
+        if self.es_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.es_async:
+            return self._llamar_async(request)
+        if not _muestrear():
+            return self.get_response(request)
+        with _Medicion() as medicion, medir_en_este_hilo():
+            response = self.get_response(request)
+        return medicion.informar(request, response)
+
+    async def _llamar_async(self, request):
+        if not _muestrear():
+            return await self.get_response(request)
+        with _Medicion() as medicion:
+            # Las consultas de la petición se ejecutan en su hilo sync (sync_to_async thread_sensitive)
+            hilo = medir_en_este_hilo()
+            await sync_to_async(hilo.__enter__)()
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(hilo.__exit__)(None, None, None)
+        return medicion.informar(request, response)
@@ -0,0 +1,100 @@
+import json
+import time
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from panel.benchmark import comparar, ejecutar_benchmark, ejecutar_benchmark_concurrencia
+from panel.datos_sinteticos import sembrar
+
+
+class Command(BaseCommand):
+    help = (
+        "Crea una base temporal, la carga con datos sintéticos y mide consultas, tiempo y memoria "
+        "de cada vista del panel. Escribe un reporte JSON comparable entre corridas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--gestiones', type=int, default=2)
+        parser.add_argument('--eventos', type=int, default=30)
+        parser.add_argument('--productos', type=int, default=60)
+        parser.add_argument('--ventas', type=int, default=50000)
+        parser.add_argument('--egresos', type=int, help="Movimientos de egreso (por defecto, uno cada diez ventas)")
+        parser.add_argument('--repeticiones', type=int, default=3, help="Ejecuciones por vista para medir el tiempo")
+        parser.add_argument(
+            '--concurrencia', type=int, default=8,
+            help="Peticiones simultáneas al comparar vistas sync (WSGI) y async (ASGI); 0 para omitir",
+        )
+        parser.add_argument('--peticiones', type=int, default=48, help="Peticiones por vista en la comparación WSGI/ASGI")
+        parser.add_argument('--salida', default='benchmark_panel.json', help="Archivo JSON del reporte")
+        parser.add_argument('--comparar', metavar='REPORTE', help="Reporte previo contra el cual mostrar diferencias")
+
+    def handle(self, *args, **options):
+        anterior = None
+        if options['comparar']:
+            try:
+                with open(options['comparar'], encoding='utf-8') as archivo:
+                    anterior = json.load(archivo)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"No se pudo leer {options['comparar']}: {e}")
+
+        # Todo corre sobre una base de test descartable, nunca sobre la real
+        setup_test_environment()
+        nombre_original = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            inicio = time.perf_counter()
+            volumenes = sembrar(
+                gestiones=options['gestiones'], eventos=options['eventos'], productos=options['productos'],
+                ventas=options['ventas'], egresos=options['egresos'],
+            )
+            self.stdout.write(f"Datos sembrados en {time.perf_counter() - inicio:.1f}s")
+
+            usuario = get_user_model().objects.create_superuser('benchmark', password=None, nombre_completo='Benchmark')
+            vistas = ejecutar_benchmark(
+                usuario, volumenes.pop('evento_id'), volumenes.pop('producto_id'), options['repeticiones'],
+            )
+            concurrencia = {}
+            if options['concurrencia'] > 0:
+                concurrencia = ejecutar_benchmark_concurrencia(usuario, options['concurrencia'], options['peticiones'])
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+            teardown_test_environment()
+
+        reporte = {
+            'fecha': timezone.now().isoformat(timespec='seconds'),
+            'motor': connection.vendor,
+            'volumenes': volumenes,
+            'vistas': vistas,
+            'concurrencia': {'simultaneas': options['concurrencia'], 'vistas': concurrencia},
+        }
+        with open(options['salida'], 'w', encoding='utf-8') as archivo:
+            json.dump(reporte, archivo, indent=2, sort_keys=True, ensure_ascii=False)
+            archivo.write('\n')
+
+        self.stdout.write(f"{'Vista':28} {'Consultas':>9} {'Mediana ms':>11} {'Memoria KB':>11}")
+        for nombre, metricas in vistas.items():
+            presupuesto = metricas['presupuesto_consultas']
+            estilo = self.style.ERROR if presupuesto is not None and metricas['consultas'] > presupuesto else str
+            self.stdout.write(estilo(
+                f"{nombre:28} {metricas['consultas']:>9} {metricas['tiempo_ms']['mediana']:>11} {metricas['memoria_pico_kb']:>11}"
+            ))
+
+        if concurrencia:
+            self.stdout.write(f"\nWSGI vs ASGI con {options['concurrencia']} peticiones simultáneas (sin cache de reportes):")
+            self.stdout.write(f"{'Vista':28} {'Modo':>5} {'Mediana ms':>11} {'p95 ms':>9} {'Pet/s':>8}")
+            for nombre, modos in concurrencia.items():
+                for modo, metricas in modos.items():
+                    self.stdout.write(
+                        f"{nombre:28} {modo:>5} {metricas['mediana_ms']:>11} {metricas['p95_ms']:>9} "
+                        f"{metricas['peticiones_por_segundo']:>8}"
+                    )
+
+        if anterior:
+            self.stdout.write("\nDiferencias con el reporte anterior:")
+            for nombre, consultas_antes, consultas_ahora, ms_antes, ms_ahora in comparar(anterior, reporte):
+                self.stdout.write(
+                    f"{nombre:28} consultas {consultas_antes} -> {consultas_ahora}, mediana {ms_antes} -> {ms_ahora} ms"
+                )
+        self.stdout.write(self.style.SUCCESS(f"Reporte escrito en {options['salida']}"))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from panel.base_datos import optimizar
+
+
+class Command(BaseCommand):
+    help = (
+        "Actualiza las estadísticas del planificador de SQLite (PRAGMA optimize) y hace un "
+        "checkpoint del WAL. Pensado para correr periódicamente (p. ej. cada hora desde cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--analizar', action='store_true',
+            help="Ejecuta un ANALYZE completo (recomendado después de cargas masivas)",
+        )
+
+    def handle(self, *args, **options):
+        modo = optimizar(analizar=options['analizar'])
+        if modo is None:
+            self.stdout.write("La base no es SQLite: no hay nada que optimizar.")
+            return
+        self.stdout.write(self.style.SUCCESS(f"Base optimizada (journal_mode={modo})."))
@@ -0,0 +1,68 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db import connections
+from panel import artefactos
+import panel.tareas  # noqa: F401 (registra las tareas)
+from panel.trabajos import ejecutar, liberar_abandonados, purgar, tomar_siguiente
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker de la cola de trabajos en segundo plano (exportaciones y reconstrucción de "
+        "reportes). Pensado para correr como servicio aparte de los workers web."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=2, help="Trabajos que se ejecutan a la vez (por defecto 2)")
+        parser.add_argument('--espera', type=float, default=1.0, help="Segundos entre consultas cuando la cola está vacía")
+        parser.add_argument(
+            '--una-vez', action='store_true',
+            help="Procesa los trabajos pendientes y termina (para cron o pruebas)",
+        )
+
+    def handle(self, *args, **options):
+        liberados = liberar_abandonados()
+        purgados = purgar()
+        if liberados or purgados:
+            self.stdout.write(f"{liberados} trabajo(s) abandonados reencolados, {purgados} viejos eliminados.")
+        desalojados = artefactos.purgar()
+        if desalojados:
+            self.stdout.write(f"{desalojados} exportación(es) eliminadas de la cache.")
+
+        detener = threading.Event()
+        hilos = max(1, options['hilos'])
+        if hilos == 1:
+            procesados = self._procesar(detener, options['espera'], options['una_vez'])
+        else:
+            with ThreadPoolExecutor(max_workers=hilos, thread_name_prefix='trabajos') as pool:
+                futuros = [
+                    pool.submit(self._en_hilo, detener, options['espera'], options['una_vez']) for _ in range(hilos)
+                ]
+                try:
+                    procesados = sum(f.result() for f in futuros)
+                except KeyboardInterrupt:
+                    # Los trabajos en curso terminan; no se toman nuevos
+                    detener.set()
+                    procesados = sum(f.result() for f in futuros)
+        self.stdout.write(self.style.SUCCESS(f"{procesados} trabajo(s) procesados."))
+
+    def _en_hilo(self, detener, espera, una_vez):
+        try:
+            return self._procesar(detener, espera, una_vez)
+        finally:
+            connections.close_all()
+
+    def _procesar(self, detener, espera, una_vez):
+        procesados = 0
+        while not detener.is_set():
+            trabajo = tomar_siguiente()
+            if trabajo is None:
+                if una_vez:
+                    break
+                detener.wait(espera)
+                continue
+            ejecutar(trabajo)
+            procesados += 1
+            self.stdout.write(f"{trabajo}")
+        return procesados
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from panel.busqueda import reconstruir_indice, PRODUCTOS, MOVIMIENTOS
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye el índice de búsqueda de texto completo (nombres de productos y "
+        "descripciones de movimientos). Necesario después de cargas que no pasan por las signals."
+    )
+
+    def handle(self, *args, **options):
+        cargadas = reconstruir_indice()
+        self.stdout.write(self.style.SUCCESS(
+            f"Índice de búsqueda reconstruido: {cargadas[PRODUCTOS]} producto(s), "
+            f"{cargadas[MOVIMIENTOS]} movimiento(s)."
+        ))
@@ -0,0 +1,53 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from eventos.models import Evento
+from panel.datos_sinteticos import sembrar
+from panel.planes import verificar_planes
+
+
+class _Revertir(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Ejecuta EXPLAIN QUERY PLAN sobre las consultas de las vistas del panel y falla "
+        "si alguna recorre completa una tabla de ventas, movimientos o productos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sembrar', type=int, metavar='VENTAS',
+            help="Inserta esa cantidad de ventas/movimientos sintéticos y los descarta al terminar",
+        )
+
+    def handle(self, *args, **options):
+        problemas = {}
+        try:
+            with transaction.atomic():
+                if options['sembrar']:
+                    evento_id = sembrar(ventas=options['sembrar'])['evento_id']
+                else:
+                    evento_id = Evento.objects.order_by('-fecha').values_list('pk', flat=True).first()
+                    if evento_id is None:
+                        raise CommandError("No hay eventos cargados: usá --sembrar para generar datos de prueba")
+                usuario = get_user_model().objects.order_by('-is_superuser', 'pk').first()
+                if usuario is None and options['sembrar']:
+                    usuario = get_user_model().objects.create_user('verificador_planes', nombre_completo='Verificador')
+                if usuario is None:
+                    raise CommandError("Se necesita al menos un usuario para ejecutar las vistas")
+                problemas = verificar_planes(usuario, evento_id)
+                # Las vistas no deberían escribir, pero igual se descarta todo lo hecho
+                raise _Revertir
+        except _Revertir:
+            pass
+
+        for url, detalles in problemas.items():
+            self.stdout.write(self.style.ERROR(url))
+            for sql, tabla, plan in detalles:
+                self.stdout.write(f"  recorrido completo de {tabla}: {' | '.join(plan)}")
+                self.stdout.write(f"    {sql}")
+        if problemas:
+            raise CommandError(f"{len(problemas)} vista(s) con recorridos completos")
+        self.stdout.write(self.style.SUCCESS("Todas las consultas de las vistas usan índices."))
@@ -0,0 +1,53 @@
+from django.db import migrations
+
+INDICES = {
+    'busqueda_producto': ('ventas', 'Producto', 'nombre'),
+    'busqueda_movimiento': ('tesoreria', 'Movimiento', 'descripcion'),
+}
+
+
+def _fts5_disponible(connection):
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA compile_options")
+        return 'ENABLE_FTS5' in {fila[0] for fila in cursor.fetchall()}
+
+
+def crear_indices(apps, schema_editor):
+    """
+    Crea y carga los índices. Con SQLite y FTS5 son tablas virtuales FTS5; si no, tablas
+    comunes con las mismas columnas, sobre las que panel.busqueda busca con LIKE.
+    """
+    fts5 = _fts5_disponible(schema_editor.connection)
+    for indice, (app, modelo, campo) in INDICES.items():
+        if fts5:
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE {indice} USING fts5("
+                "texto, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+            )
+        else:
+            schema_editor.execute(f"CREATE TABLE {indice} (rowid BIGINT PRIMARY KEY, texto TEXT NOT NULL)")
+        tabla = apps.get_model(app, modelo)._meta.db_table
+        schema_editor.execute(
+            f"INSERT INTO {indice} (rowid, texto) SELECT id, COALESCE({campo}, '') FROM {tabla}"
+        )
+
+
+def borrar_indices(apps, schema_editor):
+    for indice in INDICES:
+        schema_editor.execute(f"DROP TABLE {indice}")
+
+
+class Migration(migrations.Migration):
+    """Índices de búsqueda de texto (ver panel.busqueda): rowid = id del producto o movimiento."""
+
+    dependencies = [
+        ('panel', '0001_trabajos'),
+        ('ventas', '0011_producto_contadores'),
+        ('tesoreria', '0006_movimiento_saldo'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indices, borrar_indices),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('panel', '0002_busqueda'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeneracionReporte',
+            fields=[
+                ('modelo', models.CharField(max_length=20, primary_key=True, serialize=False)),
+                ('numero', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+    ]
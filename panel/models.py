@@ -1,3 +1,51 @@
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+
+class Trabajo(models.Model):
+    """Trabajo en segundo plano (exportación o reconstrucción de reportes); ver panel.trabajos."""
+    PENDIENTE = 'pendiente'
+    EN_CURSO = 'en_curso'
+    TERMINADO = 'terminado'
+    ERROR = 'error'
+    ESTADO_CHOICES = [
+        (PENDIENTE, 'Pendiente'),
+        (EN_CURSO, 'En curso'),
+        (TERMINADO, 'Terminado'),
+        (ERROR, 'Error'),
+    ]
+    TIPO_CHOICES = [
+        ('exportar_historial', 'Exportar historial de ventas'),
+        ('exportar_evento', 'Exportar detalle de evento'),
+        ('reconstruir_resumenes', 'Reconstruir resúmenes de ventas'),
+        ('recalcular_saldos', 'Recalcular libro de saldos'),
+    ]
+    tipo = models.CharField(max_length=40, choices=TIPO_CHOICES)
+    parametros = models.JSONField(default=dict, blank=True)
+    estado = models.CharField(max_length=10, choices=ESTADO_CHOICES, default=PENDIENTE)
+    progreso = models.PositiveSmallIntegerField(default=0, help_text="Porcentaje completado (0-100)")
+    archivo = models.CharField(max_length=255, blank=True, help_text="Archivo generado, relativo a TRABAJOS_DIR")
+    error = models.TextField(blank=True)
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_inicio = models.DateTimeField(null=True, blank=True)
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-fecha_creacion']
+        indexes = [
+            # El worker toma el pendiente más antiguo
+            models.Index(fields=['estado', 'fecha_creacion'], name='trabajo_estado_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} #{self.pk} ({self.get_estado_display()})"
+
+
+class GeneracionReporte(models.Model):
+    """Contador de generación de los datos de un modelo, para invalidar la cache de reportes; ver panel.cache_reportes."""
+    modelo = models.CharField(max_length=20, primary_key=True)
+    numero = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.modelo}: {self.numero}"
@@ -0,0 +1,112 @@
+"""
+Paginación por cursor (keyset) para listados que crecen sin límite.
+
+En lugar de COUNT + OFFSET, cada página se pide "después de" (o "antes de") la
+última fila vista, identificada por el par (campo de orden, id). La consulta
+usa el índice sobre ese par y cuesta lo mismo en la página 1 que en la 500.
+"""
+import base64
+from django.db.models import Q
+
+
+def _codificar(valor, pk):
+    texto = f"{valor.isoformat() if hasattr(valor, 'isoformat') else valor}|{pk}"
+    return base64.urlsafe_b64encode(texto.encode()).decode()
+
+
+def _decodificar(cursor, campo):
+    """Devuelve (valor, pk) o None si el cursor falta o es inválido."""
+    if not cursor:
+        return None
+    try:
+        valor, pk = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit('|', 1)
+        return campo.to_python(valor), int(pk)
+    except Exception:
+        return None
+
+
+def _posteriores(campo, valor, pk, descendente):
+    """Filas que van después de (valor, pk) en el orden indicado."""
+    op = 'lt' if descendente else 'gt'
+    return Q(**{f'{campo}__{op}': valor}) | Q(**{campo: valor, f'pk__{op}': pk})
+
+
+class PaginaKeyset:
+    """Página de resultados con enlaces a la siguiente y la anterior."""
+
+    def __init__(self, objetos, request, cursor_siguiente=None, cursor_anterior=None):
+        self.object_list = objetos
+        self._request = request
+        self.cursor_siguiente = cursor_siguiente
+        self.cursor_anterior = cursor_anterior
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.cursor_siguiente is not None
+
+    @property
+    def has_previous(self):
+        return self.cursor_anterior is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def _url(self, parametro, cursor):
+        params = self._request.GET.copy()
+        for clave in ('despues', 'antes', 'page', 'export'):
+            params.pop(clave, None)
+        params[parametro] = cursor
+        return f"?{params.urlencode()}"
+
+    @property
+    def url_siguiente(self):
+        return self._url('despues', self.cursor_siguiente) if self.has_next else None
+
+    @property
+    def url_anterior(self):
+        return self._url('antes', self.cursor_anterior) if self.has_previous else None
+
+
+def paginar_por_cursor(queryset, request, campo='fecha', descendente=True, por_pagina=20):
+    """
+    Devuelve la PaginaKeyset pedida por ?despues=<cursor> o ?antes=<cursor>
+    ordenando por (campo, id). Las filas con `campo` nulo no se paginan.
+    """
+    campo_modelo = queryset.model._meta.get_field(campo)
+    despues = _decodificar(request.GET.get('despues'), campo_modelo)
+    antes = None if despues else _decodificar(request.GET.get('antes'), campo_modelo)
+
+    # Para ir hacia atrás se recorre el orden invertido y luego se da vuelta el resultado
+    hacia_atras = antes is not None
+    desc = descendente != hacia_atras
+    signo = '-' if desc else ''
+    qs = queryset.order_by(f'{signo}{campo}', f'{signo}pk')
+    cursor = antes or despues
+    if cursor:
+        qs = qs.filter(_posteriores(campo, cursor[0], cursor[1], desc))
+
+    filas = list(qs[:por_pagina + 1])
+    hay_mas = len(filas) > por_pagina
+    filas = filas[:por_pagina]
+    if hacia_atras:
+        filas.reverse()
+
+    if not filas:
+        return PaginaKeyset(filas, request)
+
+    primero = _codificar(getattr(filas[0], campo), filas[0].pk)
+    ultimo = _codificar(getattr(filas[-1], campo), filas[-1].pk)
+    if hacia_atras:
+        return PaginaKeyset(filas, request, cursor_siguiente=ultimo, cursor_anterior=primero if hay_mas else None)
+    return PaginaKeyset(
+        filas, request,
+        cursor_siguiente=ultimo if hay_mas else None,
+        cursor_anterior=primero if despues else None,
+    )
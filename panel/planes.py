@@ -0,0 +1,98 @@
+"""
+Verificación de los planes de consulta de las vistas del panel.
+
+Cada vista se ejecuta capturando sus consultas; cada SELECT se pasa por
+`EXPLAIN QUERY PLAN` y se reporta como problema cualquier recorrido completo
+(`SCAN tabla` sin índice) sobre las tablas que crecen con el uso, cuando la
+consulta filtra (WHERE) u ordena en memoria (TEMP B-TREE): son los casos que un
+índice resuelve. Se aceptan los recorridos de índice (`SCAN tabla USING INDEX`)
+y los agregados sin filtro sobre toda la tabla, que leen todas las filas igual.
+
+Lo usan el comando `verificar_planes` y los tests del panel.
+"""
+import re
+from datetime import timedelta
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+VENTAS = 'ventas_venta'
+MOVIMIENTOS = 'tesoreria_movimiento'
+PRODUCTOS = 'ventas_producto'
+CAMBIOS_STOCK = 'ventas_cambiostock'
+
+
+def vistas_a_verificar(evento_id, desde):
+    """(url, tablas que no pueden recorrerse completas) para cada vista y combinación de filtros."""
+    historial = reverse('historial_ventas')
+    balance = reverse('balance_tesoreria')
+    return [
+        (reverse('inicio_dashboard'), {VENTAS}),
+        (historial, {VENTAS}),
+        (f'{historial}?evento={evento_id}', {VENTAS}),
+        (f'{historial}?evento={evento_id}&desde={desde}', {VENTAS}),
+        (f'{historial}?medio=Efectivo&desde={desde}', {VENTAS}),
+        (f'{historial}?order=precio_unitario_venta', {VENTAS}),
+        (reverse('registrar_ventas'), {VENTAS}),
+        (f"{reverse('stock_actual')}?desde=0", {CAMBIOS_STOCK}),
+        (reverse('lista_productos'), {VENTAS}),
+        (f"{reverse('lista_productos')}?estado=activos", {VENTAS, PRODUCTOS}),
+        (reverse('evento_detalles', args=[evento_id]), {VENTAS}),
+        (balance, {MOVIMIENTOS}),
+        (f'{balance}?tipo=Egreso', {MOVIMIENTOS}),
+        (f'{balance}?evento={evento_id}&desde={desde}', {MOVIMIENTOS}),
+        (reverse('ingresos_tesoreria'), {MOVIMIENTOS}),
+        (f"{reverse('ingresos_tesoreria')}?evento={evento_id}", {MOVIMIENTOS}),
+        (f"{reverse('egresos_tesoreria')}?desde={desde}", {MOVIMIENTOS}),
+    ]
+
+
+def _recorridos_completos(detalle):
+    """Tablas recorridas completas en una línea de EXPLAIN QUERY PLAN."""
+    m = re.match(r'SCAN (?:TABLE )?(\w+)(.*)', detalle)
+    if m and 'USING' not in m.group(2):
+        return {m.group(1)}
+    return set()
+
+
+def explicar(sql):
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return [fila[-1] for fila in cursor.fetchall()]
+
+
+def verificar_vista(url, tablas, usuario):
+    """Devuelve la lista de (sql, tabla, plan) con recorridos completos en las consultas de la vista."""
+    request = RequestFactory().get(url)
+    request.user = usuario or AnonymousUser()
+    match = resolve(request.path_info)
+    with CaptureQueriesContext(connection) as consultas:
+        match.func(request, *match.args, **match.kwargs)
+
+    problemas = []
+    for consulta in consultas.captured_queries:
+        sql = consulta['sql']
+        if not sql.lstrip().upper().startswith('SELECT'):
+            continue
+        plan = explicar(sql)
+        if ' WHERE ' not in sql and not any('TEMP B-TREE' in detalle for detalle in plan):
+            continue
+        for detalle in plan:
+            for tabla in _recorridos_completos(detalle) & tablas:
+                problemas.append((sql, tabla, plan))
+    return problemas
+
+
+def verificar_planes(usuario, evento_id, desde=None):
+    """Recorre todas las vistas y devuelve {url: problemas} sólo para las que tienen recorridos completos."""
+    desde = desde or (timezone.localdate() - timedelta(days=30))
+    resultado = {}
+    for url, tablas in vistas_a_verificar(evento_id, desde.isoformat()):
+        problemas = verificar_vista(url, tablas, usuario)
+        if problemas:
+            resultado[url] = problemas
+    return resultado
+
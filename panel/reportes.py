@@ -0,0 +1,111 @@
+"""
+Consultas de los reportes del panel (historial de ventas y detalle de evento).
+
+Las usan las vistas y las exportaciones en segundo plano (panel.tareas), así el
+worker no depende de los módulos de vistas.
+"""
+from ventas.models import Venta, ResumenDiario, ResumenEventoProducto
+from ventas.reportes import (
+    totales_resumen, resumen_por_evento, resumen_por_producto, resumen_por_medio, totales_ventas, totales_por_evento,
+)
+from panel.busqueda import filtrar_por_texto, PRODUCTOS
+from panel.filtros import filtros_de, filtrar_ventas
+
+
+def consulta_historial(params):
+    """
+    Ventas filtradas y totales del historial para los parámetros `params` (QueryDict
+    del querystring). La usan la vista y la exportación en segundo plano.
+    """
+    query = params.get('q', '')
+    filtros = filtros_de(params)
+    medio = filtros['medio']
+    order = params.get('order', '-fecha_hora')
+
+    ventas = filtrar_ventas(Venta.objects.select_related('producto', 'evento'), filtros)
+    resumenes_diarios = ResumenDiario.objects.all()
+    resumenes_evento = ResumenEventoProducto.objects.all()
+
+    if query:
+        # Productos que coinciden en el índice de búsqueda: se filtra por producto_id, sin JOIN
+        ventas = filtrar_por_texto(ventas, PRODUCTOS, query, 'producto_id')
+        resumenes_diarios = filtrar_por_texto(resumenes_diarios, PRODUCTOS, query, 'producto_id')
+        resumenes_evento = filtrar_por_texto(resumenes_evento, PRODUCTOS, query, 'producto_id')
+    if medio:
+        resumenes_diarios = resumenes_diarios.filter(medio_de_pago=medio)
+        resumenes_evento = resumenes_evento.filter(medio_de_pago=medio)
+    if filtros['evento']:
+        resumenes_evento = resumenes_evento.filter(evento_id=filtros['evento'])
+    if filtros['desde']:
+        resumenes_diarios = resumenes_diarios.filter(fecha__gte=filtros['desde'])
+    if filtros['hasta']:
+        resumenes_diarios = resumenes_diarios.filter(fecha__lte=filtros['hasta'])
+    if order not in ['fecha_hora', '-fecha_hora', 'precio_unitario_venta', '-precio_unitario_venta']:
+        order = '-fecha_hora'
+    ventas = ventas.order_by(order)
+
+    # Totales y gráfico por evento: de las tablas de resumen cuando alcanzan
+    # (ResumenEventoProducto no tiene fecha, así que evento + fechas se agrega sobre las ventas)
+    por_fecha = filtros['desde'] or filtros['hasta']
+    if filtros['evento'] and por_fecha:
+        totales = totales_ventas(ventas)
+        por_evento = totales_por_evento(ventas.exclude(evento__isnull=True))
+    elif filtros['evento']:
+        totales = totales_resumen(resumenes_evento)
+        por_evento = resumen_por_evento(resumenes_evento)
+    elif por_fecha:
+        totales = totales_resumen(resumenes_diarios)
+        por_evento = totales_por_evento(ventas.exclude(evento__isnull=True))
+    else:
+        totales = totales_resumen(resumenes_diarios)
+        por_evento = resumen_por_evento(resumenes_evento)
+
+    # Por evento_id, con el nombre como etiqueta: dos eventos con el mismo nombre (de distintas
+    # gestiones) no se pisan, y el resto que queda como "Sin evento" no se infla
+    eventos_data = {e['evento_id']: {'nombre': e['evento__nombre'], 'total': float(e['bruto'])} for e in por_evento}
+    sin_evento = float(totales['bruto']) - sum(e['total'] for e in eventos_data.values())
+    if round(sin_evento, 2) > 0:
+        eventos_data[None] = {'nombre': "Sin evento", 'total': sin_evento}
+
+    return {
+        'ventas': ventas,
+        'query': query,
+        'filtros': filtros,
+        'medio': medio,
+        'order': order,
+        'totales': totales,
+        'eventos_data': eventos_data,
+    }
+
+
+def datos_evento(evento):
+    """Totales, productos y medios de pago de un evento (de la tabla de resumen), para la vista y las exportaciones."""
+    resumenes = ResumenEventoProducto.objects.filter(evento=evento)
+
+    # Totales del evento leídos de la tabla de resumen por evento y producto
+    totales = totales_resumen(resumenes)
+
+    # Productos vendidos
+    por_producto = list(resumen_por_producto(resumenes))
+
+    # Métodos de pago
+    pagos_stats = {m['medio_de_pago']: m['ventas'] for m in resumen_por_medio(resumenes)}
+
+    # Datos de exportación XLSX
+    productos_export = [
+        {
+            'Producto': p['producto__nombre'],
+            'Cantidad': p['unidades'],
+            'Precio Unitario Venta': round(float(p['bruto']) / p['unidades'], 2) if p['unidades'] else 0,
+            'Precio Unitario Compra': round(float(p['bruto'] - p['neto']) / p['unidades'], 2) if p['unidades'] else 0,
+            'Total': float(p['bruto']),
+            'Ganancia': float(p['neto']),
+        }
+        for p in por_producto
+    ]
+    return {
+        'totales': totales,
+        'por_producto': por_producto,
+        'pagos_stats': pagos_stats,
+        'productos_export': productos_export,
+    }
@@ -1,59 +1,70 @@
-from decimal import Decimal
+from django.db.models import F
 from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
 from django.dispatch import receiver
-from django.core.exceptions import ObjectDoesNotExist
 from ventas.models import Venta, Producto
 from tesoreria.models import Movimiento
 from eventos.models import Evento
+from ventas.resumenes import acumular_ventas
+from ventas.stock import registrar_cambios
+from tesoreria.cierres import ajustar_cierres
+from tesoreria.libro import insertar, retirar
+from panel.busqueda import indexar_productos, indexar_movimientos, quitar_producto, quitar_movimiento
+from panel.cache_reportes import invalidar, VENTAS, MOVIMIENTOS, PRODUCTOS, EVENTOS
+
+
+def _delta_venta(venta, signo=1):
+    """Aporte de una venta a los totales de su evento (bruto, neto, ventas, unidades)."""
+    return (signo * venta.total(), signo * venta.ganancia(), signo, signo * venta.cantidad)
 
 
 # ---------- PRE SAVE ----------
+def _ajustar_stock(producto_id, cantidad, ventas=0):
+    """
+    Suma `cantidad` (negativa para descontar) al stock con un UPDATE condicional:
+    nunca deja el stock negativo ni pisa descuentos concurrentes. En el mismo UPDATE
+    ajusta los contadores del producto: lo que sale del stock se suma a total_vendido
+    y `ventas` (1 al vender, -1 al devolver) a total_ventas.
+    """
+    productos = Producto.objects.filter(pk=producto_id)
+    if cantidad < 0:
+        productos = productos.filter(stock__gte=-cantidad)
+    if not productos.update(
+        stock=F("stock") + cantidad,
+        total_vendido=F("total_vendido") - cantidad,
+        total_ventas=F("total_ventas") + ventas,
+    ):
+        producto = Producto.objects.filter(pk=producto_id).only("nombre", "stock").first()
+        if producto is None:
+            raise ValueError(f"Producto {producto_id} no encontrado")
+        raise ValueError(f"Stock insuficiente para {producto.nombre}. Disponible: {producto.stock}")
+    registrar_cambios([producto_id])
+
+
 @receiver(pre_save, sender=Venta)
 def ajustar_stock_y_recaudacion_antes_guardar(sender, instance, **kwargs):
     """
-    Antes de guardar una venta:
+    Antes de guardar una venta (alta o edición fuera de ventas.servicios, p. ej. el admin):
     - Si es nueva, descuenta stock.
-    - Si es edición, ajusta diferencia de stock.
+    - Si es edición, ajusta la diferencia de stock.
     - No toca tesorería todavía.
     """
-    if instance.pk:
-        try:
-            prev = Venta.objects.get(pk=instance.pk)
-        except ObjectDoesNotExist:
-            prev = None
-    else:
-        prev = None
+    prev = Venta.objects.filter(pk=instance.pk).first() if instance.pk else None
+
+    # Se guarda para calcular la diferencia de totales del evento en post_save
+    instance._venta_previa = prev
 
-    # Si es nueva venta → reducir stock
     if prev is None:
-        if instance.producto.stock < instance.cantidad:
-            raise ValueError(f"Stock insuficiente para {instance.producto.nombre}. Disponible: {instance.producto.stock}")
-        instance.producto.stock -= instance.cantidad
-        instance.producto.save(update_fields=["stock"])
-        return
-
-    # Si se está editando
-    if prev.producto_id != instance.producto_id:
-        # Devolver stock al producto anterior
-        prev.producto.stock += prev.cantidad
-        prev.producto.save(update_fields=["stock"])
-
-        # Descontar del nuevo producto
-        if instance.producto.stock < instance.cantidad:
-            raise ValueError(f"Stock insuficiente para {instance.producto.nombre}. Disponible: {instance.producto.stock}")
-        instance.producto.stock -= instance.cantidad
-        instance.producto.save(update_fields=["stock"])
+        _ajustar_stock(instance.producto_id, -instance.cantidad, ventas=1)
+    elif prev.producto_id != instance.producto_id:
+        # Devolver stock al producto anterior y descontar del nuevo
+        _ajustar_stock(prev.producto_id, prev.cantidad, ventas=-1)
+        _ajustar_stock(instance.producto_id, -instance.cantidad, ventas=1)
+    elif instance.cantidad != prev.cantidad:
+        _ajustar_stock(instance.producto_id, prev.cantidad - instance.cantidad)
     else:
-        # Si cambió solo la cantidad
-        diff = instance.cantidad - prev.cantidad
-        if diff != 0:
-            if diff > 0:  # vendió más
-                if instance.producto.stock < diff:
-                    raise ValueError(f"Stock insuficiente para aumentar cantidad de {instance.producto.nombre}")
-                instance.producto.stock -= diff
-            else:  # redujo la cantidad
-                instance.producto.stock += abs(diff)
-            instance.producto.save(update_fields=["stock"])
+        # El stock no cambia, pero la versión del feed también identifica los datos de
+        # ventas para la cache de exportaciones (panel.artefactos): se avanza igual
+        registrar_cambios([instance.producto_id])
 
 
 # ---------- POST SAVE ----------
@@ -62,59 +73,159 @@ def crear_o_actualizar_movimiento_y_recaudacion(sender, instance, created, **kwa
     """
     Luego de guardar una venta:
     - Crea o actualiza el Movimiento en tesorería.
-    - Actualiza recaudación_total del evento.
+    - Ajusta los totales del evento y las tablas de resumen con la diferencia
+      respecto de la versión previa.
     """
     descripcion = f"Venta de {instance.producto.nombre} (venta_id={instance.id})"
-    ganancia = Decimal(instance.total()) - (Decimal(instance.cantidad) * Decimal(instance.producto.precio_compra))
-
-    # Buscar si ya existe el movimiento
-    mov_qs = Movimiento.objects.filter(descripcion__icontains=f"venta_id={instance.id}")
-    if mov_qs.exists():
-        mov = mov_qs.first()
-        mov.monto = ganancia
-        mov.descripcion = descripcion
-        mov.evento = instance.evento
-        mov.save(update_fields=["monto", "descripcion", "evento"])
-    else:
+    monto = instance.total()
+
+    # El movimiento está vinculado a la venta por clave foránea (búsqueda por índice)
+    actualizados = 0
+    if not created:
+        # Con save() (no update()) para que las signals de Movimiento ajusten los cierres
+        movimiento = Movimiento.objects.filter(venta=instance).first()
+        if movimiento is not None:
+            movimiento.monto = monto
+            movimiento.descripcion = descripcion
+            movimiento.evento = instance.evento
+            movimiento.save()
+            actualizados = 1
+    if not actualizados:
         Movimiento.objects.create(
             tipo="Ingreso",
             descripcion=descripcion,
-            monto=ganancia,
-            evento=instance.evento
+            monto=monto,
+            evento=instance.evento,
+            venta=instance
         )
 
-    # Actualizar la recaudación del evento
-    if instance.evento:
-        recaudacion_actual = getattr(instance.evento, "recaudacion_total", Decimal("0.00")) or Decimal("0.00")
-        # Recalcular todas las ventas de este evento para mantener coherencia
-        total_ganancia = sum(
-            Decimal(v.total()) - (Decimal(v.cantidad) * Decimal(v.producto.precio_compra))
-            for v in Venta.objects.filter(evento=instance.evento)
-        )
-        instance.evento.recaudacion_total = total_ganancia.quantize(Decimal("0.01"))
-        instance.evento.save(update_fields=["recaudacion_total"])
+    # Actualizar los totales del evento por diferencia (sin recorrer sus ventas); aunque la
+    # diferencia sea cero se aplica, para que avance la fecha de actualización del evento
+    prev = getattr(instance, "_venta_previa", None)
+    bruto, neto, ventas, unidades = _delta_venta(instance)
+    if prev is not None:
+        prev_bruto, prev_neto, prev_ventas, prev_unidades = _delta_venta(prev, signo=-1)
+        if prev.evento_id == instance.evento_id:
+            bruto, neto = bruto + prev_bruto, neto + prev_neto
+            ventas, unidades = ventas + prev_ventas, unidades + prev_unidades
+        else:
+            Evento.aplicar_delta(prev.evento_id, prev_bruto, prev_neto, prev_ventas, prev_unidades)
+    Evento.aplicar_delta(instance.evento_id, bruto, neto, ventas, unidades)
+
+    # Tablas de resumen (por día y por evento)
+    if prev is not None:
+        acumular_ventas([prev], signo=-1)
+    acumular_ventas([instance])
 
 
 # ---------- PRE DELETE ----------
 @receiver(pre_delete, sender=Venta)
 def devolver_stock_antes_de_eliminar(sender, instance, **kwargs):
-    """Antes de eliminar una venta, devolver el stock al producto."""
-    instance.producto.stock += instance.cantidad
-    instance.producto.save(update_fields=["stock"])
+    """Antes de eliminar una venta, devolver el stock al producto y descontarla de sus contadores."""
+    _ajustar_stock(instance.producto_id, instance.cantidad, ventas=-1)
 
 
 # ---------- POST DELETE ----------
 @receiver(post_delete, sender=Venta)
 def eliminar_movimiento_y_actualizar_recaudacion(sender, instance, **kwargs):
-    """Después de eliminar una venta, eliminar el movimiento y actualizar la recaudación."""
-    Movimiento.objects.filter(descripcion__icontains=f"venta_id={instance.id}").delete()
+    """
+    Después de eliminar una venta, descontar sus totales del evento y de los resúmenes.
+    El movimiento vinculado se elimina en cascada junto con la venta.
+    """
+    Evento.aplicar_delta(instance.evento_id, *_delta_venta(instance, signo=-1))
+    acumular_ventas([instance], signo=-1)
 
-    if instance.evento:
-        total_ganancia = sum(
-            Decimal(v.total()) - (Decimal(v.cantidad) * Decimal(v.producto.precio_compra))
-            for v in Venta.objects.filter(evento=instance.evento)
-        )
-        # 🔹 Convertir explícitamente a Decimal antes de quantize()
-        total_ganancia = Decimal(total_ganancia).quantize(Decimal("0.01"))
-        instance.evento.recaudacion_total = total_ganancia
-        instance.evento.save(update_fields=["recaudacion_total"])
+
+# ---------- CIERRES DE GESTIÓN ----------
+@receiver(pre_save, sender=Movimiento)
+def guardar_movimiento_previo(sender, instance, **kwargs):
+    instance._movimiento_previo = Movimiento.objects.filter(pk=instance.pk).first() if instance.pk else None
+
+
+@receiver(post_save, sender=Movimiento)
+def ajustar_cierres_al_guardar(sender, instance, **kwargs):
+    """Un movimiento creado o editado con fecha anterior a un corte corrige los cierres por diferencia."""
+    prev = getattr(instance, "_movimiento_previo", None)
+    if prev is not None:
+        ajustar_cierres(prev, signo=-1)
+    ajustar_cierres(instance)
+
+
+@receiver(post_delete, sender=Movimiento)
+def ajustar_cierres_al_eliminar(sender, instance, **kwargs):
+    ajustar_cierres(instance, signo=-1)
+
+
+# ---------- LIBRO DE SALDOS ----------
+@receiver(post_save, sender=Movimiento)
+def asentar_en_libro(sender, instance, **kwargs):
+    """Asienta el saldo acumulado del movimiento y corrige los posteriores si cambió el importe o la fecha."""
+    prev = getattr(instance, "_movimiento_previo", None)
+    if prev is not None:
+        if (prev.tipo, prev.monto, prev.fecha) == (instance.tipo, instance.monto, instance.fecha):
+            return
+        retirar(prev)
+    insertar(instance)
+
+
+@receiver(post_delete, sender=Movimiento)
+def retirar_del_libro(sender, instance, **kwargs):
+    retirar(instance)
+
+
+# ---------- ÍNDICE DE BÚSQUEDA ----------
+@receiver(post_save, sender=Movimiento)
+def indexar_movimiento(sender, instance, **kwargs):
+    prev = getattr(instance, "_movimiento_previo", None)
+    if prev is None or prev.descripcion != instance.descripcion:
+        indexar_movimientos([instance])
+
+
+@receiver(post_delete, sender=Movimiento)
+def quitar_movimiento_del_indice(sender, instance, **kwargs):
+    quitar_movimiento(instance.pk)
+
+
+@receiver(post_save, sender=Producto)
+def indexar_producto(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or "nombre" in update_fields:
+        indexar_productos([instance])
+
+
+@receiver(post_delete, sender=Producto)
+def quitar_producto_del_indice(sender, instance, **kwargs):
+    quitar_producto(instance.pk)
+
+
+# ---------- PRODUCTOS ----------
+@receiver(post_save, sender=Producto)
+@receiver(post_delete, sender=Producto)
+def registrar_cambio_de_stock(sender, instance, **kwargs):
+    """Cada guardado o baja de un producto (stock, precio o estado) avanza la versión del feed de stock."""
+    registrar_cambios([instance.pk])
+
+
+# ---------- CACHE DE REPORTES ----------
+@receiver(post_save, sender=Venta)
+@receiver(post_delete, sender=Venta)
+def invalidar_reportes_por_venta(sender, **kwargs):
+    """Una venta cambia stock, movimientos y los totales de su evento."""
+    invalidar(VENTAS, MOVIMIENTOS, PRODUCTOS, EVENTOS)
+
+
+@receiver(post_save, sender=Movimiento)
+@receiver(post_delete, sender=Movimiento)
+def invalidar_reportes_por_movimiento(sender, **kwargs):
+    invalidar(MOVIMIENTOS)
+
+
+@receiver(post_save, sender=Producto)
+@receiver(post_delete, sender=Producto)
+def invalidar_reportes_por_producto(sender, **kwargs):
+    invalidar(PRODUCTOS)
+
+
+@receiver(post_save, sender=Evento)
+@receiver(post_delete, sender=Evento)
+def invalidar_reportes_por_evento(sender, **kwargs):
+    invalidar(EVENTOS)
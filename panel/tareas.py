@@ -0,0 +1,75 @@
+"""
+Tareas que ejecuta el worker de trabajos (`manage.py procesar_trabajos`).
+
+Cada una recibe el Trabajo y sus parámetros, informa el progreso y devuelve el
+nombre del archivo generado (relativo a TRABAJOS_DIR) o None. Las exportaciones
+pasan por la cache de panel.artefactos: si los datos no cambiaron desde la última,
+el trabajo sólo copia el archivo.
+"""
+import shutil
+from django.http import QueryDict
+from django.utils.dateparse import parse_datetime
+from eventos.models import Evento
+from ventas.models import Venta
+from ventas.resumenes import reconstruir_resumenes, reconstruir_contadores
+from tesoreria.libro import recalcular
+from panel import artefactos
+from panel.cache_reportes import invalidar, VENTAS, MOVIMIENTOS, PRODUCTOS
+from panel.exportaciones import escribir_xlsx, hojas_evento, hojas_historial
+from panel.reportes import consulta_historial, datos_evento
+from panel.trabajos import tarea, ruta_archivo, con_progreso
+
+
+def _exportar(trabajo, nombre, clave, armar):
+    """`armar()` devuelve (hojas, total de filas del detalle); sólo se llama si el artefacto no está en la cache."""
+    def generar(destino):
+        hojas, total_filas = armar()
+        # La última hoja es el detalle de ventas: es la que marca el progreso
+        titulo, encabezados, filas = hojas[-1]
+        hojas[-1] = (titulo, encabezados, con_progreso(trabajo, filas, total_filas))
+        escribir_xlsx(destino, hojas)
+
+    destino = ruta_archivo(trabajo, nombre)
+    with artefactos.abrir(clave, generar) as origen, open(destino, 'wb') as copia:
+        shutil.copyfileobj(origen, copia)
+    return f'{trabajo.pk}/{destino.name}'
+
+
+@tarea('exportar_historial')
+def exportar_historial(trabajo, params, nombre):
+    params = QueryDict(params)
+
+    def armar():
+        datos = consulta_historial(params)
+        hojas = hojas_historial(datos['ventas'], datos['eventos_data'], datos['totales']['bruto'])
+        return hojas, datos['totales']['ventas']
+
+    return _exportar(trabajo, nombre, artefactos.clave_historial(params), armar)
+
+
+@tarea('exportar_evento')
+def exportar_evento(trabajo, evento_id, nombre):
+    evento = Evento.objects.get(pk=evento_id)
+
+    def armar():
+        datos = datos_evento(evento)
+        totales = datos['totales']
+        hojas = hojas_evento(
+            evento, datos['productos_export'], totales['bruto'], totales['neto'], Venta.objects.filter(evento=evento),
+        )
+        return hojas, totales['ventas']
+
+    return _exportar(trabajo, nombre, artefactos.clave_evento(evento), armar)
+
+
+@tarea('reconstruir_resumenes')
+def tarea_reconstruir_resumenes(trabajo):
+    reconstruir_resumenes()
+    reconstruir_contadores()
+    invalidar(VENTAS, PRODUCTOS)
+
+
+@tarea('recalcular_saldos')
+def tarea_recalcular_saldos(trabajo, desde=None):
+    recalcular(parse_datetime(desde) if desde else None)
+    invalidar(MOVIMIENTOS)
@@ -1,3 +1,1416 @@
-from django.test import TestCase
+import csv
+import glob
+import gzip
+import io
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+from asgiref.sync import async_to_sync
+from openpyxl import load_workbook
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import Count, F, Sum
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.handlers.asgi import ASGIHandler
+from django.http import QueryDict
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import urlencode
+from usuarios.models import Usuario
+from eventos.models import Evento
+from tesoreria.models import Movimiento
+from tesoreria.cierres import cerrar_gestion, saldos, saldos_de, saldos_por_evento
+from tesoreria.libro import recalcular, saldo_al
+from cargos.models import Gestion
+from ventas.models import Producto, ResumenDiario, ResumenEventoProducto, Ticket, Venta
+from panel import artefactos
+from panel.cache_reportes import generaciones, invalidar, VENTAS
+from panel.asincronia import ejecutar_concurrentes
+from panel.benchmark import (
+    PRESUPUESTO_CONSULTAS, peticion_autenticada, ejecutar_benchmark, ejecutar_benchmark_concurrencia, vistas_concurrencia,
+)
+from panel.datos_sinteticos import sembrar
+from panel.exportaciones import ENCABEZADOS_VENTAS
+from panel.instrumentacion import RegistroConsultas
+from panel.models import Trabajo
+from panel.paginacion import paginar_por_cursor
+from panel.reportes import consulta_historial
+from panel.trabajos import encolar, tomar_siguiente
+from ventas.reportes import totales_ventas, totales_por_evento, totales_por_medio, totales_por_producto
+from ventas.resumenes import reconstruir_resumenes
+from ventas.servicios import registrar_venta, sincronizar_tickets
+from ventas.stock import version_actual
+from panel.planes import verificar_planes
+from panel.views import ventas as vistas_ventas
+from panel.views.inicio import _consultas_dashboard
 
-# Create your tests here.
+
+# Los tests no escriben en la cache en archivos del proyecto
+CACHE_TESTS = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests'}}
+
+
+@override_settings(CACHES=CACHE_TESTS)
+class PanelTestCase(TestCase):
+    """
+    Base de los tests del panel: un usuario con la sesión iniciada en el cliente y
+    los datos sintéticos de `sembrar(**siembra)` en `datos`.
+    """
+    siembra = {}
+    superusuario = False
+
+    @classmethod
+    def setUpTestData(cls):
+        crear = Usuario.objects.create_superuser if cls.superusuario else Usuario.objects.create_user
+        cls.usuario = crear('admin', password='x', nombre_completo='Admin')
+        cls.datos = sembrar(**cls.siembra)
+
+    def setUp(self):
+        # Al deshacer cada test los contadores de generación vuelven atrás: la cache no puede sobrevivirlo
+        cache.clear()
+        self.client.force_login(self.usuario)
+
+    def directorios_temporales(self, *ajustes):
+        """Apunta cada ajuste de directorio a una carpeta temporal propia del test; devuelve {ajuste: ruta}."""
+        raiz = tempfile.TemporaryDirectory()
+        self.addCleanup(raiz.cleanup)
+        rutas = {ajuste: os.path.join(raiz.name, ajuste.lower()) for ajuste in ajustes}
+        cambio = override_settings(**rutas)
+        cambio.enable()
+        self.addCleanup(cambio.disable)
+        return rutas
+
+    def exportar(self, url, **headers):
+        """GET de una exportación XLSX abierta como enlace: si se encoló, la procesa el worker y se vuelve a pedir."""
+        response = self.client.get(url, headers=headers)
+        if response.status_code == 302:
+            call_command('procesar_trabajos', '--una-vez', '--hilos', '1', stdout=io.StringIO())
+            response = self.client.get(url, headers=headers)
+        return response
+
+
+class TotalesEventoTests(PanelTestCase):
+    siembra = dict(ventas=80, eventos=2, productos=4)
+
+    def assertTotalesIgualesALasVentas(self):
+        for evento in Evento.objects.all():
+            totales = totales_ventas(Venta.objects.filter(evento=evento))
+            self.assertEqual(
+                (evento.total_bruto, evento.recaudacion_total, evento.cantidad_ventas, evento.unidades_vendidas),
+                (totales['bruto'], totales['neto'], totales['ventas'], totales['unidades']),
+            )
+
+    def test_altas_ediciones_y_bajas_ajustan_por_diferencia(self):
+        primero, segundo = Evento.objects.order_by('pk')
+        producto, otro = Producto.objects.order_by('pk')[:2]
+
+        with CaptureQueriesContext(connection) as consultas:
+            registrar_venta(producto.pk, 3, 'Mercado Pago', primero.pk)
+        # Por diferencia: ninguna consulta vuelve a sumar las ventas del evento
+        self.assertFalse([c for c in consultas.captured_queries if 'SUM(' in c['sql'] and 'ventas_venta' in c['sql']])
+        self.assertTotalesIgualesALasVentas()
+
+        venta = Venta.objects.create(producto=producto, cantidad=2, evento=primero)
+        self.assertTotalesIgualesALasVentas()
+        venta.cantidad = 5
+        venta.save()
+        self.assertTotalesIgualesALasVentas()
+        venta.evento = segundo
+        venta.producto = otro
+        venta.save()
+        self.assertTotalesIgualesALasVentas()
+        venta.delete()
+        self.assertTotalesIgualesALasVentas()
+
+    def test_los_precios_de_la_venta_no_cambian_con_el_producto(self):
+        evento = Evento.objects.order_by('pk').first()
+        producto = Producto.objects.order_by('pk').first()
+        venta, _ = registrar_venta(producto.pk, 2, evento_id=evento.pk)
+        producto.precio_venta += 100
+        producto.guardar_campos(['precio_venta'])
+
+        venta = Venta.objects.get(pk=venta.pk)
+        venta.cantidad = 1
+        venta.save()
+        self.assertTotalesIgualesALasVentas()
+
+        Evento.objects.filter(pk=evento.pk).update(total_bruto=0, cantidad_ventas=0)
+        call_command('recalcular_totales_eventos', stdout=io.StringIO())
+        self.assertTotalesIgualesALasVentas()
+
+
+class TicketTests(PanelTestCase):
+    siembra = dict(ventas=0, eventos=1, productos=12)
+
+    def enviar(self, lineas, **datos):
+        cuerpo = dict(datos, lineas=[{'producto_id': pid, 'cantidad': cantidad} for pid, cantidad in lineas])
+        return self.client.post(reverse('registrar_ticket_ajax'), json.dumps(cuerpo), content_type='application/json')
+
+    def test_un_ticket_con_varias_lineas(self):
+        productos = list(Producto.objects.filter(activo=True).order_by('pk')[:3])
+        stock = {p.pk: p.stock for p in productos}
+        lineas = [(productos[0].pk, 2), (productos[1].pk, 1), (productos[0].pk, 1), (productos[2].pk, 4)]
+
+        response = self.enviar(lineas, medio_de_pago='Mercado Pago', evento_id=self.datos['evento_id'])
+        self.assertEqual(response.status_code, 200)
+        ticket = Ticket.objects.get(pk=response.json()['ticket']['id'])
+        ventas = {v.producto_id: v for v in ticket.ventas.select_related('movimiento')}
+        # Las líneas repetidas de un producto se agrupan en una venta
+        self.assertEqual({pid: v.cantidad for pid, v in ventas.items()}, {productos[0].pk: 3, productos[1].pk: 1, productos[2].pk: 4})
+        self.assertEqual(ticket.total, sum(v.total() for v in ventas.values()))
+        self.assertEqual(ticket.medio_de_pago, 'Mercado Pago')
+        for pid, venta in ventas.items():
+            self.assertEqual(venta.movimiento.monto, venta.total())
+            self.assertEqual(Producto.objects.get(pk=pid).stock, stock[pid] - venta.cantidad)
+        lineas_json = {l['producto_id']: l['stock_restante'] for l in response.json()['ticket']['lineas']}
+        self.assertEqual(lineas_json, {pid: stock[pid] - v.cantidad for pid, v in ventas.items()})
+        evento = Evento.objects.get(pk=self.datos['evento_id'])
+        self.assertEqual((evento.cantidad_ventas, evento.total_bruto), (3, ticket.total))
+
+    def test_escrituras_en_lote(self):
+        ids = list(Producto.objects.filter(activo=True).order_by('pk').values_list('pk', flat=True))
+        with CaptureQueriesContext(connection) as dos_lineas:
+            self.enviar([(pid, 1) for pid in ids[:2]])
+        with CaptureQueriesContext(connection) as ocho_lineas:
+            self.enviar([(pid, 1) for pid in ids[2:10]])
+        # Sólo el descuento de stock es un UPDATE condicional por producto; el resto va en lote
+        self.assertEqual(len(ocho_lineas), len(dos_lineas) + 6)
+
+    def test_una_linea_sin_stock_no_registra_nada(self):
+        producto, otro = Producto.objects.filter(activo=True).order_by('pk')[:2]
+        response = self.enviar([(producto.pk, 1), (otro.pk, otro.stock + 1)])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('stock insuficiente', response.json()['error'])
+        self.assertEqual(Producto.objects.get(pk=producto.pk).stock, producto.stock)
+        self.assertFalse(Ticket.objects.exists())
+        self.assertFalse(Venta.objects.exists())
+
+    def test_peticiones_invalidas(self):
+        producto_id = self.datos['producto_id']
+        self.assertEqual(self.client.get(reverse('registrar_ticket_ajax')).status_code, 405)
+        self.assertEqual(self.enviar([]).status_code, 400)
+        self.assertEqual(self.enviar([(producto_id, 0)]).status_code, 400)
+        invalido = self.client.post(reverse('registrar_ticket_ajax'), '{"lineas": [{}]}', content_type='application/json')
+        self.assertEqual(invalido.status_code, 400)
+        self.assertFalse(Ticket.objects.exists())
+
+
+class ReportesVentasTests(PanelTestCase):
+    """Los reportes agregados en SQL dan lo mismo que recorrer las ventas en Python."""
+    siembra = dict(ventas=300, eventos=4, productos=10)
+
+    @staticmethod
+    def sumar(ventas):
+        ventas = list(ventas)
+        return {
+            'bruto': sum((v.total() for v in ventas), Decimal('0.00')),
+            'neto': sum((v.ganancia() for v in ventas), Decimal('0.00')),
+            'efectivo': sum((v.total() for v in ventas if v.medio_de_pago == 'Efectivo'), Decimal('0.00')),
+            'mercado_pago': sum((v.total() for v in ventas if v.medio_de_pago == 'Mercado Pago'), Decimal('0.00')),
+            'ventas': len(ventas),
+            'unidades': sum(v.cantidad for v in ventas),
+        }
+
+    def test_agregados_igual_que_sumar_en_python(self):
+        ventas = Venta.objects.all()
+        totales = totales_ventas(ventas)
+        self.assertEqual({k: totales[k] for k in self.sumar(ventas)}, self.sumar(ventas))
+
+        for fila in totales_por_evento(ventas.exclude(evento__isnull=True)):
+            esperado = self.sumar(ventas.filter(evento_id=fila['evento_id']))
+            self.assertEqual((fila['bruto'], fila['neto'], fila['ventas']), (esperado['bruto'], esperado['neto'], esperado['ventas']))
+        for fila in totales_por_producto(ventas):
+            esperado = self.sumar(ventas.filter(producto_id=fila['producto_id']))
+            self.assertEqual((fila['unidades'], fila['bruto'], fila['neto']), (esperado['unidades'], esperado['bruto'], esperado['neto']))
+        for fila in totales_por_medio(ventas):
+            esperado = self.sumar(ventas.filter(medio_de_pago=fila['medio_de_pago']))
+            self.assertEqual((fila['ventas'], fila['bruto']), (esperado['ventas'], esperado['bruto']))
+
+    def test_eventos_con_el_mismo_nombre_no_se_mezclan(self):
+        primero, segundo = Evento.objects.order_by('pk')[:2]
+        # El mismo evento de dos gestiones distintas
+        anterior = Gestion.objects.create(nombre='Gestión anterior', fecha_inicio=date.today() - timedelta(days=730))
+        Evento.objects.filter(pk=primero.pk).update(nombre='Feria del plato', gestion=anterior)
+        Evento.objects.filter(pk=segundo.pk).update(nombre='Feria del plato')
+        eventos_data = consulta_historial(QueryDict())['eventos_data']
+
+        for evento in (primero, segundo):
+            esperado = self.sumar(Venta.objects.filter(evento=evento))['bruto']
+            self.assertEqual(eventos_data[evento.pk], {'nombre': 'Feria del plato', 'total': float(esperado)})
+        sin_evento = self.sumar(Venta.objects.filter(evento__isnull=True))['bruto']
+        self.assertAlmostEqual(eventos_data.get(None, {'total': 0})['total'], float(sin_evento), places=2)
+
+        context = self.client.get(reverse('historial_ventas')).context
+        self.assertEqual(json.loads(context['eventos_labels']).count('Feria del plato'), 2)
+
+    def test_vistas_con_los_totales_de_las_ventas(self):
+        todas = self.sumar(Venta.objects.all())
+        context = self.client.get(reverse('inicio_dashboard')).context
+        self.assertEqual(context['total_ventas'], todas['ventas'])
+        self.assertAlmostEqual(context['total_ganancias'], float(todas['bruto']), places=2)
+        # Los medios de pago suman cantidad * precio, no sólo el precio unitario
+        self.assertEqual(json.loads(context['distribucion_pagos']), [float(todas['efectivo']), float(todas['mercado_pago'])])
+
+        evento = Evento.objects.order_by('pk').first()
+        del_evento = self.sumar(Venta.objects.filter(evento=evento))
+        context = self.client.get(reverse('evento_detalles', args=[evento.pk])).context
+        self.assertEqual(
+            (context['total_ventas'], context['total_ganancias'], context['ganancias_netas'], context['total_productos']),
+            (del_evento['ventas'], del_evento['bruto'], del_evento['neto'], del_evento['unidades']),
+        )
+
+        filtradas = self.sumar(Venta.objects.filter(evento=evento, medio_de_pago='Efectivo'))
+        context = self.client.get(reverse('historial_ventas'), {'evento': evento.pk, 'medio': 'Efectivo'}).context
+        self.assertEqual(
+            (context['ventas_count'], context['total_recaudado'], context['total_efectivo'], context['total_mp']),
+            (filtradas['ventas'], filtradas['bruto'], filtradas['bruto'], Decimal('0.00')),
+        )
+
+
+class ResumenesVentasTests(PanelTestCase):
+    """Las tablas de resumen mantenidas en cada escritura coinciden con reconstruirlas desde cero."""
+    siembra = dict(ventas=100, eventos=2, productos=5)
+
+    @staticmethod
+    def filas():
+        campos = ('producto_id', 'medio_de_pago', 'cantidad_ventas', 'total_unidades', 'total_bruto', 'total_neto')
+        return (
+            sorted(ResumenDiario.objects.values_list('fecha', *campos)),
+            sorted(ResumenEventoProducto.objects.values_list('evento_id', *campos)),
+        )
+
+    def assertIgualAReconstruir(self):
+        mantenidas = self.filas()
+        reconstruir_resumenes()
+        self.assertEqual(mantenidas, self.filas())
+
+    def test_altas_ediciones_y_bajas(self):
+        primero, segundo = Evento.objects.order_by('pk')
+        producto, otro = Producto.objects.filter(activo=True).order_by('pk')[:2]
+
+        registrar_venta(producto.pk, 2, 'Mercado Pago', primero.pk)
+        self.assertIgualAReconstruir()
+
+        venta = Venta.objects.create(producto=producto, cantidad=3, evento=primero)
+        venta.cantidad = 1
+        venta.medio_de_pago = 'Mercado Pago'
+        venta.save()
+        self.assertIgualAReconstruir()
+
+        venta.evento = segundo
+        venta.producto = otro
+        venta.save()
+        self.assertIgualAReconstruir()
+
+        # La única venta de una fila la deja en cero: la fila se borra
+        venta.evento = None
+        venta.save()
+        self.assertFalse(ResumenEventoProducto.objects.filter(evento=segundo, producto=otro, cantidad_ventas__lte=0).exists())
+        venta.delete()
+        self.assertIgualAReconstruir()
+
+    def test_venta_sincronizada_va_al_dia_en_que_se_cobro(self):
+        ayer = timezone.now() - timedelta(days=1)
+        sincronizar_tickets([{
+            'clave': 'resumen-ayer', 'lineas': [(self.datos['producto_id'], 2)], 'medio_de_pago': 'Efectivo',
+            'evento_id': None, 'fecha_hora': ayer,
+        }])
+        fila = ResumenDiario.objects.get(
+            fecha=timezone.localdate(ayer), producto_id=self.datos['producto_id'], medio_de_pago='Efectivo',
+        )
+        self.assertGreaterEqual(fila.total_unidades, 2)
+        self.assertIgualAReconstruir()
+
+
+class ExportacionesTests(PanelTestCase):
+    siembra = dict(ventas=250, eventos=2, productos=6)
+
+    def test_csv_del_historial_en_streaming(self):
+        response = self.client.get(reverse('historial_ventas'), {'export': 'csv', 'medio': 'Efectivo'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        texto = b''.join(response.streaming_content).decode('utf-8')
+        self.assertTrue(texto.startswith('\ufeff'))
+        encabezado, *filas = list(csv.reader(io.StringIO(texto.removeprefix('\ufeff'))))
+
+        ventas = Venta.objects.filter(medio_de_pago='Efectivo')
+        self.assertEqual(encabezado, ENCABEZADOS_VENTAS)
+        self.assertEqual(len(filas), ventas.count())
+        self.assertEqual({f[7] for f in filas}, {'Efectivo'})
+        total = sum(Decimal(f[5]) for f in filas)
+        self.assertEqual(total, sum(v.total() for v in ventas))
+        # Ordenadas por fecha, como se leen de la base
+        self.assertEqual([f[0] for f in filas], sorted(f[0] for f in filas))
+
+    def test_las_filas_se_leen_recien_al_enviar(self):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(reverse('evento_detalles', args=[self.datos['evento_id']]), {'export': 'csv'})
+        self.assertFalse([c for c in consultas.captured_queries if '"importe_bruto"' in c['sql']])
+        with CaptureQueriesContext(connection) as consultas:
+            filas = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode('utf-8'))))
+        self.assertEqual(len([c for c in consultas.captured_queries if '"importe_bruto"' in c['sql']]), 1)
+        self.assertEqual(len(filas) - 1, Venta.objects.filter(evento_id=self.datos['evento_id']).count())
+
+    def test_xlsx_del_evento(self):
+        self.directorios_temporales('TRABAJOS_DIR', 'ARTEFACTOS_DIR')
+        evento = Evento.objects.get(pk=self.datos['evento_id'])
+        response = self.exportar(reverse('evento_detalles', args=[evento.pk]) + '?export=xlsx')
+        self.assertEqual(response.status_code, 200)
+        libro = load_workbook(io.BytesIO(b''.join(response.streaming_content)), read_only=True)
+        self.assertEqual(libro.sheetnames, [f'Evento {evento.nombre}', 'Ventas'])
+
+        ventas = list(libro['Ventas'].iter_rows(values_only=True))
+        self.assertEqual(list(ventas[0]), ENCABEZADOS_VENTAS)
+        self.assertEqual(len(ventas) - 1, evento.cantidad_ventas)
+        resumen = list(libro[f'Evento {evento.nombre}'].iter_rows(values_only=True))
+        self.assertEqual(resumen[-2][3:5], ('Total bruto', float(evento.total_bruto)))
+        self.assertEqual(resumen[-1][3:5], ('Ganancia neta', float(evento.recaudacion_total)))
+        self.assertEqual(sum(fila[1] for fila in resumen[1:-3]), evento.unidades_vendidas)
+
+
+class PaginacionKeysetTests(PanelTestCase):
+    siembra = dict(ventas=130, eventos=2, productos=5)
+
+    def recorrer(self, url, enlace):
+        """
+        Sigue los enlaces `enlace` ('url_siguiente' o 'url_anterior') desde `url`.
+        Devuelve los ids de cada página y la última página visitada.
+        """
+        paginas = []
+        while url:
+            pagina = self.client.get(url).context['page_obj']
+            paginas.append([v.pk for v in pagina])
+            siguiente = getattr(pagina, enlace)
+            url = reverse('historial_ventas') + siguiente if siguiente else None
+        return paginas, pagina
+
+    def test_recorre_todas_las_ventas_sin_repetir_ni_saltear(self):
+        # Por precio hay muchos empates: el id desempata y ninguna fila se pierde entre páginas
+        for orden, esperados in [
+            ('-fecha_hora', Venta.objects.order_by('-fecha_hora', '-pk')),
+            ('precio_unitario_venta', Venta.objects.order_by('precio_unitario_venta', 'pk')),
+        ]:
+            with self.subTest(orden=orden):
+                paginas, ultima = self.recorrer(f"{reverse('historial_ventas')}?order={orden}", 'url_siguiente')
+                self.assertEqual([pk for pagina in paginas for pk in pagina], list(esperados.values_list('pk', flat=True)))
+                self.assertEqual([len(p) for p in paginas], [20] * 6 + [10])
+
+                # Desde la última página, hacia atrás, se vuelven a ver las mismas páginas
+                atras, primera = self.recorrer(reverse('historial_ventas') + ultima.url_anterior, 'url_anterior')
+                self.assertEqual(atras, paginas[-2::-1])
+                self.assertFalse(primera.has_previous)
+
+    def test_cada_pagina_sin_count_ni_offset(self):
+        primera = self.client.get(reverse('historial_ventas')).context['page_obj']
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get(reverse('historial_ventas') + primera.url_siguiente)
+        pagina = [c['sql'] for c in consultas.captured_queries if 'FROM "ventas_venta"' in c['sql']]
+        # Una sola lectura de ventas: la página (sin OFFSET); el total sale de la tabla de resumen
+        self.assertEqual(len(pagina), 1)
+        self.assertTrue(pagina[0].endswith('LIMIT 21'))
+        self.assertNotIn('OFFSET', pagina[0])
+        self.assertNotIn('COUNT(', pagina[0])
+
+    def test_cursor_invalido_muestra_la_primera_pagina(self):
+        primera = [v.pk for v in self.client.get(reverse('historial_ventas')).context['page_obj']]
+        pagina = self.client.get(reverse('historial_ventas'), {'despues': 'no-es-un-cursor'}).context['page_obj']
+        self.assertEqual([v.pk for v in pagina], primera)
+        self.assertFalse(pagina.has_previous)
+
+    def test_movimientos_por_fecha(self):
+        movimientos = Movimiento.objects.filter(tipo='Ingreso')
+        vistos, params = [], {}
+        while True:
+            pagina = paginar_por_cursor(movimientos, peticion_autenticada('/?' + urlencode(params), self.usuario), por_pagina=25)
+            vistos += [m.pk for m in pagina]
+            if not pagina.has_next:
+                break
+            params = {'despues': pagina.cursor_siguiente}
+        self.assertEqual(vistos, list(movimientos.order_by('-fecha', '-pk').values_list('pk', flat=True)))
+
+
+class PlanesDeConsultaTests(PanelTestCase):
+    """Las consultas principales de cada vista del panel deben resolverse con índices."""
+    siembra = dict(ventas=300)
+
+    def test_vistas_sin_recorridos_completos(self):
+        problemas = verificar_planes(self.usuario, self.datos['evento_id'])
+        detalle = "\n".join(
+            f"{url}: {tabla} -> {' | '.join(plan)}\n  {sql}"
+            for url, items in problemas.items() for sql, tabla, plan in items
+        )
+        self.assertEqual(problemas, {}, detalle)
+
+
+class PresupuestoConsultasTests(PanelTestCase):
+    """Cada vista medida por el benchmark debe mantenerse dentro de su presupuesto de consultas."""
+    superusuario = True
+    siembra = dict(ventas=200, eventos=4, productos=10)
+
+    def test_presupuesto_por_vista(self):
+        resultados = ejecutar_benchmark(self.usuario, self.datos['evento_id'], self.datos['producto_id'], repeticiones=1)
+        self.assertEqual(set(resultados), set(PRESUPUESTO_CONSULTAS))
+        for nombre, metricas in resultados.items():
+            with self.subTest(vista=nombre):
+                self.assertEqual(metricas['status'], 200)
+                self.assertLessEqual(metricas['consultas'], PRESUPUESTO_CONSULTAS[nombre])
+
+
+@override_settings(INSTRUMENTACION_SQL_MUESTREO=1)
+class InstrumentacionSQLTests(PanelTestCase):
+    siembra = dict(ventas=30, eventos=2, productos=5)
+
+    def test_server_timing_y_log(self):
+        with self.assertLogs('panel.sql', 'INFO') as logs:
+            response = self.client.get(reverse('historial_ventas'))
+        self.assertTrue(response['Server-Timing'].startswith('sql;desc="'))
+        datos = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(datos['vista'], 'historial_ventas')
+        self.assertGreater(datos['consultas'], 0)
+        self.assertEqual(datos['repetidas'], [])
+
+    def test_con_asgi_la_cadena_de_middlewares_no_se_adapta(self):
+        # Django avisa en django.request cada middleware sync que tiene que envolver en un hilo
+        with self.assertNoLogs('django.request', 'DEBUG'):
+            ASGIHandler()
+
+    def test_mide_tambien_las_peticiones_async(self):
+        self.client.force_login(self.usuario)
+        cliente = AsyncClient()
+        cliente.cookies = self.client.cookies
+        with self.assertLogs('panel.sql', 'INFO') as logs:
+            response = async_to_sync(cliente.get)(reverse('historial_ventas'))
+        self.assertTrue(response['Server-Timing'].startswith('sql;desc="'))
+        self.assertGreater(json.loads(logs.records[-1].getMessage())['consultas'], 0)
+
+    def test_detecta_consultas_repetidas(self):
+        registro = RegistroConsultas()
+        with connection.execute_wrapper(registro):
+            for producto_id in Producto.objects.values_list('pk', flat=True):
+                Producto.objects.get(pk=producto_id)
+        repetidas = registro.repetidas(umbral=5)
+        self.assertEqual(len(repetidas), 1)
+        self.assertEqual(repetidas[0]['veces'], 5)
+        self.assertTrue(repetidas[0]['origenes'][0].startswith('panel/tests.py:'))
+
+
+class CacheReportesTests(PanelTestCase):
+    """Los reportes cacheados se sirven sin consultas hasta la próxima escritura."""
+    siembra = dict(ventas=30, eventos=2, productos=5)
+
+    def test_recarga_usa_cache_e_invalida_al_vender(self):
+        url = reverse('inicio_dashboard')
+        self.client.get(url)
+        with self.assertNumQueries(3):  # sesión, usuario y generaciones
+            self.client.get(url)
+
+        generacion = generaciones(VENTAS)[0]
+        response = self.client.post(reverse('registrar_ticket_ajax'), {
+            'lineas': [{'producto_id': self.datos['producto_id'], 'cantidad': 1}],
+            'medio_de_pago': 'Efectivo',
+            'evento_id': self.datos['evento_id'],
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(generaciones(VENTAS)[0], generacion)
+
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get(url)
+        self.assertGreater(len(consultas.captured_queries), 2)
+
+    def test_la_generacion_no_depende_de_la_cache(self):
+        generacion = generaciones(VENTAS)[0]
+        invalidar(VENTAS)
+        # Un desalojo (o culling de la cache en archivos) no puede volver el contador atrás
+        cache.clear()
+        self.assertEqual(generaciones(VENTAS)[0], generacion + 1)
+
+    def test_la_generacion_se_incrementa_con_la_transaccion(self):
+        generacion = generaciones(VENTAS)[0]
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            invalidar(VENTAS)
+            self.assertEqual(generaciones(VENTAS)[0], generacion + 1)
+            raise IntegrityError
+        self.assertEqual(generaciones(VENTAS)[0], generacion)
+
+
+# Se ejecuta en cada proceso hijo: apunta la conexión al archivo compartido y vende de a una unidad
+# (alternando venta suelta y ticket)
+_VENDER_EN_PROCESO = """
+import os, time
+from django.db import IntegrityError, connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import F
+connection.settings_dict['NAME'] = os.environ['BASE_CONCURRENCIA']
+from ventas.servicios import registrar_ticket, registrar_venta
+producto_id, evento_id = int(os.environ['PRODUCTO_ID']), int(os.environ['EVENTO_ID'])
+time.sleep(max(0, float(os.environ['INICIO_CONCURRENCIA']) - time.time()))
+for i in range(int(os.environ['VENTAS_POR_PROCESO'])):
+    if i % 2:
+        registrar_venta(producto_id, 1, 'Efectivo', evento_id)
+    else:
+        registrar_ticket([(producto_id, 1)], 'Efectivo', evento_id)
+"""
+
+
+@override_settings(CACHES=CACHE_TESTS)
+class VentasConcurrentesTests(TransactionTestCase):
+    """Varias terminales (procesos) vendiendo el mismo producto sobre un archivo SQLite en WAL."""
+
+    PROCESOS = 4
+    VENTAS_POR_PROCESO = 15
+
+    def test_sin_actualizaciones_perdidas(self):
+        datos = sembrar(ventas=0, eventos=1, productos=1)
+        stock_inicial = Producto.objects.get(pk=datos['producto_id']).stock
+
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = os.path.join(directorio, 'concurrencia.sqlite3')
+            # Copia de la base de test (esquema + datos) a un archivo que comparten los procesos
+            connection.ensure_connection()
+            destino = sqlite3.connect(ruta)
+            connection.connection.backup(destino)
+            destino.close()
+
+            entorno = dict(
+                os.environ,
+                BASE_CONCURRENCIA=ruta,
+                CACHE_BACKEND=CACHE_TESTS['default']['BACKEND'],
+                INICIO_CONCURRENCIA=str(time.time() + 3),
+                VENTAS_POR_PROCESO=str(self.VENTAS_POR_PROCESO),
+                PRODUCTO_ID=str(datos['producto_id']),
+                EVENTO_ID=str(datos['evento_id']),
+            )
+            procesos = [
+                subprocess.Popen(
+                    [sys.executable, 'manage.py', 'shell', '-c', _VENDER_EN_PROCESO],
+                    cwd=settings.BASE_DIR, env=entorno, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                )
+                for _ in range(self.PROCESOS)
+            ]
+            for proceso in procesos:
+                _, errores = proceso.communicate(timeout=120)
+                self.assertEqual(proceso.returncode, 0, errores.decode())
+
+            vendidas = self.PROCESOS * self.VENTAS_POR_PROCESO
+            base = sqlite3.connect(ruta)
+            try:
+                self.assertEqual(base.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+                stock, = base.execute('SELECT stock FROM ventas_producto WHERE id = ?', [datos['producto_id']]).fetchone()
+                self.assertEqual(stock, stock_inicial - vendidas)
+                self.assertEqual(base.execute('SELECT COUNT(*) FROM ventas_venta').fetchone()[0], vendidas)
+                self.assertEqual(base.execute('SELECT COUNT(*) FROM tesoreria_movimiento').fetchone()[0], vendidas)
+                cantidad, unidades = base.execute(
+                    'SELECT cantidad_ventas, unidades_vendidas FROM eventos_evento WHERE id = ?', [datos['evento_id']]
+                ).fetchone()
+                self.assertEqual((cantidad, unidades), (vendidas, vendidas))
+            finally:
+                base.close()
+
+
+class SincronizacionTerminalTests(PanelTestCase):
+    """Tickets encolados sin conexión en una terminal y sincronizados después."""
+    siembra = dict(ventas=60, eventos=1, productos=3, dias=30)
+
+    def sincronizar(self, *tickets):
+        response = self.client.post(
+            reverse('sincronizar_ventas'), {'version': 0, 'tickets': list(tickets)}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()['resultados']
+
+    def ticket(self, clave, fecha_hora=None):
+        ticket = {'clave': clave, 'lineas': [{'producto_id': self.datos['producto_id'], 'cantidad': 1}],
+                  'medio_de_pago': 'Efectivo', 'evento_id': self.datos['evento_id']}
+        if fecha_hora is not None:
+            ticket['fecha_hora'] = fecha_hora.isoformat()
+        return ticket
+
+    def test_la_venta_queda_en_el_dia_en_que_se_cobro(self):
+        cobrado = timezone.now() - timedelta(days=2)
+        cerrar_gestion(Gestion.objects.get(), timezone.now() - timedelta(days=1))
+        diario = ResumenDiario.objects.filter(
+            fecha=timezone.localdate(cobrado), producto_id=self.datos['producto_id'], medio_de_pago='Efectivo',
+        )
+        antes = diario.aggregate(n=Sum('cantidad_ventas'))['n'] or 0
+
+        [resultado] = self.sincronizar(self.ticket('offline-1', cobrado))
+        self.assertEqual(resultado['estado'], 'registrado')
+        venta = Venta.objects.get(ticket_id=resultado['ticket_id'])
+        self.assertEqual(venta.fecha_hora, cobrado)
+        self.assertEqual(venta.movimiento.fecha, cobrado)
+        self.assertEqual(diario.aggregate(n=Sum('cantidad_ventas'))['n'], antes + 1)
+        # El libro de saldos y el cierre posterior a la venta la incluyen
+        self.assertEqual(recalcular(), 0)
+        self.assertEqual(saldos(), saldos_de(Movimiento.objects.all()))
+
+    def test_fechas_futuras_viejas_o_invalidas_se_rechazan(self):
+        futuro, viejo, invalida = self.sincronizar(
+            self.ticket('offline-futuro', timezone.now() + timedelta(hours=1)),
+            self.ticket('offline-viejo', timezone.now() - timedelta(days=30)),
+            dict(self.ticket('offline-invalida'), fecha_hora='no es una fecha'),
+        )
+        self.assertEqual([futuro['estado'], viejo['estado'], invalida['estado']], ['rechazado'] * 3)
+        self.assertFalse(Ticket.objects.filter(clave__startswith='offline-').exists())
+
+    def conteos(self):
+        return (
+            Producto.objects.get(pk=self.datos['producto_id']).stock,
+            Venta.objects.count(), Movimiento.objects.count(), Ticket.objects.count(),
+        )
+
+    def test_reenviar_el_lote_no_duplica_nada(self):
+        stock, ventas, movimientos, tickets = self.conteos()
+        lote = [self.ticket('lote-a'), self.ticket('lote-b'), self.ticket('lote-a')]
+        resultados = self.sincronizar(*lote)
+        self.assertEqual([r['estado'] for r in resultados], ['registrado', 'registrado', 'duplicado'])
+        self.assertEqual(resultados[2]['ticket_id'], resultados[0]['ticket_id'])
+        self.assertEqual(self.conteos(), (stock - 2, ventas + 2, movimientos + 2, tickets + 2))
+
+        # La terminal no recibió la respuesta y reenvía todo: nada se escribe dos veces
+        reenvio = self.sincronizar(*lote)
+        self.assertEqual([r['estado'] for r in reenvio], ['duplicado'] * 3)
+        self.assertEqual([r['ticket_id'] for r in reenvio], [r['ticket_id'] for r in resultados])
+        self.assertEqual(self.conteos(), (stock - 2, ventas + 2, movimientos + 2, tickets + 2))
+
+        # El endpoint de un ticket también reconoce la clave ya sincronizada
+        response = self.client.post(reverse('registrar_ticket_ajax'), self.ticket('lote-b'), content_type='application/json')
+        self.assertTrue(response.json()['duplicado'])
+        self.assertEqual(response.json()['ticket']['id'], resultados[1]['ticket_id'])
+        self.assertEqual(self.conteos(), (stock - 2, ventas + 2, movimientos + 2, tickets + 2))
+
+    def test_un_ticket_rechazado_no_frena_el_lote(self):
+        sin_stock = self.ticket('lote-sin-stock')
+        sin_stock['lineas'][0]['cantidad'] = Producto.objects.get(pk=self.datos['producto_id']).stock + 1
+        sin_clave = self.ticket('')
+        resultados = self.sincronizar(sin_stock, sin_clave, {'clave': 'lote-mal', 'lineas': 'x'}, self.ticket('lote-ok'))
+        self.assertEqual([r['estado'] for r in resultados], ['rechazado', 'rechazado', 'rechazado', 'registrado'])
+        self.assertEqual(list(Ticket.objects.filter(clave__startswith='lote-').values_list('clave', flat=True)), ['lote-ok'])
+
+    def test_devuelve_el_stock_cambiado_y_limita_el_lote(self):
+        version = version_actual()
+        response = self.client.post(
+            reverse('sincronizar_ventas'), {'version': version, 'tickets': [self.ticket('lote-stock')]},
+            content_type='application/json',
+        ).json()
+        self.assertFalse(response['completo'])
+        self.assertEqual([p['id'] for p in response['productos']], [self.datos['producto_id']])
+        self.assertEqual(response['version'], version_actual())
+
+        demasiados = [self.ticket(f'lote-{i}') for i in range(vistas_ventas.MAX_TICKETS_SINCRONIZACION + 1)]
+        response = self.client.post(reverse('sincronizar_ventas'), {'tickets': demasiados}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Ticket.objects.filter(clave='lote-0').exists())
+
+
+class VentaSueltaTests(PanelTestCase):
+    siembra = dict(ventas=0, eventos=1, productos=1)
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Producto.objects.filter(pk=cls.datos['producto_id']).update(stock=3)
+
+    def vender(self, cantidad):
+        return self.client.post(reverse('registrar_venta_ajax'), {
+            'producto_id': self.datos['producto_id'], 'cantidad': cantidad,
+            'medio_de_pago': 'Efectivo', 'evento_id': self.datos['evento_id'],
+        })
+
+    def test_un_descuento_y_un_movimiento_por_venta(self):
+        response = self.vender(2)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['venta']['stock_restante'], 1)
+        producto = Producto.objects.get(pk=self.datos['producto_id'])
+        self.assertEqual(producto.stock, 1)
+        venta = Venta.objects.get()
+        self.assertEqual(list(Movimiento.objects.values_list('venta', 'monto')), [(venta.pk, venta.total())])
+
+    def test_stock_insuficiente_no_escribe_nada(self):
+        response = self.vender(4)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('stock insuficiente', response.json()['error'])
+        self.assertEqual(Producto.objects.get(pk=self.datos['producto_id']).stock, 3)
+        self.assertFalse(Venta.objects.exists())
+        self.assertFalse(Movimiento.objects.exists())
+
+    def test_stock_negativo_rechazado_por_la_base(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Producto.objects.filter(pk=self.datos['producto_id']).update(stock=F('stock') - 4)
+
+
+class ContadoresProductoTests(PanelTestCase):
+    siembra = dict(ventas=300, eventos=2, productos=6)
+
+    def assertContadoresCoinciden(self):
+        reales = {
+            fila['producto']: (fila['unidades'], fila['ventas'])
+            for fila in Venta.objects.order_by().values('producto').annotate(unidades=Sum('cantidad'), ventas=Count('id'))
+        }
+        for producto in Producto.objects.all():
+            self.assertEqual((producto.total_vendido, producto.total_ventas), reales.get(producto.pk, (0, 0)))
+
+    def test_ventas_ediciones_y_bajas_mantienen_los_contadores(self):
+        self.assertContadoresCoinciden()
+        producto_id = self.datos['producto_id']
+        Producto.objects.filter(pk=producto_id).update(stock=50)
+        registrar_venta(producto_id, 3)
+        venta = Venta.objects.filter(producto_id=producto_id).latest('pk')
+        venta.cantidad = 5
+        venta.save()
+        self.assertContadoresCoinciden()
+        venta.producto = Producto.objects.exclude(pk=producto_id).first()
+        venta.save()
+        self.assertContadoresCoinciden()
+        venta.delete()
+        self.assertContadoresCoinciden()
+
+        Producto.objects.update(total_vendido=0, total_ventas=0)
+        call_command('reconstruir_resumenes', stdout=io.StringIO())
+        self.assertContadoresCoinciden()
+
+    def test_editar_un_producto_no_pisa_las_ventas_concurrentes(self):
+        producto_id = self.datos['producto_id']
+        Producto.objects.filter(pk=producto_id).update(stock=50)
+        leido = Producto.objects.get(pk=producto_id)
+        # Ventas registradas mientras el formulario de edición estaba abierto
+        registrar_venta(producto_id, 2)
+        registrar_venta(producto_id, 1)
+        with mock.patch('panel.views.ventas.get_object_or_404', return_value=leido):
+            response = self.client.post(reverse('editar_producto', args=[producto_id]), {
+                'nombre': 'Renombrado', 'stock': leido.stock, 'precio_compra': leido.precio_compra,
+                'precio_venta': leido.precio_venta, 'activo': 'true',
+            })
+            self.assertTrue(response.json()['success'])
+            self.client.post(reverse('toggle_producto_activo', args=[producto_id]))
+
+        producto = Producto.objects.get(pk=producto_id)
+        self.assertEqual((producto.nombre, producto.activo, producto.stock), ('Renombrado', False, 47))
+        self.assertContadoresCoinciden()
+
+    def test_listado_con_totales_agregados(self):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(reverse('lista_productos'), {'order': '-stock'})
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(consultas.captured_queries), 5)
+        productos = list(Producto.objects.all())
+        self.assertEqual(response.context['total_productos'], len(productos))
+        self.assertEqual(response.context['stock_total'], sum(p.stock for p in productos))
+        self.assertEqual(
+            response.context['valor_inventario_total'], sum(p.stock * p.precio_compra for p in productos),
+        )
+        primero = response.context['productos'][0]
+        self.assertEqual(primero.total_vendido, Venta.objects.filter(producto=primero).aggregate(s=Sum('cantidad'))['s'] or 0)
+
+
+class BusquedaTests(PanelTestCase):
+    siembra = dict(ventas=200, eventos=2, productos=12)
+
+    def buscar(self, nombre_url, texto):
+        return self.client.get(reverse(nombre_url), {'q': texto}).json()['resultados']
+
+    def test_indice_sigue_altas_ediciones_y_bajas(self):
+        producto = Producto.objects.create(nombre='Café Torrado', stock=5, precio_compra=1, precio_venta=2)
+        self.assertEqual(self.buscar('buscar_productos', 'cafe tor')[0]['id'], producto.pk)
+        producto.nombre = 'Mate Cocido'
+        producto.save()
+        self.assertEqual(self.buscar('buscar_productos', 'cafe'), [])
+        self.assertEqual([r['id'] for r in self.buscar('buscar_productos', 'coc')], [producto.pk])
+        producto.delete()
+        self.assertEqual(self.buscar('buscar_productos', 'mate'), [])
+
+        # Las ventas escriben sus movimientos en lote: también quedan indexados
+        venta, _ = registrar_venta(self.datos['producto_id'], 1)
+        encontrados = [r['id'] for r in self.buscar('buscar_movimientos', f'venta_id {venta.pk}')]
+        self.assertIn(venta.movimiento.pk, encontrados)
+
+    def test_vistas_filtran_con_el_indice(self):
+        response = self.client.get(reverse('historial_ventas'), {'q': 'producto 1'})
+        esperadas = Venta.objects.filter(producto__nombre__icontains='producto 1')
+        self.assertEqual(response.context['ventas_count'], esperadas.count())
+
+        response = self.client.get(reverse('lista_productos'), {'q': 'PRODUCTO 1'})
+        self.assertEqual(response.context['total_productos'], 4)  # 1, 10, 11 y 12
+
+        egreso = Movimiento.objects.filter(tipo='Egreso').first()
+        response = self.client.get(reverse('egresos_tesoreria'), {'q': egreso.descripcion})
+        self.assertIn(egreso, list(response.context['movimientos']))
+        self.assertTrue(all(egreso.descripcion in m.descripcion for m in response.context['movimientos']))
+
+        Producto.objects.filter(pk=self.datos['producto_id']).update(nombre='Renombrado sin signals')
+        call_command('reconstruir_busqueda', stdout=io.StringIO())
+        self.assertEqual(len(self.buscar('buscar_productos', 'renombrado')), 1)
+
+    def test_sin_fts5_busca_con_like(self):
+        with mock.patch('panel.busqueda.usa_fts5', return_value=False):
+            response = self.client.get(reverse('lista_productos'), {'q': 'PRODUCTO 1'})
+            self.assertEqual(response.context['total_productos'], 4)
+            nombres = {r['nombre'] for r in self.buscar('buscar_productos', 'ducto 2')}
+            self.assertEqual(nombres, {'Producto 2', 'Producto 12'})
+
+
+class CatalogoPOSTests(PanelTestCase):
+    siembra = dict(ventas=150, eventos=1, productos=10)
+
+    def pedir(self, etag=None):
+        headers = {'Accept-Encoding': 'gzip, deflate'}
+        if etag:
+            headers['If-None-Match'] = etag
+        return self.client.get(reverse('catalogo_pos'), headers=headers)
+
+    def test_comprimido_con_etag_y_304_sin_leer_productos(self):
+        response = self.pedir()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        catalogo = json.loads(gzip.decompress(response.content))
+        activos = Producto.objects.filter(activo=True).order_by('-total_vendido', 'nombre')
+        self.assertEqual([p['id'] for p in catalogo['productos']], [p.pk for p in activos])
+        self.assertEqual([p['ranking'] for p in catalogo['productos']], list(range(1, activos.count() + 1)))
+
+        etag = response['ETag']
+        with CaptureQueriesContext(connection) as consultas:
+            revalidacion = self.pedir(etag)
+        self.assertEqual(revalidacion.status_code, 304)
+        self.assertEqual(revalidacion.content, b'')
+        self.assertFalse(any('ventas_producto' in c['sql'] for c in consultas.captured_queries))
+
+        sin_gzip = self.client.get(reverse('catalogo_pos'))
+        self.assertNotIn('Content-Encoding', sin_gzip)
+        self.assertNotEqual(sin_gzip['ETag'], etag)
+        self.assertEqual(json.loads(sin_gzip.content), catalogo)
+
+    def test_cambios_de_producto_invalidan_el_catalogo(self):
+        etag = self.pedir()['ETag']
+        registrar_venta(self.datos['producto_id'], 2)
+        response = self.pedir(etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        producto = Producto.objects.get(pk=self.datos['producto_id'])
+        producto.activo = False
+        producto.save()
+        response = self.pedir(etag)
+        self.assertEqual(response.status_code, 200)
+        ids = [p['id'] for p in json.loads(gzip.decompress(response.content))['productos']]
+        self.assertNotIn(producto.pk, ids)
+
+
+class FeedStockTests(PanelTestCase):
+    siembra = dict(ventas=20, eventos=1, productos=10)
+
+    def pedir(self, **params):
+        return self.client.get(reverse('stock_actual'), params)
+
+    def test_sin_asgi_el_stream_no_toma_un_worker(self):
+        inicio = time.monotonic()
+        response = self.client.get(reverse('stock_stream'), {'desde': version_actual()})
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(response.streaming)
+        self.assertLess(time.monotonic() - inicio, 1)
+
+    def test_long_poll_devuelve_solo_los_productos_cambiados(self):
+        version = version_actual()
+        registrar_venta(self.datos['producto_id'], 1)
+        inicio = time.monotonic()
+        data = self.pedir(desde=version, esperar=5).json()
+        self.assertLess(time.monotonic() - inicio, 1)
+        self.assertFalse(data['completo'])
+        self.assertGreater(data['version'], version)
+        producto = Producto.objects.get(pk=self.datos['producto_id'])
+        self.assertEqual(data['productos'], [{'id': producto.pk, 'stock': producto.stock, 'activo': True}])
+
+        sin_cambios = self.pedir(desde=data['version'], esperar=0.2).json()
+        self.assertEqual(sin_cambios, {'version': data['version'], 'completo': False, 'productos': []})
+
+    def test_la_espera_esta_acotada(self):
+        with mock.patch.object(vistas_ventas, 'esperar_cambios') as esperar:
+            self.pedir(desde=version_actual(), esperar=300)
+        esperar.assert_called_once_with(version_actual(), vistas_ventas.ESPERA_MAXIMA_STOCK)
+        self.assertEqual(self.pedir(desde='x').status_code, 400)
+
+    def test_version_podada_devuelve_el_catalogo_completo(self):
+        data = self.pedir(desde=-5).json()
+        self.assertTrue(data['completo'])
+        self.assertEqual(len(data['productos']), Producto.objects.count())
+
+
+class ReposicionStockTests(PanelTestCase):
+    siembra = dict(ventas=0, eventos=0, productos=20)
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.productos = list(Producto.objects.order_by('pk'))
+
+    def reponer(self, contenido, nombre='compra.csv'):
+        archivo = SimpleUploadedFile(nombre, contenido.encode())
+        return self.client.post(reverse('reponer_stock'), {'archivo': archivo})
+
+    def test_cientos_de_lineas_en_pocas_consultas(self):
+        filas = ['producto;cantidad;precio_compra']
+        filas += [f'{p.pk};2;12,50' for p in self.productos] * 15
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.reponer('\n'.join(filas))
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['resumen']['unidades'], 600)
+        self.assertLessEqual(len(consultas.captured_queries), 13)
+
+        for antes in self.productos:
+            producto = Producto.objects.get(pk=antes.pk)
+            self.assertEqual(producto.stock, antes.stock + 30)
+            self.assertEqual(producto.precio_compra, Decimal('12.50'))
+        egresos = Movimiento.objects.filter(tipo='Egreso')
+        self.assertEqual(egresos.count(), 300)
+        self.assertEqual(egresos.aggregate(total=Sum('monto'))['total'], Decimal('7500.00'))
+
+    def test_linea_invalida_no_aplica_nada(self):
+        nombre = self.productos[0].nombre
+        response = self.reponer(f'producto,cantidad\n{nombre},5\nNo existe,3\n')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("'No existe' no encontrado", response.json()['error'])
+        self.assertEqual(Producto.objects.get(pk=self.productos[0].pk).stock, self.productos[0].stock)
+        self.assertFalse(Movimiento.objects.exists())
+
+    def test_sin_precio_no_se_escribe_el_precio_de_compra(self):
+        con_precio, sin_precio = self.productos[:2]
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.reponer(f'producto;cantidad;precio_compra\n{con_precio.pk};2;9,75\n{sin_precio.pk};3;\n')
+        self.assertEqual(response.status_code, 200, response.content)
+        actualizaciones = [c['sql'] for c in consultas.captured_queries if c['sql'].startswith('UPDATE "ventas_producto"')]
+        self.assertEqual(len(actualizaciones), 2)
+        self.assertEqual(sum('"precio_compra"' in sql for sql in actualizaciones), 1)
+
+        self.assertEqual(Producto.objects.get(pk=con_precio.pk).precio_compra, Decimal('9.75'))
+        producto = Producto.objects.get(pk=sin_precio.pk)
+        self.assertEqual((producto.stock, producto.precio_compra), (sin_precio.stock + 3, sin_precio.precio_compra))
+        self.assertEqual(
+            Movimiento.objects.get(descripcion__endswith=sin_precio.nombre).monto, 3 * sin_precio.precio_compra,
+        )
+
+    def test_precios_distintos_del_mismo_producto_se_rechazan(self):
+        producto = self.productos[0]
+        response = self.reponer(f'producto;cantidad;precio_compra\n{producto.pk};2;10\n{producto.pk};1;\n{producto.pk};1;10,00\n')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(Producto.objects.get(pk=producto.pk).precio_compra, Decimal('10.00'))
+
+        response = self.reponer(f'producto;cantidad;precio_compra\n{producto.pk};2;11\n{producto.pk};1;12\n')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Línea 2: precio de compra distinto al de la línea 1', response.json()['error'])
+        self.assertEqual(Producto.objects.get(pk=producto.pk).precio_compra, Decimal('10.00'))
+
+
+class CalendarioEventosTests(PanelTestCase):
+    siembra = dict(ventas=0, eventos=12, productos=1, dias=360)
+
+    def pedir(self, desde, hasta):
+        return self.client.get(reverse('calendario_eventos_json'), {'start': desde.isoformat(), 'end': hasta.isoformat()})
+
+    def test_solo_el_rango_pedido_y_cache_invalidada(self):
+        hoy = date.today()
+        desde, hasta = hoy - timedelta(days=60), hoy + timedelta(days=1)
+        esperados = Evento.objects.filter(fecha__gte=desde, fecha__lt=hasta).count()
+        response = self.pedir(desde, hasta)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), esperados)
+        self.assertLess(esperados, Evento.objects.count())
+
+        with self.assertNumQueries(3):  # sesión, usuario y generaciones: el rango sale de la cache
+            self.pedir(desde, hasta)
+
+        evento = Evento.objects.filter(fecha__gte=desde, fecha__lt=hasta).first()
+        evento.nombre = 'Renombrado'
+        evento.save()
+        self.assertIn('Renombrado', [e['title'] for e in self.pedir(desde, hasta).json()])
+
+    def test_rango_invalido(self):
+        hoy = date.today()
+        self.assertEqual(self.pedir(hoy, hoy).status_code, 400)
+        self.assertEqual(self.pedir(hoy, hoy + timedelta(days=1000)).status_code, 400)
+
+    def test_un_solo_evento_proximo(self):
+        hoy = date.today()
+        gestion = Evento.objects.first().gestion
+        Evento.objects.filter(fecha__gte=hoy).update(fecha=hoy - timedelta(days=1))
+        for dias in (10, 3, 30):
+            Evento.objects.create(nombre=f'Futuro {dias}', fecha=hoy + timedelta(days=dias), gestion=gestion)
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('eventos_lista'))
+        proximos = [e.nombre for e in response.context['eventos'] if e.es_proximo]
+        self.assertEqual(proximos, ['Futuro 3'])
+
+
+class CierresGestionTests(PanelTestCase):
+    siembra = dict(gestiones=2, ventas=200, eventos=6, productos=5, dias=200)
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.corte = timezone.now() - timedelta(days=100)
+        cerrar_gestion(Gestion.objects.order_by('fecha_inicio').first(), cls.corte)
+
+    def assertSaldosCompletos(self):
+        self.assertEqual(saldos(), saldos_de(Movimiento.objects.all()))
+        for evento in Evento.objects.all():
+            esperado = saldos_de(Movimiento.objects.filter(evento=evento))
+            self.assertEqual(saldos(evento.pk), esperado)
+            if esperado['cantidad_ingresos'] or esperado['cantidad_egresos']:
+                self.assertEqual(saldos_por_evento()[evento.pk], esperado)
+
+    def test_saldos_desde_el_cierre_igual_que_agregar_todo(self):
+        self.assertTrue(Movimiento.objects.filter(fecha__lt=self.corte).exists())
+        self.assertSaldosCompletos()
+        antes = saldos_de(Movimiento.objects.filter(fecha__lt=self.corte))
+        self.assertEqual(saldos(hasta=self.corte), antes)
+
+        response = self.client.get(reverse('balance_tesoreria'))
+        totales = saldos_de(Movimiento.objects.all())
+        self.assertEqual(response.context['ingresos_count'], totales['cantidad_ingresos'])
+        self.assertAlmostEqual(response.context['balance_total'],
+                               float(totales['total_ingresos'] - totales['total_egresos']), places=2)
+
+    def test_editar_o_eliminar_movimiento_cerrado_ajusta_el_cierre(self):
+        cerrados = Movimiento.objects.filter(fecha__lt=self.corte, venta=None)
+        editado = cerrados.filter(tipo='Egreso').first()
+        editado.monto += 100
+        editado.tipo = 'Ingreso'
+        editado.save()
+        cerrados.exclude(pk=editado.pk).first().delete()
+        nuevo = Movimiento.objects.create(tipo='Egreso', descripcion='Ajuste', monto=50, evento=editado.evento)
+        nuevo.fecha = self.corte - timedelta(days=1)
+        nuevo.save()  # mover la fecha antes del corte lo suma al cierre
+        self.assertSaldosCompletos()
+
+    def test_venta_despues_de_cerrar_una_gestion_que_termina_en_el_futuro(self):
+        gestion = Gestion.objects.order_by('fecha_inicio').last()
+        gestion.fecha_fin = timezone.localdate() + timedelta(days=30)
+        gestion.save()
+        cierre = cerrar_gestion(gestion)
+        self.assertLessEqual(cierre.corte, timezone.now())
+
+        registrar_venta(self.datos['producto_id'], 1, 'Efectivo', self.datos['evento_id'])
+        self.assertSaldosCompletos()
+        with self.assertRaises(ValueError):
+            cerrar_gestion(gestion, timezone.now() + timedelta(days=1))
+        with self.assertRaises(CommandError):
+            call_command('cerrar_gestion', gestion.pk, '--corte', str(timezone.localdate()), stdout=io.StringIO())
+
+    def test_presupuesto_de_consultas_con_cierre(self):
+        for nombre in ('balance_tesoreria', 'ingresos_tesoreria'):
+            with CaptureQueriesContext(connection) as consultas:
+                self.client.get(reverse(nombre))
+            self.assertLessEqual(len(consultas.captured_queries), PRESUPUESTO_CONSULTAS[nombre])
+
+
+class LibroSaldosTests(PanelTestCase):
+    siembra = dict(ventas=150, eventos=3, productos=5, dias=120)
+
+    def balance_sumando(self, momento):
+        totales = saldos_de(Movimiento.objects.filter(fecha__lt=momento))
+        return totales['total_ingresos'] - totales['total_egresos']
+
+    def test_saldo_a_una_fecha_igual_que_sumar_la_historia(self):
+        for dias in (120, 90, 30, 1, 0):
+            momento = timezone.now() - timedelta(days=dias)
+            with self.assertNumQueries(1):
+                saldo = saldo_al(momento)
+            self.assertEqual(saldo, self.balance_sumando(momento))
+
+    def test_altas_ediciones_y_bajas_mantienen_el_libro(self):
+        registrar_venta(self.datos['producto_id'], 2, 'Efectivo', self.datos['evento_id'])
+        nuevo = Movimiento.objects.create(tipo='Egreso', descripcion='Insumos', monto=300)
+        nuevo.fecha = timezone.now() - timedelta(days=60)
+        nuevo.save()
+        editado = Movimiento.objects.filter(fecha__lt=nuevo.fecha).order_by('fecha').first()
+        editado.monto += 25
+        editado.save()
+        Movimiento.objects.filter(venta=None).exclude(pk=nuevo.pk).order_by('fecha').last().delete()
+
+        self.assertEqual(recalcular(), 0)
+        self.assertEqual(saldo_al(timezone.now() + timedelta(seconds=1)), self.balance_sumando(timezone.now()))
+
+    def test_evolucion_en_el_balance(self):
+        response = self.client.get(reverse('balance_tesoreria'))
+        serie = response.context['serie_balance']
+        self.assertEqual(len(serie['labels']), len(serie['saldos']))
+        self.assertAlmostEqual(serie['saldos'][-1], response.context['balance_total'], places=2)
+
+    def test_la_serie_cacheada_no_pasa_de_un_dia_a_otro(self):
+        hoy = self.client.get(reverse('balance_tesoreria')).context['serie_balance']
+        manana = timezone.now() + timedelta(days=1)
+        with mock.patch('django.utils.timezone.now', return_value=manana):
+            serie = self.client.get(reverse('balance_tesoreria')).context['serie_balance']
+        self.assertNotEqual(serie['labels'], hoy['labels'])
+        self.assertEqual(serie['labels'][-1], timezone.localtime(manana).strftime('%d/%m/%Y'))
+
+
+class TrabajosSegundoPlanoTests(PanelTestCase):
+    siembra = dict(ventas=120, eventos=2, productos=5)
+
+    def setUp(self):
+        super().setUp()
+        self.directorios_temporales('TRABAJOS_DIR', 'ARTEFACTOS_DIR')
+
+    def encolar_y_procesar(self, url):
+        response = self.client.get(url, headers={'X-Requested-With': 'XMLHttpRequest'})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['estado'], 'pendiente')
+        call_command('procesar_trabajos', '--una-vez', '--hilos', '1', stdout=io.StringIO())
+        return self.client.get(response.json()['estado_url']).json()
+
+    def test_exportacion_del_historial_en_el_worker(self):
+        # Sesión, usuario, versión de los datos (feed de stock y eventos) y alta del trabajo: no arma la planilla
+        with self.assertNumQueries(5):
+            self.client.get(reverse('historial_ventas') + '?export=1', headers={'X-Requested-With': 'XMLHttpRequest'})
+        Trabajo.objects.all().delete()
+
+        estado = self.encolar_y_procesar(reverse('historial_ventas') + '?export=1&medio=Efectivo')
+        self.assertEqual((estado['estado'], estado['progreso']), ('terminado', 100))
+        descarga = self.client.get(estado['descarga_url'])
+        self.assertEqual(descarga.status_code, 200)
+        libro = load_workbook(io.BytesIO(b''.join(descarga.streaming_content)), read_only=True)
+        filas = sum(1 for _ in libro['Ventas'].iter_rows()) - 1
+        self.assertEqual(filas, Venta.objects.filter(medio_de_pago='Efectivo').count())
+
+    def test_exportacion_de_evento_y_acceso_solo_del_duenio(self):
+        estado = self.encolar_y_procesar(reverse('evento_detalles', args=[self.datos['evento_id']]) + '?export=xlsx')
+        self.assertEqual(estado['estado'], 'terminado')
+
+        otro = Usuario.objects.create_user('otro', password='x', nombre_completo='Otro')
+        self.client.force_login(otro)
+        self.assertEqual(self.client.get(estado['estado_url']).status_code, 404)
+        self.assertEqual(self.client.get(estado['descarga_url']).status_code, 404)
+
+    def test_un_trabajo_se_toma_una_sola_vez(self):
+        encolar('reconstruir_resumenes')
+        self.assertIsNotNone(tomar_siguiente())
+        self.assertIsNone(tomar_siguiente())
+
+
+class ArtefactosExportacionTests(PanelTestCase):
+    """Cache en disco de las exportaciones, por reporte, parámetros y versión de los datos."""
+    siembra = dict(ventas=120, eventos=2, productos=5)
+
+    def setUp(self):
+        super().setUp()
+        self.directorio = self.directorios_temporales('TRABAJOS_DIR', 'ARTEFACTOS_DIR')['ARTEFACTOS_DIR']
+        self.url = reverse('evento_detalles', args=[self.datos['evento_id']]) + '?export=xlsx'
+
+    def descargar(self, **headers):
+        response = self.exportar(self.url, **headers)
+        contenido = b''.join(response.streaming_content) if response.status_code == 200 else b''
+        return response, contenido
+
+    def test_sin_el_archivo_se_encola_y_redirige_al_progreso(self):
+        response = self.client.get(self.url)
+        trabajo = Trabajo.objects.get()
+        self.assertRedirects(response, reverse('trabajo_progreso', args=[trabajo.pk]), fetch_redirect_response=False)
+        # La planilla no se armó en la petición
+        self.assertEqual(glob.glob(os.path.join(self.directorio, '*', '*.xlsx')), [])
+        progreso = self.client.get(response['Location'])
+        self.assertContains(progreso, reverse('trabajo_estado', args=[trabajo.pk]))
+
+        call_command('procesar_trabajos', '--una-vez', '--hilos', '1', stdout=io.StringIO())
+        self.assertContains(self.client.get(response['Location']), reverse('trabajo_descargar', args=[trabajo.pk]))
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_segunda_descarga_sin_consultar_ventas_y_304(self):
+        primera, contenido = self.descargar()
+        self.assertEqual(primera.status_code, 200)
+        self.assertTrue(primera['ETag'].startswith('W/"'))
+
+        # Sesión, usuario, evento y versión de los productos: ninguna venta se vuelve a leer
+        with self.assertNumQueries(4):
+            segunda, repetido = self.descargar()
+        self.assertEqual(repetido, contenido)
+        self.assertEqual(segunda['ETag'], primera['ETag'])
+
+        no_modificado, _ = self.descargar(if_none_match=primera['ETag'])
+        self.assertEqual(no_modificado.status_code, 304)
+
+        # Con el archivo en la cache, la página no encola otro trabajo: descarga directamente
+        ajax = self.client.get(self.url, headers={'X-Requested-With': 'XMLHttpRequest'})
+        self.assertEqual(ajax.status_code, 200)
+        self.assertEqual(ajax.json()['descarga_url'], self.url)
+        self.assertEqual(Trabajo.objects.count(), 1)
+
+    def test_una_venta_del_evento_invalida_la_exportacion(self):
+        primera, _ = self.descargar()
+        producto = Producto.objects.filter(activo=True, stock__gt=0).first()
+        registrar_venta(producto.pk, 1, 'Efectivo', self.datos['evento_id'])
+
+        segunda, contenido = self.descargar(if_none_match=primera['ETag'])
+        self.assertEqual(segunda.status_code, 200)
+        self.assertNotEqual(segunda['ETag'], primera['ETag'])
+        libro = load_workbook(io.BytesIO(contenido), read_only=True)
+        filas = sum(1 for _ in libro['Ventas'].iter_rows()) - 1
+        self.assertEqual(filas, Venta.objects.filter(evento_id=self.datos['evento_id']).count())
+
+    def test_borrar_un_producto_invalida_el_historial(self):
+        historial = reverse('historial_ventas') + '?export=1'
+        # Un producto con ventas sólo fuera de eventos: borrarlo no cambia ningún evento
+        borrado = Producto.objects.create(nombre='Descontinuado', stock=5, precio_compra=10, precio_venta=20)
+        registrar_venta(borrado.pk, 1, 'Efectivo')
+        registrar_venta(self.datos['producto_id'], 1, 'Efectivo')
+        primera = self.exportar(historial)
+        b''.join(primera.streaming_content)
+
+        borrado.delete()
+        segunda = self.exportar(historial, if_none_match=primera['ETag'])
+        self.assertEqual(segunda.status_code, 200)
+        self.assertNotEqual(segunda['ETag'], primera['ETag'])
+        libro = load_workbook(io.BytesIO(b''.join(segunda.streaming_content)), read_only=True)
+        self.assertEqual(sum(1 for _ in libro['Ventas'].iter_rows()) - 1, Venta.objects.count())
+
+    def test_desalojo_por_tamanio_empieza_por_el_menos_usado(self):
+        xlsx = os.path.join(self.directorio, '*', '*.xlsx')
+        self.descargar()
+        [del_evento] = glob.glob(xlsx)
+        b''.join(self.exportar(reverse('historial_ventas') + '?export=1').streaming_content)
+        [del_historial] = set(glob.glob(xlsx)) - {del_evento}
+        # El historial queda como el usado hace más tiempo; la planilla del evento se vuelve a pedir
+        os.utime(del_historial, (time.time() - 60, time.time() - 60))
+        os.utime(del_evento, (time.time() - 120, time.time() - 120))
+        self.descargar()
+
+        self.assertEqual(artefactos.purgar(tamanio_maximo=os.path.getsize(del_evento)), 1)
+        self.assertEqual(glob.glob(xlsx), [del_evento])
+
+
+@override_settings(CACHES=CACHE_TESTS)
+class VistasAsyncTests(TransactionTestCase):
+    """Las versiones async (ASGI) ejecutan en hilos aparte las mismas consultas que las sync."""
+
+    def setUp(self):
+        cache.clear()
+        self.usuario = Usuario.objects.create_user('admin', password='x', nombre_completo='Admin')
+        sembrar(ventas=60, eventos=3, productos=5)
+
+    def test_consultas_concurrentes_igual_que_secuenciales(self):
+        consultas = _consultas_dashboard(date.today())
+        secuenciales = {nombre: consulta() for nombre, consulta in consultas.items()}
+        concurrentes = async_to_sync(ejecutar_concurrentes)(consultas)
+        self.assertEqual(concurrentes, secuenciales)
+
+    def test_vistas_async_responden(self):
+        for nombre, vista_wsgi, vista_asgi, url in vistas_concurrencia():
+            with self.subTest(vista=nombre):
+                response = async_to_sync(vista_asgi)(peticion_autenticada(url, self.usuario))
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(vista_wsgi(peticion_autenticada(url, self.usuario)).status_code, 200)
+
+    def test_benchmark_de_concurrencia_pasa_por_el_stack_completo(self):
+        resultados = ejecutar_benchmark_concurrencia(self.usuario, concurrencia=2, peticiones=4)
+        self.assertEqual(set(resultados), {nombre for nombre, *_ in vistas_concurrencia()})
+        for nombre, lados in resultados.items():
+            with self.subTest(vista=nombre):
+                self.assertEqual(lados['wsgi']['estados'], [200])
+                self.assertEqual(lados['asgi']['estados'], [200])
+
+    def test_stream_de_stock_con_asgi(self):
+        producto_id = Producto.objects.values_list('pk', flat=True).first()
+        version = version_actual()
+        registrar_venta(producto_id, 1)
+
+        async def primeros_eventos():
+            url = f"{reverse('stock_stream')}?desde={version}"
+            response = await vistas_ventas.stock_stream_async(peticion_autenticada(url, self.usuario))
+            contenido = aiter(response.streaming_content)
+            eventos = [await anext(contenido), await anext(contenido)]
+            await contenido.aclose()
+            return response, eventos
+
+        response, (retry, evento) = async_to_sync(primeros_eventos)()
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(retry, b'retry: 3000\n\n')
+        cabecera, tipo, data = evento.decode().strip().split('\n')
+        self.assertEqual(cabecera, f'id: {version_actual()}')
+        self.assertEqual(tipo, 'event: stock')
+        productos = json.loads(data.removeprefix('data: '))['productos']
+        self.assertEqual([p['id'] for p in productos], [producto_id])
+
+
+@override_settings(CACHES=CACHE_TESTS)
+class MigracionesDatosTests(TransactionTestCase):
+    """Las migraciones de datos, aplicadas sobre una base con historia: rehacen lo mismo que el código vivo."""
+
+    def setUp(self):
+        self.datos = sembrar(ventas=120, eventos=3, productos=8)
+
+    def migrar(self, *destino):
+        """
+        Lleva la base a `destino` ((app, migración), ...); sin argumentos, a la última migración.
+        Devuelve el registro de apps de ese estado, para cargar datos con los modelos de entonces.
+        """
+        executor = MigrationExecutor(connection)
+        destino = list(destino) or executor.loader.graph.leaf_nodes()
+        executor.migrate(destino)
+        return MigrationExecutor(connection).loader.project_state(destino).apps
+
+    def tearDown(self):
+        self.migrar()
+
+    def test_movimientos_vinculados_a_su_venta_por_la_descripcion(self):
+        vinculos = dict(Movimiento.objects.filter(venta__isnull=False).values_list('pk', 'venta_id'))
+        self.assertEqual(len(vinculos), Venta.objects.count())
+
+        apps = self.migrar(('tesoreria', '0001_initial'))
+        MovimientoHistorico = apps.get_model('tesoreria', 'Movimiento')
+        venta_id = next(iter(vinculos.values()))
+        duplicado = MovimientoHistorico.objects.create(
+            tipo='Ingreso', descripcion=f'Venta repetida (venta_id={venta_id})', monto=1,
+        )
+        huerfano = MovimientoHistorico.objects.create(
+            tipo='Ingreso', descripcion='Venta borrada (venta_id=999999)', monto=1,
+        )
+
+        self.migrar()
+        self.assertEqual(dict(Movimiento.objects.filter(venta__isnull=False).values_list('pk', 'venta_id')), vinculos)
+        self.assertIsNone(Movimiento.objects.get(pk=duplicado.pk).venta_id)
+        self.assertIsNone(Movimiento.objects.get(pk=huerfano.pk).venta_id)
+
+    def test_resumenes_desde_las_ventas_existentes(self):
+        campos = ('producto_id', 'medio_de_pago', 'cantidad_ventas', 'total_unidades', 'total_bruto', 'total_neto')
+        diarios = list(ResumenDiario.objects.order_by('fecha', *campos[:2]).values_list('fecha', *campos))
+        por_evento = list(ResumenEventoProducto.objects.order_by('evento_id', *campos[:2]).values_list('evento_id', *campos))
+        self.assertTrue(diarios and por_evento)
+
+        self.migrar(('ventas', '0005_ticket'))
+        self.migrar()
+        self.assertEqual(list(ResumenDiario.objects.order_by('fecha', *campos[:2]).values_list('fecha', *campos)), diarios)
+        self.assertEqual(
+            list(ResumenEventoProducto.objects.order_by('evento_id', *campos[:2]).values_list('evento_id', *campos)),
+            por_evento,
+        )
+
+    def test_contadores_de_producto_desde_las_ventas_existentes(self):
+        contadores = list(Producto.objects.order_by('pk').values_list('pk', 'total_vendido', 'total_ventas'))
+        self.assertTrue(any(vendido for _, vendido, _ in contadores))
+
+        self.migrar(('ventas', '0010_producto_stock_no_negativo'))
+        self.migrar()
+        self.assertEqual(list(Producto.objects.order_by('pk').values_list('pk', 'total_vendido', 'total_ventas')), contadores)
+
+    def test_indices_de_busqueda_desde_las_tablas_existentes(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT rowid, texto FROM busqueda_producto ORDER BY rowid")
+            indexados = cursor.fetchall()
+        self.assertEqual(len(indexados), Producto.objects.count())
+
+        self.migrar(('panel', '0001_trabajos'))
+        self.migrar()
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT rowid, texto FROM busqueda_producto ORDER BY rowid")
+            self.assertEqual(cursor.fetchall(), indexados)
+            cursor.execute("SELECT COUNT(*) FROM busqueda_movimiento")
+            self.assertEqual(cursor.fetchone()[0], Movimiento.objects.count())
@@ -0,0 +1,188 @@
+"""
+Cola de trabajos en segundo plano sobre la base (sin broker externo).
+
+Las vistas encolan las exportaciones pesadas con `encolar` y responden enseguida
+(el estado del trabajo, o una redirección a su página de progreso);
+`manage.py procesar_trabajos` las ejecuta en un pool de hilos, en otro proceso,
+así los workers web quedan libres para las ventas. Un trabajo se toma con un
+UPDATE condicional (pendiente -> en curso): dos hilos o procesos nunca ejecutan
+el mismo. Los archivos generados quedan en `TRABAJOS_DIR/<id>/` y se descargan
+desde `trabajo_descargar`.
+
+Las funciones de cada tipo de trabajo se registran con `@tarea` en panel.tareas.
+"""
+import logging
+import shutil
+import threading
+from datetime import timedelta
+from pathlib import Path
+from django.conf import settings
+from django.db import connection, connections
+from django.http import JsonResponse
+from django.shortcuts import redirect
+from django.urls import reverse
+from django.utils import timezone
+from panel.base_datos import reintentar_si_bloqueada
+from panel.models import Trabajo
+
+logger = logging.getLogger(__name__)
+
+TAREAS = {}
+
+# Un trabajo en curso por más de este tiempo se considera abandonado (worker caído)
+TIEMPO_MAXIMO_TRABAJO = timedelta(hours=1)
+
+# Días que se conservan los trabajos terminados y sus archivos
+DIAS_CONSERVACION_TRABAJOS = 7
+
+
+def tarea(tipo):
+    """Registra la función que ejecuta los trabajos de `tipo`: recibe (trabajo, **parametros)
+    y devuelve el nombre del archivo generado o None."""
+    def decorador(funcion):
+        TAREAS[tipo] = funcion
+        return funcion
+    return decorador
+
+
+def directorio():
+    return Path(getattr(settings, 'TRABAJOS_DIR', Path(settings.BASE_DIR) / 'trabajos'))
+
+
+def ruta_archivo(trabajo, nombre):
+    """Ruta donde la tarea debe escribir su archivo `nombre` (crea el directorio del trabajo)."""
+    carpeta = directorio() / str(trabajo.pk)
+    carpeta.mkdir(parents=True, exist_ok=True)
+    return carpeta / nombre
+
+
+def encolar(tipo, usuario=None, **parametros):
+    """Crea un trabajo pendiente; `parametros` deben ser serializables a JSON."""
+    if tipo not in dict(Trabajo.TIPO_CHOICES):
+        raise ValueError(f"Tipo de trabajo desconocido: {tipo}")
+    return Trabajo.objects.create(tipo=tipo, usuario=usuario, parametros=parametros)
+
+
+def estado(trabajo):
+    """Estado del trabajo para el endpoint de consulta."""
+    datos = {
+        'id': trabajo.pk,
+        'tipo': trabajo.tipo,
+        'estado': trabajo.estado,
+        'progreso': trabajo.progreso,
+        'estado_url': reverse('trabajo_estado', args=[trabajo.pk]),
+    }
+    if trabajo.estado == Trabajo.TERMINADO and trabajo.archivo:
+        datos['descarga_url'] = reverse('trabajo_descargar', args=[trabajo.pk])
+    if trabajo.estado == Trabajo.ERROR:
+        datos['error'] = trabajo.error
+    return datos
+
+
+def es_ajax(request):
+    """True si la petición viene del fetch de la página (que sabe seguir un trabajo)."""
+    return request.headers.get('x-requested-with') == 'XMLHttpRequest'
+
+
+def respuesta_trabajo(request, trabajo):
+    """
+    Respuesta al encolar `trabajo`: al fetch de la página, 202 con su estado y la URL para
+    consultarlo; a un enlace abierto directamente, una redirección a su página de progreso.
+    """
+    if es_ajax(request):
+        return JsonResponse(estado(trabajo), status=202)
+    return redirect('trabajo_progreso', trabajo.pk)
+
+
+def _escribir_aparte(escritura):
+    """
+    Ejecuta una escritura corta con otra conexión (en un hilo propio). Mientras la
+    tarea lee con un cursor abierto, en SQLite un UPDATE por la misma conexión
+    quedaría dentro de esa lectura y retendría el lock de escritura hasta el final
+    de la exportación, bloqueando las ventas.
+
+    Dentro de una transacción (p. ej. en los tests) la conexión ya tiene el lock de
+    escritura: otra conexión quedaría esperándolo, así que se escribe por la misma.
+    """
+    if connection.in_atomic_block:
+        escritura()
+        return
+
+    def en_hilo():
+        try:
+            escritura()
+        finally:
+            connections.close_all()
+
+    hilo = threading.Thread(target=en_hilo)
+    hilo.start()
+    hilo.join()
+
+
+def informar_progreso(trabajo, hechos, total):
+    """Actualiza el porcentaje del trabajo sólo cuando cambia (a lo sumo cien UPDATE)."""
+    progreso = min(99, hechos * 100 // total) if total else 0
+    if progreso > trabajo.progreso:
+        trabajo.progreso = progreso
+        _escribir_aparte(lambda: Trabajo.objects.filter(pk=trabajo.pk).update(progreso=progreso))
+
+
+def con_progreso(trabajo, filas, total):
+    """Recorre `filas` informando el progreso del trabajo sobre `total` filas esperadas."""
+    for hechos, fila in enumerate(filas, start=1):
+        yield fila
+        informar_progreso(trabajo, hechos, total)
+
+
+def tomar_siguiente():
+    """Marca como en curso el trabajo pendiente más antiguo y lo devuelve (None si no hay)."""
+    pendientes = Trabajo.objects.filter(estado=Trabajo.PENDIENTE).order_by('fecha_creacion', 'pk')
+    for pk in pendientes.values_list('pk', flat=True)[:10]:
+        # Si otro hilo lo tomó primero, el UPDATE no afecta filas y se prueba con el siguiente
+        if Trabajo.objects.filter(pk=pk, estado=Trabajo.PENDIENTE).update(
+            estado=Trabajo.EN_CURSO, fecha_inicio=timezone.now(),
+        ):
+            return Trabajo.objects.get(pk=pk)
+    return None
+
+
+@reintentar_si_bloqueada
+def _registrar_resultado(trabajo, cambios):
+    Trabajo.objects.filter(pk=trabajo.pk).update(**cambios)
+
+
+def ejecutar(trabajo):
+    """Ejecuta un trabajo ya tomado y registra el resultado (archivo o error)."""
+    funcion = TAREAS.get(trabajo.tipo)
+    try:
+        if funcion is None:
+            raise ValueError(f"No hay tarea registrada para {trabajo.tipo}")
+        archivo = funcion(trabajo, **trabajo.parametros)
+    except Exception as error:
+        logger.exception("Falló el trabajo %s", trabajo.pk)
+        shutil.rmtree(directorio() / str(trabajo.pk), ignore_errors=True)
+        cambios = {'estado': Trabajo.ERROR, 'error': str(error)}
+    else:
+        cambios = {'estado': Trabajo.TERMINADO, 'progreso': 100, 'archivo': archivo or ''}
+    cambios['fecha_fin'] = timezone.now()
+    _registrar_resultado(trabajo, cambios)
+    for campo, valor in cambios.items():
+        setattr(trabajo, campo, valor)
+    return trabajo
+
+
+def liberar_abandonados():
+    """Vuelve a encolar los trabajos en curso hace más de TIEMPO_MAXIMO_TRABAJO."""
+    return Trabajo.objects.filter(
+        estado=Trabajo.EN_CURSO, fecha_inicio__lt=timezone.now() - TIEMPO_MAXIMO_TRABAJO,
+    ).update(estado=Trabajo.PENDIENTE, progreso=0, fecha_inicio=None)
+
+
+def purgar(dias=DIAS_CONSERVACION_TRABAJOS):
+    """Elimina los trabajos terminados o fallidos de hace más de `dias` días y sus archivos."""
+    viejos = Trabajo.objects.filter(
+        estado__in=(Trabajo.TERMINADO, Trabajo.ERROR), fecha_fin__lt=timezone.now() - timedelta(days=dias),
+    )
+    for pk in viejos.values_list('pk', flat=True):
+        shutil.rmtree(directorio() / str(pk), ignore_errors=True)
+    return viejos.delete()[0]
@@ -6,7 +6,9 @@ from panel.views import inicio
 urlpatterns = [
     path('eventos/', include('panel.urls.eventos')),
     path('ventas/', include('panel.urls.ventas')),
-    path('', inicio.dashboard_inicio, name='inicio_dashboard'),
+    path('', inicio.dashboard_inicio_async if settings.VISTAS_ASYNC else inicio.dashboard_inicio, name='inicio_dashboard'),
     path('tesoreria/', include('panel.urls.tesoreria')),
     path('productos/', include('panel.urls.productos')),
+    path('trabajos/', include('panel.urls.trabajos')),
+    path('buscar/', include('panel.urls.busqueda')),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,7 @@
+from django.urls import path
+from panel.views import busqueda
+
+urlpatterns = [
+    path('productos/', busqueda.buscar_productos, name='buscar_productos'),
+    path('movimientos/', busqueda.buscar_movimientos, name='buscar_movimientos'),
+]
@@ -3,5 +3,6 @@ from panel.views import eventos
 urlpatterns = [
     path('', eventos.lista_eventos, name="eventos_lista"),
     path('calendario/', eventos.calendario_eventos, name='calendario_eventos'),
+    path('calendario/eventos/', eventos.calendario_eventos_json, name='calendario_eventos_json'),
     path('detalles/<int:id>/', eventos.detalles_evento, name='evento_detalles'),
 ]
@@ -1,7 +1,8 @@
+from django.conf import settings
 from django.urls import path
 from panel.views import tesoreria
 urlpatterns = [
-    path('', tesoreria.balance_tesoreria, name="balance_tesoreria"),
-    path('ingresos/', tesoreria.ingresos_tesoreria, name='ingresos_tesoreria'),
-    path('egresos/', tesoreria.egresos_tesoreria, name='egresos_tesoreria'),
+    path('', tesoreria.balance_tesoreria_async if settings.VISTAS_ASYNC else tesoreria.balance_tesoreria, name="balance_tesoreria"),
+    path('ingresos/', tesoreria.ingresos_tesoreria_async if settings.VISTAS_ASYNC else tesoreria.ingresos_tesoreria, name='ingresos_tesoreria'),
+    path('egresos/', tesoreria.egresos_tesoreria_async if settings.VISTAS_ASYNC else tesoreria.egresos_tesoreria, name='egresos_tesoreria'),
 ]
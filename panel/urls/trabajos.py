@@ -0,0 +1,8 @@
+from django.urls import path
+from panel.views import trabajos
+
+urlpatterns = [
+    path('<int:id>/', trabajos.estado_trabajo, name='trabajo_estado'),
+    path('<int:id>/progreso/', trabajos.progreso_trabajo, name='trabajo_progreso'),
+    path('<int:id>/descargar/', trabajos.descargar_trabajo, name='trabajo_descargar'),
+]
@@ -1,9 +1,14 @@
+from django.conf import settings
 from django.urls import path
 from panel.views import ventas
 urlpatterns = [
     path('productos/', ventas.lista_productos, name="lista_productos"),
     path('historial/', ventas.historial_ventas, name='historial_ventas'),
     path('registrar/', ventas.registrar_ventas, name='registrar_ventas'),
+    path('registrar/catalogo/', ventas.catalogo_pos, name='catalogo_pos'),
     path('registrar/ajax/', ventas.registrar_venta_ajax, name='registrar_venta_ajax'),
-    path('stock/', ventas.stock_actual, name='stock_actual'),
+    path('registrar/ticket/', ventas.registrar_ticket_ajax, name='registrar_ticket_ajax'),
+    path('registrar/sincronizar/', ventas.sincronizar_ventas, name='sincronizar_ventas'),
+    path('stock/', ventas.stock_actual_async if settings.VISTAS_ASYNC else ventas.stock_actual, name='stock_actual'),
+    path('stock/stream/', ventas.stock_stream_async if settings.VISTAS_ASYNC else ventas.stock_stream, name='stock_stream'),
 ]
@@ -0,0 +1,45 @@
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from tesoreria.models import Movimiento
+from ventas.models import Producto
+from panel.busqueda import buscar, PRODUCTOS, MOVIMIENTOS
+
+
+def _en_orden(queryset, ids):
+    """Objetos de `ids` en ese orden (el de relevancia), omitiendo los que ya no existen."""
+    objetos = queryset.in_bulk(ids)
+    return [objetos[pk] for pk in ids if pk in objetos]
+
+
+@login_required
+def buscar_productos(request):
+    """Productos cuyo nombre empieza (por palabra) con lo buscado en ?q=, por relevancia."""
+    productos = _en_orden(Producto.objects, buscar(PRODUCTOS, request.GET.get('q', '')))
+    return JsonResponse({'resultados': [
+        {
+            'id': p.pk,
+            'nombre': p.nombre,
+            'stock': p.stock,
+            'precio_venta': str(p.precio_venta),
+            'activo': p.activo,
+        }
+        for p in productos
+    ]})
+
+
+@login_required
+def buscar_movimientos(request):
+    """Movimientos de tesorería cuya descripción coincide con ?q=, por relevancia."""
+    ids = buscar(MOVIMIENTOS, request.GET.get('q', ''))
+    movimientos = _en_orden(Movimiento.objects.select_related('evento'), ids)
+    return JsonResponse({'resultados': [
+        {
+            'id': m.pk,
+            'tipo': m.tipo,
+            'descripcion': m.descripcion,
+            'monto': str(m.monto),
+            'fecha': m.fecha.isoformat() if m.fecha else None,
+            'evento': m.evento.nombre if m.evento else None,
+        }
+        for m in movimientos
+    ]})
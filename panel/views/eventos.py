@@ -2,24 +2,34 @@ from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.utils.dateparse import parse_date
 from django.utils import timezone
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse
 from django.core.serializers.json import DjangoJSONEncoder
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill
 from datetime import date
-import io, json
-from ventas.models import Venta, Producto
+import json
+import logging
+from ventas.models import Venta
+from panel.exportaciones import ENCABEZADOS_VENTAS, filas_ventas, respuesta_csv
 from eventos.models import Evento
+from panel.cache_reportes import reporte_cacheado, EVENTOS
+from panel import artefactos
+from panel.reportes import datos_evento
+from panel.trabajos import encolar
+
+logger = logging.getLogger(__name__)
+
+# Rango máximo (en días) que puede pedir el calendario en una sola consulta
+MAX_DIAS_CALENDARIO = 400
+
 
 @login_required
 def lista_eventos(request):
     try:
-        eventos = Evento.objects.all().order_by('fecha')
+        eventos = list(Evento.objects.select_related('gestion').order_by('fecha', 'id'))
         hoy = date.today()
+        # El próximo evento es el primero (en orden de fecha) que no pasó todavía
+        proximo = next((e for e in eventos if e.fecha >= hoy), None)
         for evento in eventos:
-            evento.es_proximo = evento.fecha >= hoy and not any(
-                e.es_proximo for e in eventos if e.fecha > hoy and e != evento
-            )
+            evento.es_proximo = evento is proximo
     except Exception:
         eventos = []
     return render(request, 'eventos/lista.html', {'eventos': eventos})
@@ -29,131 +39,93 @@ def lista_eventos(request):
 def calendario_eventos(request):
     try:
         hoy = timezone.now().date()
-        eventos = Evento.objects.all().select_related('gestion').order_by('fecha')
-        
-        eventos_json = [
-            {
-                "id": e.id,
-                "title": e.nombre,
-                "start": e.fecha.isoformat(),
-                "description": e.descripcion or "Sin descripción",
-                "lugar": e.lugar or "Por definir",
-                "gestion": e.gestion.nombre if e.gestion else "Sin gestión",
-                "recaudacion": f"${e.recaudacion_total:.2f}",
-                "className": "evento-proximo" if e.fecha >= hoy else "evento-pasado"
-            }
-            for e in eventos
-        ]
-        
+        eventos = Evento.objects.all()
+
         # Eventos próximos para el panel lateral
-        eventos_proximos = eventos.filter(fecha__gte=hoy)[:5]
-        
-    except Exception as e:
+        eventos_proximos = eventos.filter(fecha__gte=hoy).order_by('fecha')[:5]
+
+    except Exception:
+        logger.exception("Error al armar el calendario de eventos")
         eventos = []
-        eventos_json = []
         eventos_proximos = []
-        print(f"Error en calendario: {e}")
 
     context = {
         "eventos": eventos,
         "eventos_proximos": eventos_proximos,
-        "eventos_json": json.dumps(eventos_json, cls=DjangoJSONEncoder),
     }
     return render(request, "eventos/calendario.html", context)
 
 
+def _eventos_calendario(desde, hasta, hoy):
+    eventos = Evento.objects.filter(fecha__gte=desde, fecha__lt=hasta).select_related('gestion').order_by('fecha')
+    return [
+        {
+            "id": e.id,
+            "title": e.nombre,
+            "start": e.fecha.isoformat(),
+            "description": e.descripcion or "Sin descripción",
+            "lugar": e.lugar or "Por definir",
+            "gestion": e.gestion.nombre if e.gestion else "Sin gestión",
+            "recaudacion": f"${e.recaudacion_total:.2f}",
+            "className": "evento-proximo" if e.fecha >= hoy else "evento-pasado"
+        }
+        for e in eventos
+    ]
+
+
+@login_required
+def calendario_eventos_json(request):
+    """
+    Eventos de un rango de fechas en el formato de FullCalendar, que pide sólo lo
+    visible con ?start=...&end=... (fechas ISO; se ignora la hora). El fin es exclusivo.
+    """
+    desde = parse_date(request.GET.get('start', '')[:10])
+    hasta = parse_date(request.GET.get('end', '')[:10])
+    if desde is None or hasta is None or hasta <= desde:
+        return JsonResponse({'error': 'Parámetros start/end inválidos'}, status=400)
+    if (hasta - desde).days > MAX_DIAS_CALENDARIO:
+        return JsonResponse({'error': f'El rango no puede superar {MAX_DIAS_CALENDARIO} días'}, status=400)
+
+    hoy = timezone.now().date()
+    eventos = reporte_cacheado(
+        'calendario_eventos', (EVENTOS,), lambda: _eventos_calendario(desde, hasta, hoy), desde, hasta, hoy,
+    )
+    return JsonResponse(eventos, safe=False)
+
+
 @login_required
 def detalles_evento(request, id):
     evento = get_object_or_404(Evento, id=id)
-    try:
-        ventas = Venta.objects.filter(evento=evento).select_related('producto')
-    except Exception:
-        ventas = []
+    export = request.GET.get('export')
+    if export == 'xlsx':
+        nombre = f'evento_{id}_detalle.xlsx'
+        # La planilla se arma en el worker de trabajos; la página consulta el progreso
+        return artefactos.respuesta_exportacion(
+            request, artefactos.clave_evento(evento), nombre,
+            lambda: encolar('exportar_evento', request.user, evento_id=evento.pk, nombre=nombre),
+        )
 
-    try:
-        total_ventas = ventas.count() if hasattr(ventas, 'count') else len(ventas)
-        total_ganancias = sum((v.precio_unitario_venta * v.cantidad) for v in ventas)
-        ganancias_netas = sum(getattr(v, 'ganancia', lambda: 0)() for v in ventas)
-    except Exception:
-        total_ventas = total_ganancias = ganancias_netas = 0
-
-    # Productos vendidos
-    productos_stats = {}
-    for v in ventas:
-        try:
-            productos_stats[v.producto.nombre] = productos_stats.get(v.producto.nombre, 0) + v.cantidad
-        except Exception:
-            continue
-    productos_labels = list(productos_stats.keys())
-    productos_data = list(productos_stats.values())
-    total_productos = sum(productos_data)
-
-    # Métodos de pago
-    pagos_stats = {}
-    for v in ventas:
-        try:
-            pagos_stats[v.medio_de_pago] = pagos_stats.get(v.medio_de_pago, 0) + 1
-        except Exception:
-            continue
+    datos = datos_evento(evento)
+    totales = datos['totales']
+    total_ventas = totales['ventas']
+    total_ganancias = totales['bruto']
+    ganancias_netas = totales['neto']
+
+    productos_labels = [p['producto__nombre'] for p in datos['por_producto']]
+    productos_data = [p['unidades'] for p in datos['por_producto']]
+    total_productos = totales['unidades']
+
+    pagos_stats = datos['pagos_stats']
     pagos_labels = list(pagos_stats.keys())
     pagos_data = list(pagos_stats.values())
 
-    # Datos de exportación XLSX
-    productos_export = []
-    for nombre, cantidad in productos_stats.items():
-        try:
-            precio_unitario_venta = float(next(v.precio_unitario_venta for v in ventas if v.producto.nombre == nombre))
-            precio_unitario_compra = float(next(v.precio_unitario_compra for v in ventas if v.producto.nombre == nombre))
-            total = float(sum(v.total() for v in ventas if v.producto.nombre == nombre))
-            ganancia = float(sum(v.ganancia() for v in ventas if v.producto.nombre == nombre))
-            productos_export.append({
-                'Producto': nombre,
-                'Cantidad': cantidad,
-                'Precio Unitario Venta': precio_unitario_venta,
-                'Precio Unitario Compra': precio_unitario_compra,
-                'Total': total,
-                'Ganancia': ganancia,
-            })
-        except Exception:
-            continue
-
+    productos_export = datos['productos_export']
     pagos_export = [{'Metodo de pago': k, 'Cantidad': v} for k, v in pagos_stats.items()]
 
-    if request.GET.get('export') == 'xlsx':
-        output = io.BytesIO()
-        wb = Workbook()
-        ws = wb.active
-        ws.title = f"Evento {evento.nombre}"
-
-        headers = ["Producto", "Cantidad", "Precio Unitario Venta", "Precio Unitario Compra", "Total", "Ganancia"]
-        ws.append(headers)
-        for cell in ws[1]:
-            cell.font = Font(bold=True)
-            cell.fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
-            cell.alignment = Alignment(horizontal="center")
-
-        for item in productos_export:
-            ws.append([
-                item['Producto'],
-                item['Cantidad'],
-                item['Precio Unitario Venta'],
-                item['Precio Unitario Compra'],
-                item['Total'],
-                item['Ganancia']
-            ])
-
-        ws.append([])
-        ws.append(["", "", "", "Total bruto", float(total_ganancias)])
-        ws.append(["", "", "", "Ganancia neta", float(ganancias_netas)])
-
-        wb.save(output)
-        output.seek(0)
-        response = HttpResponse(
-            output,
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    if export == 'csv':
+        return respuesta_csv(
+            f'evento_{id}_ventas.csv', ENCABEZADOS_VENTAS, filas_ventas(Venta.objects.filter(evento=evento))
         )
-        response['Content-Disposition'] = f'attachment; filename=evento_{id}_detalle.xlsx'
-        return response
 
     context = {
         "evento": evento,
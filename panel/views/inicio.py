@@ -1,95 +1,99 @@
 from django.shortcuts import render
-from django.db.models import Sum, F, Count, Avg
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
 from datetime import timedelta, datetime
 from eventos.models import Evento
-from ventas.models import Venta
-from ventas.models import Producto
+from ventas.models import Venta, ResumenDiario, ResumenEventoProducto
+from ventas.reportes import totales_resumen, resumen_por_evento, resumen_por_producto
+from panel.cache_reportes import reporte_cacheado, reporte_cacheado_async, VENTAS, PRODUCTOS, EVENTOS
+from panel.asincronia import ejecutar_concurrentes, render_async
 import json
-from decimal import Decimal
 
 @login_required
 def dashboard_inicio(request):
-    # Métricas básicas
-    total_eventos = Evento.objects.count()
-    total_ventas = Venta.objects.count()
-    
-    # Cálculo de ganancias
-    ventas_totales = Venta.objects.all()
-    total_ganancias = sum(venta.total() for venta in ventas_totales)
-    ganancias_netas = sum(venta.ganancia() for venta in ventas_totales)
-    
-    # Convertir Decimal a float para evitar errores de serialización
-    total_ganancias = float(total_ganancias) if isinstance(total_ganancias, Decimal) else total_ganancias
-    ganancias_netas = float(ganancias_netas) if isinstance(ganancias_netas, Decimal) else ganancias_netas
-    
-    # Métricas adicionales
-    eventos_proximos = Evento.objects.filter(fecha__gte=timezone.now().date()).count()
-    
+    hoy = timezone.localdate()
+    # Sólo se recalcula cuando cambian ventas, productos o eventos (o cambia el día)
+    context = reporte_cacheado(
+        'dashboard_inicio', (VENTAS, PRODUCTOS, EVENTOS), lambda: _contexto_dashboard(hoy), hoy,
+    )
+    context = dict(context, fecha_actual=timezone.now())
+    return render(request, 'inicio.html', context)
+
+
+@login_required
+async def dashboard_inicio_async(request):
+    """Versión ASGI del dashboard: las consultas independientes se ejecutan a la vez."""
+    hoy = timezone.localdate()
+
+    async def calcular():
+        return _armar_contexto_dashboard(await ejecutar_concurrentes(_consultas_dashboard(hoy)))
+
+    context = await reporte_cacheado_async('dashboard_inicio', (VENTAS, PRODUCTOS, EVENTOS), calcular, hoy)
+    context = dict(context, fecha_actual=timezone.now())
+    return await render_async(request, 'inicio.html', context)
+
+
+def _consultas_dashboard(hoy):
+    """Consultas independientes del dashboard, cada una ya evaluada al llamarla."""
+    inicio_mes = hoy.replace(day=1)
+    return {
+        'total_eventos': lambda: Evento.objects.count(),
+        # Totales generales y del mes, leídos de la tabla de resumen diaria
+        'totales': lambda: totales_resumen(ResumenDiario.objects.all()),
+        'totales_mes': lambda: totales_resumen(ResumenDiario.objects.filter(fecha__gte=inicio_mes)),
+        'eventos_proximos': lambda: Evento.objects.filter(fecha__gte=hoy).count(),
+        # Productos más vendidos
+        'productos_mas_vendidos': lambda: list(resumen_por_producto(ResumenDiario.objects.all())[:5]),
+        # Top eventos por ventas - DATOS REALES
+        'eventos_top': lambda: list(resumen_por_evento(ResumenEventoProducto.objects.all())[:5]),
+        # Ventas recientes
+        'ventas_recientes': lambda: list(Venta.objects.select_related('producto').order_by('-fecha_hora')[:5]),
+    }
+
+
+def _contexto_dashboard(hoy):
+    consultas = _consultas_dashboard(hoy)
+    return _armar_contexto_dashboard({nombre: consulta() for nombre, consulta in consultas.items()})
+
+
+def _armar_contexto_dashboard(datos):
+    totales = datos['totales']
+    totales_mes = datos['totales_mes']
+
+    total_ventas = totales['ventas']
+    total_ganancias = float(totales['bruto'])
+    ganancias_netas = float(totales['neto'])
+
     # Ventas del mes actual
-    inicio_mes = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    ventas_mes = Venta.objects.filter(fecha_hora__gte=inicio_mes).count()
-    
-    ganancias_mes_query = Venta.objects.filter(fecha_hora__gte=inicio_mes)
-    ganancias_mes = sum(venta.total() for venta in ganancias_mes_query)
-    ganancias_mes = float(ganancias_mes) if isinstance(ganancias_mes, Decimal) else ganancias_mes
-    
+    ventas_mes = totales_mes['ventas']
+    ganancias_mes = float(totales_mes['bruto'])
+
     # Cálculo de margen de ganancia
     margen_ganancia = (ganancias_netas / total_ganancias * 100) if total_ganancias > 0 else 0
-    
-    # Productos más vendidos
-    productos_mas_vendidos = Producto.objects.annotate(
-        total_vendido=Sum('venta__cantidad')
-    ).order_by('-total_vendido')[:5]
-    
-    labels_productos = [p.nombre for p in productos_mas_vendidos]
-    data_productos = [p.total_vendido or 0 for p in productos_mas_vendidos]
-    
+
+    productos_mas_vendidos = datos['productos_mas_vendidos']
+    labels_productos = [p['producto__nombre'] for p in productos_mas_vendidos]
+    data_productos = [p['unidades'] or 0 for p in productos_mas_vendidos]
+
     # Distribución de medios de pago - SOLO EFECTIVO Y MERCADO PAGO
-    ventas_efectivo = Venta.objects.filter(medio_de_pago='Efectivo').aggregate(
-        total=Sum('precio_unitario_venta')
-    )['total'] or 0
-    ventas_mp = Venta.objects.filter(medio_de_pago='Mercado Pago').aggregate(
-        total=Sum('precio_unitario_venta')
-    )['total'] or 0
-    
-    # Convertir Decimal a float
-    ventas_efectivo = float(ventas_efectivo) if isinstance(ventas_efectivo, Decimal) else ventas_efectivo
-    ventas_mp = float(ventas_mp) if isinstance(ventas_mp, Decimal) else ventas_mp
-    
-    distribucion_pagos = [ventas_efectivo, ventas_mp]
-    
-    # Top eventos por ventas - DATOS REALES
-    eventos_top = Evento.objects.annotate(
-        total_ventas=Sum('venta__precio_unitario_venta')
-    ).filter(total_ventas__isnull=False).order_by('-total_ventas')[:5]
-    
-    labels_eventos = [e.nombre for e in eventos_top]
-    data_eventos = []
-    for e in eventos_top:
-        total = e.total_ventas or 0
-        # Convertir Decimal a float
-        total = float(total) if isinstance(total, Decimal) else total
-        data_eventos.append(total)
-    
+    distribucion_pagos = [float(totales['efectivo']), float(totales['mercado_pago'])]
+
+    eventos_top = datos['eventos_top']
+    labels_eventos = [e['evento__nombre'] for e in eventos_top]
+    data_eventos = [float(e['bruto']) for e in eventos_top]
+
     # Métricas de rendimiento
     ticket_promedio = total_ganancias / total_ventas if total_ventas > 0 else 0
-    productos_por_venta_query = Venta.objects.aggregate(avg=Avg('cantidad'))
-    productos_por_venta = productos_por_venta_query['avg'] or 0
-    productos_por_venta = float(productos_por_venta) if isinstance(productos_por_venta, Decimal) else productos_por_venta
-    
+    productos_por_venta = float(totales['promedio_unidades'] or 0)
+
     eficiencia_ventas = min(100, (ventas_mes / max(1, total_ventas) * 100 * 4))  # Ejemplo simplificado
-    
-    # Ventas recientes
-    ventas_recientes = Venta.objects.select_related('producto').order_by('-fecha_hora')[:5]
-    
+
     context = {
-        'total_eventos': total_eventos,
+        'total_eventos': datos['total_eventos'],
         'total_ventas': total_ventas,
         'total_ganancias': total_ganancias,
         'ganancias_netas': ganancias_netas,
-        'eventos_proximos': eventos_proximos,
+        'eventos_proximos': datos['eventos_proximos'],
         'ventas_mes': ventas_mes,
         'ganancias_mes': ganancias_mes,
         'margen_ganancia': round(margen_ganancia, 1),
@@ -101,8 +105,6 @@ def dashboard_inicio(request):
         'ticket_promedio': round(ticket_promedio, 2),
         'productos_por_venta': round(productos_por_venta, 1),
         'eficiencia_ventas': round(eficiencia_ventas, 1),
-        'ventas_recientes': ventas_recientes,
-        'fecha_actual': timezone.now(),
+        'ventas_recientes': datos['ventas_recientes'],
     }
-    
-    return render(request, 'inicio.html', context)
+    return context
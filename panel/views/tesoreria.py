@@ -1,71 +1,239 @@
+import asyncio
+from datetime import timedelta
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
-from django.db.models import Sum, Count, Q
+from django.utils import timezone
+from django.db.models import Sum
 from tesoreria.models import Movimiento
 from eventos.models import Evento
+from tesoreria.cierres import resumen, saldos, saldos_de
+from tesoreria.libro import serie_saldos
 from decimal import Decimal
+from panel.filtros import leer_filtros, filtrar_movimientos, inicio_del_rango, fin_del_rango
+from panel.paginacion import paginar_por_cursor
+from panel import busqueda
+from panel.cache_reportes import reporte_cacheado, reporte_cacheado_async, MOVIMIENTOS, EVENTOS
+from panel.asincronia import ejecutar_concurrentes, render_async
+
+def _clave_filtros(filtros):
+    return (filtros['evento'], filtros['desde'], filtros['hasta'])
+
+
+def _clave_balance(filtros):
+    # Sin fecha final la serie del balance termina hoy: el día forma parte de la clave
+    return (*_clave_filtros(filtros), timezone.localdate())
+
+
+def _listado(movimientos, filtros, request):
+    """
+    Página del listado de movimientos. El texto buscado sólo restringe el listado
+    (con el índice de búsqueda); las métricas siguen los demás filtros.
+    """
+    movimientos = busqueda.filtrar_por_texto(movimientos, busqueda.MOVIMIENTOS, filtros['q'])
+    return paginar_por_cursor(movimientos, request)
+
+
+def _saldos_desde_cierre(filtros, hasta):
+    """(totales, eventos con sus saldos) a partir del último cierre, restringidos al evento del filtro."""
+    totales, por_evento = resumen(hasta)
+    if filtros['evento']:
+        por_evento = {filtros['evento']: por_evento.get(filtros['evento'], saldos_de(Movimiento.objects.none()))}
+        totales = por_evento[filtros['evento']]
+    return totales, _eventos_con_saldos(por_evento)
+
+
+def _eventos_con_saldos(por_evento):
+    """Eventos de {evento_id: saldos} con los saldos como atributos (una consulta)."""
+    eventos = Evento.objects.in_bulk(list(por_evento))
+    for evento_id, evento in eventos.items():
+        for campo, valor in por_evento[evento_id].items():
+            setattr(evento, campo, valor)
+    return list(eventos.values())
+
+
+def _consultas_ingresos(filtros):
+    """Consultas independientes del resumen de ingresos, cada una ya evaluada al llamarla."""
+    if filtros['desde'] is None:
+        # Sin fecha de inicio: desde el último cierre de gestión, agregando sólo lo posterior
+        return {
+            'saldos': lambda: _saldos_desde_cierre(filtros, fin_del_rango(filtros['hasta'])),
+            # Lista de eventos para el filtro
+            'eventos_list': lambda: list(Evento.objects.filter(movimiento__tipo='Ingreso').distinct()),
+        }
+
+    ingresos = filtrar_movimientos(Movimiento.objects.filter(tipo='Ingreso'), filtros, con_tipo=False)
+    return {
+        # Totales en una sola consulta de agregación; ingresos por evento
+        'saldos': lambda: (saldos_de(ingresos), list(Evento.objects.filter(
+            movimiento__in=ingresos
+        ).annotate(
+            total_ingresos=Sum('movimiento__monto')
+        ).filter(total_ingresos__isnull=False))),
+        # Lista de eventos para el filtro
+        'eventos_list': lambda: list(Evento.objects.filter(movimiento__tipo='Ingreso').distinct()),
+    }
+
+
+def _armar_resumen_ingresos(datos):
+    totales, por_evento = datos['saldos']
+    por_evento = [evento for evento in por_evento if evento.total_ingresos]
+    total_ingresos = totales['total_ingresos']
 
-@login_required
-def ingresos_tesoreria(request):
-    """Listado de ingresos con métricas avanzadas"""
-    ingresos = Movimiento.objects.filter(tipo='Ingreso').select_related('evento').order_by('-fecha')
-    total_ingresos = ingresos.aggregate(total=Sum('monto'))['total'] or 0
-    
     # Convertir Decimal a float si es necesario
     if isinstance(total_ingresos, Decimal):
         total_ingresos = float(total_ingresos)
-    
-    # Contar eventos con ingresos
-    eventos_count = ingresos.values('evento').distinct().count()
-    
-    # Obtener lista de eventos para el filtro
-    eventos_list = Evento.objects.filter(movimiento__tipo='Ingreso').distinct()
-    
-    # Ingresos por evento para el gráfico
-    eventos_ingresos = Evento.objects.filter(
-        movimiento__tipo='Ingreso'
-    ).annotate(
-        total=Sum('movimiento__monto')
-    ).filter(total__isnull=False).order_by('-total')[:6]  # Top 6 eventos
-    
-    # Convertir Decimal a float para el gráfico
+
+    # Top 6 eventos para el gráfico (convirtiendo Decimal a float)
+    eventos_ingresos = sorted(por_evento, key=lambda e: e.total_ingresos, reverse=True)[:6]
     for evento in eventos_ingresos:
-        if isinstance(evento.total, Decimal):
-            evento.total = float(evento.total)
-    
-    context = {
-        'movimientos': ingresos,
+        evento.total = float(evento.total_ingresos)
+
+    return {
+        'movimientos_count': totales['cantidad_ingresos'],
         'total': total_ingresos,
-        'eventos_count': eventos_count,
-        'eventos_list': eventos_list,
+        # Contar eventos con ingresos
+        'eventos_count': len(por_evento),
+        'eventos_list': datos['eventos_list'],
         'eventos_ingresos': eventos_ingresos,
     }
-    
+
+
+def _resumen_ingresos(filtros):
+    """Totales y gráfico de ingresos (sin la página del listado), para guardar en cache."""
+    consultas = _consultas_ingresos(filtros)
+    return _armar_resumen_ingresos({nombre: consulta() for nombre, consulta in consultas.items()})
+
+
+@login_required
+def ingresos_tesoreria(request):
+    """Listado de ingresos con métricas avanzadas"""
+    filtros = leer_filtros(request)
+    ingresos = filtrar_movimientos(Movimiento.objects.filter(tipo='Ingreso'), filtros, con_tipo=False)
+
+    # Métricas cacheadas hasta el próximo cambio en movimientos o eventos
+    resumen = reporte_cacheado(
+        'ingresos_tesoreria', (MOVIMIENTOS, EVENTOS), lambda: _resumen_ingresos(filtros), *_clave_filtros(filtros),
+    )
+    context = dict(
+        resumen,
+        movimientos=_listado(ingresos.select_related('evento'), filtros, request),
+        filtros=filtros,
+    )
     return render(request, 'tesoreria/ingresos.html', context)
 
+
+@login_required
+async def ingresos_tesoreria_async(request):
+    """Versión ASGI de ingresos: métricas y página del listado se consultan a la vez."""
+    filtros = leer_filtros(request)
+    ingresos = filtrar_movimientos(Movimiento.objects.filter(tipo='Ingreso'), filtros, con_tipo=False)
+
+    async def calcular():
+        return _armar_resumen_ingresos(await ejecutar_concurrentes(_consultas_ingresos(filtros)))
+
+    resumen, listado = await asyncio.gather(
+        reporte_cacheado_async('ingresos_tesoreria', (MOVIMIENTOS, EVENTOS), calcular, *_clave_filtros(filtros)),
+        ejecutar_concurrentes({'pagina': lambda: _listado(ingresos.select_related('evento'), filtros, request)}),
+    )
+    context = dict(resumen, movimientos=listado['pagina'], filtros=filtros)
+    return await render_async(request, 'tesoreria/ingresos.html', context)
+
+
+def _total_egresos(filtros, egresos):
+    """Total de egresos del rango filtrado, para guardar en cache."""
+    if filtros['desde'] is None:
+        total = saldos(filtros['evento'], fin_del_rango(filtros['hasta']))['total_egresos']
+    else:
+        total = egresos.aggregate(total=Sum('monto'))['total'] or 0
+    # Convertir Decimal a float si es necesario
+    return float(total) if isinstance(total, Decimal) else total
+
+
 @login_required
 def egresos_tesoreria(request):
     """Listado de egresos"""
-    egresos = Movimiento.objects.filter(tipo='Egreso').select_related('evento')
-    total_egresos = egresos.aggregate(total=Sum('monto'))['total'] or 0
-    
-    # Convertir Decimal a float si es necesario
-    if isinstance(total_egresos, Decimal):
-        total_egresos = float(total_egresos)
-    
+    filtros = leer_filtros(request)
+    egresos = filtrar_movimientos(Movimiento.objects.filter(tipo='Egreso'), filtros, con_tipo=False)
+    total_egresos = reporte_cacheado(
+        'egresos_tesoreria', (MOVIMIENTOS,), lambda: _total_egresos(filtros, egresos), *_clave_filtros(filtros),
+    )
     return render(request, 'tesoreria/egresos.html', {
-        'movimientos': egresos,
-        'total': total_egresos
+        'movimientos': _listado(egresos.select_related('evento'), filtros, request),
+        'total': total_egresos,
+        'filtros': filtros,
     })
 
+
 @login_required
-def balance_tesoreria(request):
-    """Balance: ingresos - egresos con métricas avanzadas"""
-    # Totales básicos
-    total_ingresos = Movimiento.objects.filter(tipo='Ingreso').aggregate(total=Sum('monto'))['total'] or 0
-    total_egresos = Movimiento.objects.filter(tipo='Egreso').aggregate(total=Sum('monto'))['total'] or 0
+async def egresos_tesoreria_async(request):
+    """Versión ASGI de egresos: total y página del listado se consultan a la vez."""
+    filtros = leer_filtros(request)
+    egresos = filtrar_movimientos(Movimiento.objects.filter(tipo='Egreso'), filtros, con_tipo=False)
+
+    async def calcular():
+        return (await ejecutar_concurrentes({'total': lambda: _total_egresos(filtros, egresos)}))['total']
+
+    total_egresos, listado = await asyncio.gather(
+        reporte_cacheado_async('egresos_tesoreria', (MOVIMIENTOS,), calcular, *_clave_filtros(filtros)),
+        ejecutar_concurrentes({'pagina': lambda: _listado(egresos.select_related('evento'), filtros, request)}),
+    )
+    return await render_async(request, 'tesoreria/egresos.html', {
+        'movimientos': listado['pagina'],
+        'total': total_egresos,
+        'filtros': filtros,
+    })
+
+
+# Puntos del gráfico de evolución del balance (sin rango, el último año)
+PUNTOS_SERIE_BALANCE = 12
+
+
+def _serie_balance(filtros):
+    """Balance acumulado del centro a lo largo del rango filtrado, desde el libro de saldos (una consulta)."""
+    fin = fin_del_rango(filtros['hasta']) or timezone.now()
+    inicio = inicio_del_rango(filtros['desde']) or fin - timedelta(days=365)
+    momentos = [inicio + (fin - inicio) * i / PUNTOS_SERIE_BALANCE for i in range(PUNTOS_SERIE_BALANCE + 1)]
+    return {
+        # Cada punto es el saldo al final del día anterior al momento
+        'labels': [timezone.localtime(m - timedelta(microseconds=1)).strftime('%d/%m/%Y') for m in momentos],
+        'saldos': [float(saldo) for saldo in serie_saldos(momentos)],
+    }
+
+
+def _balance_desde_cierre():
+    totales, por_evento = resumen()
+    return {'totales': totales, 'eventos': _eventos_con_saldos(por_evento)}
+
+
+def _consultas_balance(filtros):
+    """Consultas independientes del balance, cada una ya evaluada al llamarla."""
+    consultas = {
+        # Evolución del balance
+        'serie': lambda: _serie_balance(filtros),
+    }
+    if filtros['desde'] is None:
+        # Sin fecha de inicio: desde el último cierre de gestión, agregando sólo lo posterior
+        if filtros['hasta'] is None and not filtros['evento']:
+            # Totales y eventos salen del mismo resumen
+            consultas['resumen'] = _balance_desde_cierre
+            return consultas
+        consultas['totales'] = lambda: _saldos_desde_cierre(filtros, fin_del_rango(filtros['hasta']))[0]
+    else:
+        # Totales y conteos en una sola consulta (el filtro de tipo sólo afecta al listado)
+        consultas['totales'] = lambda: saldos_de(filtrar_movimientos(Movimiento.objects.all(), filtros, con_tipo=False))
+    # Balance por eventos (todos los movimientos, a partir del último cierre)
+    consultas['eventos'] = lambda: _eventos_con_saldos(resumen()[1])
+    return consultas
+
+
+def _armar_resumen_balance(datos):
+    if 'resumen' in datos:
+        datos = dict(datos, **datos['resumen'])
+    totales = datos['totales']
+    total_ingresos = totales['total_ingresos']
+    total_egresos = totales['total_egresos']
     balance_total = total_ingresos - total_egresos
-    
+
     # Convertir Decimal a float si es necesario
     if isinstance(total_ingresos, Decimal):
         total_ingresos = float(total_ingresos)
@@ -73,28 +241,13 @@ def balance_tesoreria(request):
         total_egresos = float(total_egresos)
     if isinstance(balance_total, Decimal):
         balance_total = float(balance_total)
-    
-    # Contar transacciones
-    ingresos_count = Movimiento.objects.filter(tipo='Ingreso').count()
-    egresos_count = Movimiento.objects.filter(tipo='Egreso').count()
-    
-    # Todos los movimientos
-    movimientos = Movimiento.objects.select_related('evento').order_by('-fecha')
-    
-    # Balance por eventos
-    eventos_con_movimientos = Evento.objects.filter(
-        movimiento__isnull=False
-    ).distinct().annotate(
-        total_ingresos=Sum('movimiento__monto', filter=Q(movimiento__tipo='Ingreso')),
-        total_egresos=Sum('movimiento__monto', filter=Q(movimiento__tipo='Egreso'))
-    )
-    
+
     eventos_con_balance = []
-    for evento in eventos_con_movimientos:
+    for evento in datos['eventos']:
         ingresos_evento = evento.total_ingresos or 0
         egresos_evento = evento.total_egresos or 0
         balance_evento = ingresos_evento - egresos_evento
-        
+
         # Convertir Decimal a float
         if isinstance(ingresos_evento, Decimal):
             ingresos_evento = float(ingresos_evento)
@@ -102,22 +255,73 @@ def balance_tesoreria(request):
             egresos_evento = float(egresos_evento)
         if isinstance(balance_evento, Decimal):
             balance_evento = float(balance_evento)
-            
+
         eventos_con_balance.append({
             'nombre': evento.nombre,
             'ingresos': ingresos_evento,
             'egresos': egresos_evento,
             'balance': balance_evento
         })
-    
-    context = {
-        'movimientos': movimientos,
+
+    return {
         'total_ingresos': total_ingresos,
         'total_egresos': total_egresos,
         'balance_total': balance_total,
-        'ingresos_count': ingresos_count,
-        'egresos_count': egresos_count,
+        # Contar transacciones
+        'ingresos_count': totales['cantidad_ingresos'],
+        'egresos_count': totales['cantidad_egresos'],
         'eventos_con_balance': eventos_con_balance,
+        'eventos_list': sorted(datos['eventos'], key=lambda e: e.nombre),
+        'serie_balance': datos['serie'],
     }
-    
-    return render(request, 'tesoreria/balance.html', context)
\ No newline at end of file
+
+
+def _resumen_balance(filtros):
+    """Totales, conteos y balance por evento (sin la página del listado), para guardar en cache."""
+    consultas = _consultas_balance(filtros)
+    return _armar_resumen_balance({nombre: consulta() for nombre, consulta in consultas.items()})
+
+
+def _contexto_balance(resumen, pagina, filtros):
+    return dict(
+        resumen,
+        movimientos=pagina,
+        movimientos_count={'Ingreso': resumen['ingresos_count'], 'Egreso': resumen['egresos_count']}.get(
+            filtros['tipo'], resumen['ingresos_count'] + resumen['egresos_count']
+        ),
+        filtros=filtros,
+    )
+
+
+@login_required
+def balance_tesoreria(request):
+    """Balance: ingresos - egresos con métricas avanzadas"""
+    filtros = leer_filtros(request)
+
+    # Métricas cacheadas hasta el próximo cambio en movimientos o eventos
+    resumen = reporte_cacheado(
+        'balance_tesoreria', (MOVIMIENTOS, EVENTOS), lambda: _resumen_balance(filtros), *_clave_balance(filtros),
+    )
+
+    # Movimientos del listado (paginados por cursor)
+    movimientos = filtrar_movimientos(Movimiento.objects.select_related('evento'), filtros)
+
+    context = _contexto_balance(resumen, _listado(movimientos, filtros, request), filtros)
+    return render(request, 'tesoreria/balance.html', context)
+
+
+@login_required
+async def balance_tesoreria_async(request):
+    """Versión ASGI del balance: métricas y página del listado se consultan a la vez."""
+    filtros = leer_filtros(request)
+    movimientos = filtrar_movimientos(Movimiento.objects.select_related('evento'), filtros)
+
+    async def calcular():
+        return _armar_resumen_balance(await ejecutar_concurrentes(_consultas_balance(filtros)))
+
+    resumen, listado = await asyncio.gather(
+        reporte_cacheado_async('balance_tesoreria', (MOVIMIENTOS, EVENTOS), calcular, *_clave_balance(filtros)),
+        ejecutar_concurrentes({'pagina': lambda: _listado(movimientos, filtros, request)}),
+    )
+    context = _contexto_balance(resumen, listado['pagina'], filtros)
+    return await render_async(request, 'tesoreria/balance.html', context)
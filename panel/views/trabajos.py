@@ -0,0 +1,35 @@
+from django.contrib.auth.decorators import login_required
+from django.http import FileResponse, Http404, JsonResponse
+from django.shortcuts import get_object_or_404, render
+from panel.models import Trabajo
+from panel.trabajos import directorio, estado
+
+
+def _trabajo_del_usuario(request, id):
+    trabajo = get_object_or_404(Trabajo, id=id)
+    if trabajo.usuario_id != request.user.pk and not request.user.is_staff:
+        raise Http404
+    return trabajo
+
+
+@login_required
+def estado_trabajo(request, id):
+    """Estado y progreso de un trabajo en segundo plano; al terminar incluye la URL de descarga."""
+    return JsonResponse(estado(_trabajo_del_usuario(request, id)))
+
+
+@login_required
+def progreso_trabajo(request, id):
+    """Página que sigue el progreso de un trabajo y descarga su archivo al terminar (sin el fetch de la página de origen)."""
+    trabajo = _trabajo_del_usuario(request, id)
+    return render(request, 'trabajos/progreso.html', {'trabajo': trabajo, 'estado': estado(trabajo)})
+
+
+@login_required
+def descargar_trabajo(request, id):
+    """Archivo generado por un trabajo terminado."""
+    trabajo = _trabajo_del_usuario(request, id)
+    ruta = directorio() / trabajo.archivo
+    if trabajo.estado != Trabajo.TERMINADO or not trabajo.archivo or not ruta.is_file():
+        raise Http404
+    return FileResponse(open(ruta, 'rb'), as_attachment=True, filename=ruta.name)
@@ -3,173 +3,356 @@ from django.db.models import Q
 from django.contrib.auth.decorators import login_required
 from ventas.models import Producto, Venta
 from django.db.models import Sum, Count
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.dateparse import parse_datetime
+from django.utils.http import parse_etags
 from django.core.paginator import Paginator
 import json
+import re
+import time
+from asgiref.sync import sync_to_async
 from django.views.decorators.csrf import csrf_exempt
 from eventos.models import Evento
 from tesoreria.models import Movimiento
 from django.db import transaction
 from decimal import Decimal
-from openpyxl import Workbook
+from ventas.servicios import registrar_venta, registrar_ticket, sincronizar_tickets, reponer_stock, TicketDuplicado
+from panel import artefactos
+from panel.exportaciones import ENCABEZADOS_VENTAS, filas_ventas, respuesta_csv
+from ventas.stock import cambios_desde, esperar_cambios, esperar_cambios_async
+from ventas.catalogo import catalogo_actual
+from panel.busqueda import filtrar_por_texto, PRODUCTOS
+from panel.importaciones import leer_reposicion
+from panel.paginacion import paginar_por_cursor
+from panel.reportes import consulta_historial
+from panel.trabajos import encolar
+
+# Tope de espera de un long-poll de stock y duración de cada conexión SSE (segundos).
+# Con WSGI cada espera ocupa un worker: el tope la mantiene corta y el stream sólo se sirve con ASGI.
+ESPERA_MAXIMA_STOCK = 10
+DURACION_STREAM_STOCK = 300
+
+# Tickets aceptados por cada petición de sincronización de una terminal
+MAX_TICKETS_SINCRONIZACION = 500
+
+# Accept-Encoding que admite la respuesta comprimida del catálogo
+ACEPTA_GZIP = re.compile(r'\bgzip\b')
+
 @login_required
 def historial_ventas(request):
-    query = request.GET.get('q', '')
-    medio = request.GET.get('medio', '')
-    order = request.GET.get('order', '-fecha_hora')
-    page = request.GET.get('page', 1)
-
-    ventas = Venta.objects.select_related('producto', 'evento').all()
-    
-    if query:
-        ventas = ventas.filter(producto__nombre__icontains=query)
-    if medio:
-        ventas = ventas.filter(medio_de_pago=medio)
-    if order in ['fecha_hora', '-fecha_hora', 'precio_unitario_venta', '-precio_unitario_venta']:
-        ventas = ventas.order_by(order)
-
-    total_recaudado = sum(v.total() for v in ventas)
-    total_efectivo = sum(v.total() for v in ventas if v.medio_de_pago == "Efectivo")
-    total_mp = sum(v.total() for v in ventas if v.medio_de_pago == "Mercado Pago")
-
-    eventos_data = {}
-    for v in ventas:
-        nombre_evento = v.evento.nombre if v.evento else "Sin evento"
-        eventos_data[nombre_evento] = eventos_data.get(nombre_evento, 0) + float(v.total())
-
-    paginator = Paginator(ventas, 20)
-    page_obj = paginator.get_page(page)
-
-    if "export" in request.GET:
-        wb = Workbook()
-        ws_resumen = wb.active
-        ws_resumen.title = "Resumen"
-        ws_resumen.append(["Evento", "Total Recaudado ($)"])
-        
-        eventos_agg = ventas.values("evento__nombre").annotate(
-            total=Sum('venta__total')
+    export = request.GET.get('export')
+    if export not in (None, 'csv'):
+        nombre = f"Historial_Ventas_{request.user.username}.xlsx"
+        # La planilla se arma en el worker de trabajos; la página consulta el progreso
+        return artefactos.respuesta_exportacion(
+            request, artefactos.clave_historial(request.GET), nombre,
+            lambda: encolar('exportar_historial', request.user, params=request.GET.urlencode(), nombre=nombre),
         )
-        for e in eventos_agg:
-            ws_resumen.append([e["evento__nombre"] or "Sin evento", float(e["total"] or 0)])
-        
-        ws_resumen.append([])
-        ws_resumen.append(["Total general", float(total_recaudado)])
 
-        response = HttpResponse(
-            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
-        filename = f"Historial_Ventas_{request.user.username}.xlsx"
-        response["Content-Disposition"] = f'attachment; filename="{filename}"'
-        wb.save(response)
-        return response
+    datos = consulta_historial(request.GET)
+    ventas, totales, eventos_data, order = datos['ventas'], datos['totales'], datos['eventos_data'], datos['order']
+    total_recaudado = totales['bruto']
+
+    if export == 'csv':
+        return respuesta_csv(f"Historial_Ventas_{request.user.username}.csv", ENCABEZADOS_VENTAS, filas_ventas(ventas))
+
+    # Paginación por cursor sobre (campo de orden, id): no hace COUNT ni OFFSET
+    page_obj = paginar_por_cursor(ventas, request, campo=order.lstrip('-'), descendente=order.startswith('-'))
 
     context = {
         "ventas": page_obj,
-        "query": query,
-        "medio": medio,
+        "ventas_count": totales['ventas'],
+        "query": datos['query'],
+        "medio": datos['medio'],
         "order": order,
+        "filtros": datos['filtros'],
+        "eventos_list": Evento.objects.order_by('-fecha'),
         "total_recaudado": total_recaudado,
-        "total_efectivo": total_efectivo,
-        "total_mp": total_mp,
+        "total_efectivo": totales['efectivo'],
+        "total_mp": totales['mercado_pago'],
         "page_obj": page_obj,
-        "eventos_labels": json.dumps(list(eventos_data.keys())),
-        "eventos_values": json.dumps(list(eventos_data.values())),
+        "eventos_labels": json.dumps([e['nombre'] for e in eventos_data.values()]),
+        "eventos_values": json.dumps([e['total'] for e in eventos_data.values()]),
     }
     return render(request, "ventas/historial.html", context)
 
 @login_required
 def registrar_ventas(request):
-    productos = Producto.objects.annotate(
-        total_vendido=Sum('venta__cantidad')
-    ).order_by('-total_vendido', 'nombre')
-
+    # Los productos no se leen acá: la página pide el catálogo (`catalogo_pos`), que la
+    # terminal revalida con su ETag, y sigue los cambios de stock por el feed
     eventos = Evento.objects.order_by('fecha')
+    return render(request, 'ventas/registrar_ventas.html', {'eventos': eventos})
 
-    return render(request, 'ventas/registrar_ventas.html', {
-        'productos': productos,
-        'eventos': eventos
-    })
+
+@login_required
+def catalogo_pos(request):
+    """
+    Catálogo de la terminal (ver ventas.catalogo): productos activos por ranking de ventas,
+    con precio y stock. Va comprimido con gzip si el cliente lo acepta y con un ETag
+    fuerte; si la terminal ya tiene la versión vigente responde 304 sin cuerpo.
+    """
+    catalogo = catalogo_actual()
+    comprimido = bool(ACEPTA_GZIP.search(request.headers.get('Accept-Encoding', '')))
+    conocidos = {etag.removeprefix('W/') for etag in parse_etags(request.headers.get('If-None-Match', ''))}
+
+    if '*' in conocidos or conocidos & catalogo.etags():
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(
+            catalogo.comprimido if comprimido else catalogo.contenido, content_type='application/json',
+        )
+        if comprimido:
+            response['Content-Encoding'] = 'gzip'
+    response['ETag'] = catalogo.etag(comprimido)
+    # Se puede guardar, pero hay que revalidarlo siempre (el stock cambia con cada venta)
+    response['Cache-Control'] = 'private, no-cache'
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
 
 @login_required
 @csrf_exempt
 def registrar_venta_ajax(request):
     if request.method == 'POST':
         try:
-            producto_id = request.POST.get('producto_id')
-            cantidad = int(request.POST.get('cantidad', 1))
-            medio_de_pago = request.POST.get('medio_de_pago', 'Efectivo')
-            evento_id = request.POST.get('evento_id') or None
-
-            if cantidad <= 0:
-                return JsonResponse({
-                    'success': False,
-                    'error': 'La cantidad debe ser mayor a 0'
-                }, status=400)
-
-            with transaction.atomic():
-                # Bloquea el registro para evitar condiciones de carrera
-                producto = Producto.objects.select_for_update().get(pk=producto_id)
-                
-                # Validación exhaustiva
-                if producto.stock < cantidad:
-                    return JsonResponse({
-                        'success': False,
-                        'error': f'Stock insuficiente. Disponible: {producto.stock}, Solicitado: {cantidad}'
-                    }, status=400)
-
-                if not producto.activo:
-                    return JsonResponse({
-                        'success': False,
-                        'error': 'El producto no está activo'
-                    }, status=400)
-
-                # Crear venta
-                venta = Venta.objects.create(
-                    producto=producto,
-                    cantidad=cantidad,
-                    medio_de_pago=medio_de_pago,
-                    evento_id=evento_id,
-                    precio_unitario_venta=producto.precio_venta,
-                    precio_unitario_compra=producto.precio_compra
-                )
-                
-                # Actualizar stock de manera segura
-                producto.stock = producto.stock - cantidad
-                producto.save()
-
-                # Registrar movimiento en tesorería
-                Movimiento.objects.create(
-                    tipo='Ingreso',
-                    descripcion=f'Venta de {cantidad} x {producto.nombre}',
-                    monto=venta.total(),
-                    evento_id=evento_id
-                )
-
-            return JsonResponse({
-                'success': True,
-                'venta': {
-                    'producto': producto.nombre,
-                    'cantidad': cantidad,
-                    'total': str(venta.total()),
-                    'medio_de_pago': medio_de_pago,
-                    'stock_restante': producto.stock
-                }
-            })
-
-        except Producto.DoesNotExist:
-            return JsonResponse({'error': 'Producto no encontrado.'}, status=400)
+            venta, stock_restante = registrar_venta(
+                request.POST.get('producto_id'),
+                request.POST.get('cantidad', 1),
+                request.POST.get('medio_de_pago', 'Efectivo'),
+                request.POST.get('evento_id') or None,
+            )
+        except (ValueError, TypeError) as e:
+            # Cantidad o producto inválidos, producto inactivo o stock insuficiente
+            return JsonResponse({'success': False, 'error': str(e)}, status=400)
         except Exception as e:
             return JsonResponse({
                 'success': False,
                 'error': f'Error al procesar la venta: {str(e)}'
             }, status=500)
 
+        return JsonResponse({
+            'success': True,
+            'venta': {
+                'producto': venta.producto.nombre,
+                'cantidad': venta.cantidad,
+                'total': str(venta.total()),
+                'medio_de_pago': venta.medio_de_pago,
+                'stock_restante': stock_restante,
+            }
+        })
+
     return JsonResponse({'error': 'Método no permitido.'}, status=405)
 
+def _ticket_json(ticket, ventas, stock_restante):
+    return {
+        'id': ticket.id,
+        'clave': ticket.clave,
+        'total': str(ticket.total),
+        'medio_de_pago': ticket.medio_de_pago,
+        'lineas': [
+            {
+                'producto_id': v.producto_id,
+                'producto': v.producto.nombre,
+                'cantidad': v.cantidad,
+                'total': str(v.total()),
+                'stock_restante': stock_restante[v.producto_id],
+            }
+            for v in ventas
+        ],
+    }
+
+
+def _leer_ticket(data):
+    """Normaliza un ticket del JSON de la terminal; lanza ValueError/KeyError/TypeError si está mal formado."""
+    clave = data.get('clave') or None
+    if clave is not None and (not isinstance(clave, str) or len(clave) > 64):
+        raise ValueError('Clave de ticket inválida')
+    fecha_hora = data.get('fecha_hora') or None
+    if fecha_hora is not None:
+        # Momento en que la terminal cobró el ticket (ISO 8601); sin zona se toma la local
+        fecha_hora = parse_datetime(fecha_hora)
+        if fecha_hora is None:
+            raise ValueError('Fecha de ticket inválida')
+        if timezone.is_naive(fecha_hora):
+            fecha_hora = timezone.make_aware(fecha_hora)
+    return {
+        'clave': clave,
+        'lineas': [(int(l['producto_id']), int(l.get('cantidad', 1))) for l in data.get('lineas', [])],
+        'medio_de_pago': data.get('medio_de_pago', 'Efectivo'),
+        'evento_id': data.get('evento_id') or None,
+        'fecha_hora': fecha_hora,
+    }
+
+
+@login_required
+@csrf_exempt
+def registrar_ticket_ajax(request):
+    """
+    Registra un ticket con varias líneas en una sola petición.
+    Espera un JSON: {"clave": "...", "lineas": [{"producto_id": 1, "cantidad": 2}, ...], "medio_de_pago": "...", "evento_id": 3}
+    Si la clave ya fue registrada (reintento) se devuelve el ticket existente sin registrar nada.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Método no permitido.'}, status=405)
+
+    try:
+        datos = _leer_ticket(json.loads(request.body or '{}'))
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return JsonResponse({'success': False, 'error': 'Formato de ticket inválido'}, status=400)
+
+    try:
+        ticket, ventas, stock_restante = registrar_ticket(**datos)
+    except TicketDuplicado as e:
+        ventas = list(e.ticket.ventas.select_related('producto'))
+        stock_restante = {v.producto_id: v.producto.stock for v in ventas}
+        return JsonResponse({'success': True, 'duplicado': True, 'ticket': _ticket_json(e.ticket, ventas, stock_restante)})
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': f'Error al procesar la venta: {str(e)}'
+        }, status=500)
+
+    return JsonResponse({'success': True, 'ticket': _ticket_json(ticket, ventas, stock_restante)})
+
+@login_required
+@csrf_exempt
+def sincronizar_ventas(request):
+    """
+    Recibe los tickets que una terminal encoló sin conexión y los registra en una sola transacción.
+    Espera un JSON: {"version": 120, "tickets": [{"clave": "...", "lineas": [...], "medio_de_pago": "...",
+    "evento_id": 3, "fecha_hora": "2025-05-01T21:30:00-03:00"}, ...]}
+    Devuelve el resultado de cada ticket y el stock cambiado desde `version` (o el catálogo completo).
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Método no permitido.'}, status=405)
+
+    try:
+        data = json.loads(request.body or '{}')
+        recibidos = data.get('tickets', [])
+        version = data.get('version')
+        version = int(version) if version is not None else None
+    except (ValueError, TypeError, AttributeError):
+        return JsonResponse({'success': False, 'error': 'Formato de sincronización inválido'}, status=400)
+    if len(recibidos) > MAX_TICKETS_SINCRONIZACION:
+        return JsonResponse({
+            'success': False,
+            'error': f'Se pueden sincronizar hasta {MAX_TICKETS_SINCRONIZACION} tickets por petición'
+        }, status=400)
+
+    # Los tickets mal formados se rechazan sin afectar al resto del lote
+    tickets, invalidos = [], {}
+    for i, recibido in enumerate(recibidos):
+        try:
+            datos = _leer_ticket(recibido)
+            if not datos['clave']:
+                raise ValueError('Falta la clave del ticket')
+            tickets.append(datos)
+        except (ValueError, KeyError, TypeError, AttributeError):
+            clave = recibido.get('clave') if isinstance(recibido, dict) else None
+            invalidos[i] = {'clave': clave, 'estado': 'rechazado', 'error': 'Formato de ticket inválido'}
+
+    try:
+        procesados = iter(sincronizar_tickets(tickets))
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': f'Error al sincronizar: {str(e)}'}, status=500)
+
+    resultados = [invalidos[i] if i in invalidos else next(procesados) for i in range(len(recibidos))]
+    version, productos, completo = cambios_desde(version)
+    return JsonResponse({
+        'success': True,
+        'resultados': resultados,
+        'version': version,
+        'completo': completo,
+        'productos': productos,
+    })
+
+def _parametros_stock(request):
+    """(desde, esperar) del long-poll de stock; ValueError si no son números."""
+    return int(request.GET['desde']), min(float(request.GET.get('esperar', 0)), ESPERA_MAXIMA_STOCK)
+
+
+def _stock_json(desde):
+    version, productos, completo = cambios_desde(desde)
+    return {'version': version, 'completo': completo, 'productos': productos}
+
+
 @login_required
 def stock_actual(request):
-    productos = Producto.objects.all().values('id', 'stock')
-    return JsonResponse(list(productos), safe=False)
+    """
+    Stock de los productos.
+    - Sin parámetros: lista completa (compatibilidad).
+    - ?desde=<version>: sólo los productos cambiados después de esa versión.
+    - ?desde=<version>&esperar=<segundos>: además espera (long-poll, hasta
+      ESPERA_MAXIMA_STOCK) a que haya un cambio.
+    """
+    if 'desde' not in request.GET:
+        productos = Producto.objects.all().values('id', 'stock')
+        return JsonResponse(list(productos), safe=False)
+
+    try:
+        desde, esperar = _parametros_stock(request)
+    except ValueError:
+        return JsonResponse({'error': 'Parámetros inválidos.'}, status=400)
+
+    if esperar > 0:
+        esperar_cambios(desde, esperar)
+    return JsonResponse(_stock_json(desde))
+
+@login_required
+async def stock_actual_async(request):
+    """`stock_actual` para ASGI: la espera no ocupa un hilo."""
+    if 'desde' not in request.GET:
+        productos = await sync_to_async(list)(Producto.objects.all().values('id', 'stock'))
+        return JsonResponse(productos, safe=False)
+
+    try:
+        desde, esperar = _parametros_stock(request)
+    except ValueError:
+        return JsonResponse({'error': 'Parámetros inválidos.'}, status=400)
+
+    if esperar > 0:
+        await esperar_cambios_async(desde, esperar)
+    return JsonResponse(await sync_to_async(_stock_json)(desde))
+
+@login_required
+def stock_stream(request):
+    """
+    Con WSGI no hay stream: una conexión SSE tendría tomado un worker durante toda su
+    duración. El 204 le indica al EventSource que no se reconecte; la terminal sigue
+    los cambios con el long-poll acotado de `stock_actual`.
+    """
+    return HttpResponse(status=204)
+
+@login_required
+async def stock_stream_async(request):
+    """
+    Server-Sent Events con los cambios de stock (sólo con ASGI). Cada evento lleva como
+    id la versión, así el navegador reanuda desde la última recibida (Last-Event-ID) al
+    reconectarse.
+    """
+    try:
+        version = int(request.headers.get('Last-Event-ID') or request.GET.get('desde', ''))
+    except ValueError:
+        version = None
+
+    async def eventos(version):
+        yield "retry: 3000\n\n"
+        limite = time.monotonic() + DURACION_STREAM_STOCK
+        while time.monotonic() < limite:
+            if version is not None and await esperar_cambios_async(version, 15) <= version:
+                yield ": ping\n\n"
+                continue
+            data = await sync_to_async(_stock_json)(version)
+            version = data['version']
+            yield f"id: {version}\nevent: stock\ndata: {json.dumps(data)}\n\n"
+
+    response = StreamingHttpResponse(eventos(version), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 @login_required
 def lista_productos(request):
@@ -180,10 +363,7 @@ def lista_productos(request):
     productos = Producto.objects.all()
     
     if query:
-        productos = productos.filter(
-            Q(nombre__icontains=query) |
-            Q(descripcion__icontains=query)
-        )
+        productos = filtrar_por_texto(productos, PRODUCTOS, query)
     
     if estado == 'activos':
         productos = productos.filter(activo=True)
@@ -194,29 +374,28 @@ def lista_productos(request):
                 'precio_compra', '-precio_compra', 'fecha_creacion', '-fecha_creacion']:
         productos = productos.order_by(order)
     
-    productos = productos.annotate(
-        total_vendido=Sum('venta__cantidad'),
-        total_ventas=Count('venta')
+    # total_vendido y total_ventas son contadores del producto; los totales, un único aggregate
+    totales = productos.aggregate(
+        total=Count('id'),
+        activos=Count('id', filter=Q(activo=True)),
+        stock=Sum('stock'),
+        valor=Sum('valor_inventario'),
     )
 
     paginator = Paginator(productos, 20)
+    paginator.count = totales['total']  # evita el COUNT(*) propio del paginador
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
 
-    total_productos = productos.count()
-    productos_activos = productos.filter(activo=True).count()
-    stock_total = sum(p.stock for p in productos)
-    valor_inventario_total = sum(p.valor_inventario for p in productos)
-
     context = {
         'productos': page_obj,
         'query': query,
         'order': order,
         'estado': estado,
-        'total_productos': total_productos,
-        'productos_activos': productos_activos,
-        'stock_total': stock_total,
-        'valor_inventario_total': valor_inventario_total,
+        'total_productos': totales['total'],
+        'productos_activos': totales['activos'],
+        'stock_total': totales['stock'] or 0,
+        'valor_inventario_total': totales['valor'] or Decimal('0.00'),
     }
     return render(request, 'ventas/productos.html', context)
 
@@ -283,12 +462,18 @@ def editar_producto(request, id):
                     'error': 'El precio de venta no puede ser menor al precio de compra'
                 })
             
-            producto.nombre = nombre
-            producto.stock = stock
-            producto.precio_compra = precio_compra
-            producto.precio_venta = precio_venta
-            producto.activo = activo
-            producto.save()
+            valores = {
+                'nombre': nombre,
+                'stock': stock,
+                'precio_compra': precio_compra,
+                'precio_venta': precio_venta,
+                'activo': activo,
+            }
+            # Sólo se escriben los campos editados: el stock que no se tocó sigue siendo el de la base
+            cambios = [campo for campo, valor in valores.items() if getattr(producto, campo) != valor]
+            for campo in cambios:
+                setattr(producto, campo, valores[campo])
+            producto.guardar_campos(cambios)
             
             return JsonResponse({
                 'success': True,
@@ -316,6 +501,38 @@ def editar_producto(request, id):
         }
     })
 
+@login_required
+def reponer_stock_ajax(request):
+    """
+    Reposición masiva: recibe una planilla CSV/XLSX (campo `archivo`) con
+    producto, cantidad y precio_compra; suma el stock y registra los egresos.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Método no permitido'}, status=405)
+
+    archivo = request.FILES.get('archivo')
+    if archivo is None:
+        return JsonResponse({'success': False, 'error': 'Falta el archivo de reposición'}, status=400)
+
+    try:
+        lineas, errores = leer_reposicion(archivo, archivo.name)
+        if errores:
+            raise ValueError('; '.join(errores))
+        resumen = reponer_stock(lineas, evento_id=request.POST.get('evento_id') or None)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': f'Error al procesar la reposición: {str(e)}'
+        }, status=500)
+
+    return JsonResponse({
+        'success': True,
+        'message': f"Stock repuesto: {resumen['unidades']} unidades de {resumen['productos']} productos",
+        'resumen': dict(resumen, total=str(resumen['total'])),
+    })
+
 @login_required
 def toggle_producto_activo(request, id):
     producto = get_object_or_404(Producto, id=id)
@@ -323,7 +540,7 @@ def toggle_producto_activo(request, id):
     if request.method == 'POST':
         try:
             producto.activo = not producto.activo
-            producto.save()
+            producto.guardar_campos(['activo'])
             
             return JsonResponse({
                 'success': True,
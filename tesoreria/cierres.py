@@ -0,0 +1,208 @@
+"""
+Cierres de gestión: saldos de tesorería congelados a una fecha de corte.
+
+Un cierre guarda los totales acumulados (global y por evento) de todos los
+movimientos anteriores al corte. Los saldos actuales se obtienen partiendo del
+último cierre y agregando sólo los movimientos posteriores, así el costo de las
+consultas queda acotado por la actividad de la gestión abierta.
+
+Los cierres se mantienen por diferencia: si se edita o elimina un movimiento
+anterior a un corte, `ajustar_cierres` corrige los cierres afectados (lo llaman
+las signals de Movimiento).
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Count, F, Q, Subquery, Sum
+from django.utils import timezone
+from tesoreria.models import CierreGestion, CierreEvento, Movimiento
+
+CAMPOS_SALDO = ('total_ingresos', 'total_egresos', 'cantidad_ingresos', 'cantidad_egresos')
+
+
+def _ceros():
+    return {
+        'total_ingresos': Decimal('0.00'),
+        'total_egresos': Decimal('0.00'),
+        'cantidad_ingresos': 0,
+        'cantidad_egresos': 0,
+    }
+
+
+_AGREGADOS = {
+    'total_ingresos': Sum('monto', filter=Q(tipo='Ingreso')),
+    'total_egresos': Sum('monto', filter=Q(tipo='Egreso')),
+    'cantidad_ingresos': Count('id', filter=Q(tipo='Ingreso')),
+    'cantidad_egresos': Count('id', filter=Q(tipo='Egreso')),
+}
+
+
+def _sumar(base, delta):
+    return {campo: base[campo] + (delta.get(campo) or 0) for campo in CAMPOS_SALDO}
+
+
+def _agregar(movimientos):
+    return movimientos.aggregate(**_AGREGADOS)
+
+
+def saldos_de(movimientos):
+    """Totales de ingresos y egresos (montos y cantidades) de un queryset de movimientos, sin cierres."""
+    return _sumar(_ceros(), _agregar(movimientos))
+
+
+def _agregar_por_evento(movimientos):
+    """{evento_id: totales} en una consulta agrupada; la clave None junta los movimientos sin evento."""
+    filas = movimientos.values('evento').annotate(**_AGREGADOS).order_by()
+    return {fila.pop('evento'): fila for fila in filas}
+
+
+def ultimo_cierre(hasta=None):
+    """Cierre más reciente con corte no posterior a `hasta` (o el más reciente de todos)."""
+    cierres = CierreGestion.objects.all()
+    if hasta is not None:
+        cierres = cierres.filter(corte__lte=hasta)
+    return cierres.order_by('-corte').first()
+
+
+def _cierre_con_eventos(hasta=None):
+    """
+    (cierre, {evento_id: totales}) del último cierre hasta `hasta`. Trae el cierre
+    junto con sus filas por evento en una sola consulta; sólo si no tiene eventos
+    hace falta una segunda.
+    """
+    cierres = CierreGestion.objects.all()
+    if hasta is not None:
+        cierres = cierres.filter(corte__lte=hasta)
+    filas = list(
+        CierreEvento.objects.filter(cierre=Subquery(cierres.order_by('-corte').values('pk')[:1]))
+        .select_related('cierre')
+    )
+    if not filas:
+        return ultimo_cierre(hasta), {}
+    return filas[0].cierre, {
+        fila.evento_id: {campo: getattr(fila, campo) for campo in CAMPOS_SALDO} for fila in filas
+    }
+
+
+def _posteriores(cierre, evento_id=None, hasta=None):
+    """Movimientos que no están incluidos en `cierre` (hasta `hasta`, exclusivo)."""
+    movimientos = Movimiento.objects.all()
+    if evento_id:
+        movimientos = movimientos.filter(evento_id=evento_id)
+    if cierre is not None:
+        movimientos = movimientos.filter(fecha__gte=cierre.corte)
+    if hasta is not None:
+        movimientos = movimientos.filter(fecha__lt=hasta)
+    return movimientos
+
+
+def _sumar_cierre(cierre, por_evento, periodo):
+    """Totales global y por evento: los del cierre más los del período posterior."""
+    totales = {campo: getattr(cierre, campo) for campo in CAMPOS_SALDO} if cierre else _ceros()
+    por_evento = {evento_id: _sumar(_ceros(), valores) for evento_id, valores in por_evento.items()}
+    for evento_id, delta in _agregar_por_evento(periodo).items():
+        totales = _sumar(totales, delta)
+        if evento_id is not None:
+            por_evento[evento_id] = _sumar(por_evento.get(evento_id, _ceros()), delta)
+    return totales, por_evento
+
+
+def resumen(hasta=None):
+    """
+    (totales, {evento_id: totales}) acumulados de los movimientos anteriores a
+    `hasta` (todos si es None). Con un cierre, cuesta dos consultas: el cierre con
+    sus eventos y una agregación agrupada de los movimientos posteriores.
+    """
+    cierre, por_evento = _cierre_con_eventos(hasta)
+    return _sumar_cierre(cierre, por_evento, _posteriores(cierre, hasta=hasta))
+
+
+def saldos(evento_id=None, hasta=None):
+    """
+    Totales acumulados de ingresos y egresos (montos y cantidades) de los
+    movimientos anteriores a `hasta` (todos si es None), opcionalmente de un evento.
+    """
+    cierre = ultimo_cierre(hasta)
+    base = _ceros()
+    if cierre is not None:
+        if evento_id:
+            fila = CierreEvento.objects.filter(cierre=cierre, evento_id=evento_id).values(*CAMPOS_SALDO).first()
+            base = _sumar(base, fila or {})
+        else:
+            base = {campo: getattr(cierre, campo) for campo in CAMPOS_SALDO}
+    return _sumar(base, _agregar(_posteriores(cierre, evento_id, hasta)))
+
+
+def saldos_por_evento(hasta=None):
+    """{evento_id: totales acumulados} de los eventos con movimientos anteriores a `hasta`."""
+    return resumen(hasta)[1]
+
+
+def corte_por_defecto(gestion):
+    """
+    Fin del último día de la gestión o el momento actual, lo que ocurra primero
+    (una gestión que termina en el futuro se cierra hasta ahora).
+    """
+    ahora = timezone.now()
+    if gestion.fecha_fin is None:
+        return ahora
+    return min(ahora, timezone.make_aware(datetime.combine(gestion.fecha_fin + timedelta(days=1), time.min)))
+
+
+def cerrar_gestion(gestion, corte=None):
+    """
+    Congela los saldos de tesorería al `corte` de la gestión (por defecto, ver
+    `corte_por_defecto`). Parte del cierre anterior y sólo agrega los movimientos
+    del período; volver a cerrar una gestión recalcula su cierre.
+    Si la gestión no tenía fecha de fin, se le asigna la del corte.
+
+    El corte no puede ser futuro: las ventas y reposiciones escriben sus movimientos
+    en lote, sin pasar por `ajustar_cierres`, y uno fechado antes de ese corte
+    quedaría fuera de los saldos.
+    """
+    corte = corte or corte_por_defecto(gestion)
+    if corte > timezone.now():
+        raise ValueError("La fecha de corte no puede ser posterior al momento actual")
+    with transaction.atomic():
+        CierreGestion.objects.filter(gestion=gestion).delete()
+
+        anterior, por_evento = _cierre_con_eventos(corte)
+        totales, por_evento = _sumar_cierre(anterior, por_evento, _posteriores(anterior, hasta=corte))
+
+        cierre = CierreGestion.objects.create(gestion=gestion, corte=corte, **totales)
+        CierreEvento.objects.bulk_create([
+            CierreEvento(cierre=cierre, evento_id=evento_id, **valores) for evento_id, valores in por_evento.items()
+        ])
+
+        if gestion.fecha_fin is None:
+            gestion.fecha_fin = timezone.localdate(corte)
+            gestion.save(update_fields=['fecha_fin'])
+    return cierre
+
+
+def ajustar_cierres(movimiento, signo=1):
+    """
+    Suma (o resta, con signo=-1) un movimiento a los cierres cuyo corte es
+    posterior a su fecha. Con un solo UPDATE por tabla; sin cierres afectados
+    cuesta una consulta.
+    """
+    cierres = list(CierreGestion.objects.filter(corte__gt=movimiento.fecha).values_list('pk', flat=True))
+    if not cierres:
+        return
+    sufijo = 'ingresos' if movimiento.tipo == 'Ingreso' else 'egresos'
+    cambios = {
+        f'total_{sufijo}': F(f'total_{sufijo}') + signo * Decimal(movimiento.monto),
+        f'cantidad_{sufijo}': F(f'cantidad_{sufijo}') + signo,
+    }
+    CierreGestion.objects.filter(pk__in=cierres).update(**cambios)
+
+    if movimiento.evento_id:
+        existentes = set(
+            CierreEvento.objects.filter(cierre_id__in=cierres, evento_id=movimiento.evento_id)
+            .values_list('cierre_id', flat=True)
+        )
+        CierreEvento.objects.bulk_create([
+            CierreEvento(cierre_id=cierre_id, evento_id=movimiento.evento_id)
+            for cierre_id in cierres if cierre_id not in existentes
+        ])
+        CierreEvento.objects.filter(cierre_id__in=cierres, evento_id=movimiento.evento_id).update(**cambios)
@@ -0,0 +1,108 @@
+"""
+Libro de saldos: cada movimiento guarda el balance acumulado (ingresos - egresos)
+hasta él inclusive, en el orden (fecha, id).
+
+Un alta al final del libro cuesta una consulta extra (el saldo del último
+movimiento) y el saldo a una fecha es una búsqueda por el índice de fecha, sin
+recorrer la historia. Las ediciones, bajas y altas con fecha pasada desplazan
+los saldos posteriores con un UPDATE; `recalcular` (`manage.py recalcular_saldos`)
+reconstruye el libro después de escrituras que no pasan por las signals.
+"""
+from decimal import Decimal
+from django.db.models import F, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from tesoreria.models import Movimiento
+
+TAMANIO_LOTE_SALDOS = 500
+
+CERO = Decimal('0.00')
+
+
+def importe(tipo, monto):
+    """Aporte de un movimiento al balance: positivo si es ingreso, negativo si es egreso."""
+    return Decimal(monto) if tipo == 'Ingreso' else -Decimal(monto)
+
+
+def _anteriores(fecha, pk=None):
+    """Movimientos antes de la posición (fecha, pk) del libro; sin pk, los de fecha anterior."""
+    if pk is None:
+        return Movimiento.objects.filter(fecha__lt=fecha)
+    return Movimiento.objects.filter(Q(fecha__lt=fecha) | Q(fecha=fecha, pk__lt=pk))
+
+
+def _posteriores(fecha, pk):
+    return Movimiento.objects.filter(Q(fecha__gt=fecha) | Q(fecha=fecha, pk__gt=pk))
+
+
+def _ultimo_saldo(movimientos):
+    return movimientos.order_by('-fecha', '-pk').values('saldo')[:1]
+
+
+def saldo_al(momento):
+    """Balance de todos los movimientos anteriores a `momento` (una consulta por índice)."""
+    saldo = _ultimo_saldo(_anteriores(momento)).first()
+    return saldo['saldo'] if saldo and saldo['saldo'] is not None else CERO
+
+
+def serie_saldos(momentos):
+    """Balance a cada uno de los `momentos`, en una sola consulta (una subconsulta indexada por punto)."""
+    puntos = {
+        f'p{i}': Coalesce(Subquery(_ultimo_saldo(_anteriores(momento))), Value(CERO))
+        for i, momento in enumerate(momentos)
+    }
+    fila = next(iter(Movimiento.objects.order_by().annotate(**puntos).values(*puntos)[:1]), None)
+    if fila is None:
+        return [CERO] * len(momentos)
+    return [Decimal(fila[f'p{i}']) for i in range(len(momentos))]
+
+
+def asentar(movimientos):
+    """
+    Completa el saldo de movimientos nuevos que se agregan al final del libro
+    (fecha actual), antes de un bulk_create. Debe llamarse dentro de la misma
+    transacción de escritura que el alta.
+    """
+    saldo = _ultimo_saldo(Movimiento.objects.all()).first()
+    saldo = saldo['saldo'] if saldo and saldo['saldo'] is not None else CERO
+    for movimiento in movimientos:
+        saldo += importe(movimiento.tipo, movimiento.monto)
+        movimiento.saldo = saldo
+    return movimientos
+
+
+def insertar(movimiento):
+    """Asienta un movimiento ya guardado en su posición y desplaza los posteriores (dos UPDATE)."""
+    delta = importe(movimiento.tipo, movimiento.monto)
+    anterior = Subquery(_ultimo_saldo(_anteriores(movimiento.fecha, movimiento.pk)))
+    Movimiento.objects.filter(pk=movimiento.pk).update(saldo=Coalesce(anterior, Value(CERO)) + delta)
+    _posteriores(movimiento.fecha, movimiento.pk).update(saldo=F('saldo') + delta)
+
+
+def retirar(movimiento):
+    """Quita el aporte de un movimiento (eliminado o antes de editarlo) de los saldos posteriores."""
+    _posteriores(movimiento.fecha, movimiento.pk).update(saldo=F('saldo') - importe(movimiento.tipo, movimiento.monto))
+
+
+def recalcular(desde=None):
+    """
+    Reconstruye los saldos a partir de `desde` (todo el libro si es None),
+    partiendo del saldo guardado justo antes. Sólo escribe las filas que cambian;
+    devuelve cuántas corrigió.
+    """
+    movimientos = Movimiento.objects.order_by('fecha', 'pk')
+    saldo = CERO
+    if desde is not None:
+        saldo = saldo_al(desde)
+        movimientos = movimientos.filter(fecha__gte=desde)
+
+    corregidos, lote = 0, []
+    for pk, tipo, monto, guardado in movimientos.values_list('pk', 'tipo', 'monto', 'saldo').iterator():
+        saldo += importe(tipo, monto)
+        if guardado != saldo:
+            lote.append(Movimiento(pk=pk, saldo=saldo))
+        if len(lote) >= TAMANIO_LOTE_SALDOS:
+            Movimiento.objects.bulk_update(lote, ['saldo'])
+            corregidos += len(lote)
+            lote = []
+    Movimiento.objects.bulk_update(lote, ['saldo'])
+    return corregidos + len(lote)
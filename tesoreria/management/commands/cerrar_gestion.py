@@ -0,0 +1,43 @@
+from datetime import datetime, time, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from cargos.models import Gestion
+from tesoreria.cierres import cerrar_gestion
+
+
+class Command(BaseCommand):
+    help = (
+        "Cierra una gestión: congela los saldos de tesorería (global y por evento) a la fecha "
+        "de corte para que los reportes sólo agreguen los movimientos posteriores."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('gestion_id', type=int, help="Id de la gestión a cerrar")
+        parser.add_argument(
+            '--corte', metavar='AAAA-MM-DD',
+            help="Último día incluido en el cierre, anterior a hoy (por defecto, la fecha de fin de la gestión o ahora)",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            gestion = Gestion.objects.get(pk=options['gestion_id'])
+        except Gestion.DoesNotExist:
+            raise CommandError(f"No existe la gestión {options['gestion_id']}")
+
+        corte = None
+        if options['corte']:
+            try:
+                dia = datetime.strptime(options['corte'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError("La fecha de corte debe tener el formato AAAA-MM-DD")
+            if dia >= timezone.localdate():
+                raise CommandError("El último día del cierre tiene que ser anterior a hoy")
+            corte = timezone.make_aware(datetime.combine(dia + timedelta(days=1), time.min))
+
+        cierre = cerrar_gestion(gestion, corte)
+        self.stdout.write(self.style.SUCCESS(
+            f"Gestión {gestion} cerrada al {timezone.localtime(cierre.corte):%Y-%m-%d %H:%M}: "
+            f"ingresos ${cierre.total_ingresos} ({cierre.cantidad_ingresos}), "
+            f"egresos ${cierre.total_egresos} ({cierre.cantidad_egresos}), "
+            f"{cierre.eventos.count()} evento(s)."
+        ))
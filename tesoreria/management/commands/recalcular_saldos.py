@@ -0,0 +1,38 @@
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from tesoreria.libro import recalcular
+from panel.trabajos import encolar
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye el libro de saldos de tesorería (saldo acumulado de cada movimiento). "
+        "Necesario después de cargas o correcciones que no pasan por las signals de Movimiento."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--desde', metavar='AAAA-MM-DD',
+            help="Recalcula sólo a partir de ese día, partiendo del saldo guardado el día anterior",
+        )
+        parser.add_argument(
+            '--en-segundo-plano', action='store_true',
+            help="Encola el recálculo para el worker (`procesar_trabajos`) en lugar de ejecutarlo acá",
+        )
+
+    def handle(self, *args, **options):
+        desde = None
+        if options['desde']:
+            try:
+                desde = timezone.make_aware(datetime.strptime(options['desde'], '%Y-%m-%d'))
+            except ValueError:
+                raise CommandError("La fecha debe tener el formato AAAA-MM-DD")
+
+        if options['en_segundo_plano']:
+            trabajo = encolar('recalcular_saldos', desde=desde.isoformat() if desde else None)
+            self.stdout.write(self.style.SUCCESS(f"Recálculo encolado (trabajo #{trabajo.pk})."))
+            return
+
+        corregidos = recalcular(desde)
+        self.stdout.write(self.style.SUCCESS(f"Libro de saldos recalculado: {corregidos} movimiento(s) corregidos."))
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tesoreria', '0001_initial'),
+        ('ventas', '0004_alter_producto_options_remove_venta_precio_compra_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movimiento',
+            name='venta',
+            field=models.OneToOneField(blank=True, help_text='Venta que originó el movimiento (si corresponde)', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='movimiento', to='ventas.venta'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+import re
+from django.db import migrations
+
+VENTA_ID_RE = re.compile(r'\(venta_id=(\d+)\)')
+
+
+def vincular_movimientos(apps, schema_editor):
+    """Completa Movimiento.venta a partir del texto "(venta_id=N)" de la descripción."""
+    Movimiento = apps.get_model('tesoreria', 'Movimiento')
+    Venta = apps.get_model('ventas', 'Venta')
+
+    candidatos = {}
+    for mov_id, descripcion in Movimiento.objects.filter(
+        venta__isnull=True, descripcion__contains='venta_id='
+    ).order_by('id').values_list('id', 'descripcion'):
+        match = VENTA_ID_RE.search(descripcion)
+        if match:
+            # Si hubiera duplicados se conserva el primer movimiento de cada venta
+            candidatos.setdefault(int(match.group(1)), mov_id)
+
+    existentes = set(Venta.objects.filter(pk__in=list(candidatos)).values_list('pk', flat=True))
+    movimientos = []
+    for venta_id, mov_id in candidatos.items():
+        if venta_id in existentes:
+            movimientos.append(Movimiento(pk=mov_id, venta_id=venta_id))
+    Movimiento.objects.bulk_update(movimientos, ['venta'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tesoreria', '0002_movimiento_venta'),
+    ]
+
+    operations = [
+        migrations.RunPython(vincular_movimientos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0004_totales_desnormalizados'),
+        ('tesoreria', '0003_vincular_movimientos_ventas'),
+        ('ventas', '0007_cambiostock'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movimiento',
+            index=models.Index(fields=['fecha'], name='movimiento_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimiento',
+            index=models.Index(fields=['tipo', 'fecha'], name='movimiento_tipo_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimiento',
+            index=models.Index(fields=['evento', 'tipo'], name='movimiento_evento_tipo_idx'),
+        ),
+    ]
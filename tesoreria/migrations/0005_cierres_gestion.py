@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:57
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cargos', '0002_initial'),
+        ('eventos', '0005_indice_fecha'),
+        ('tesoreria', '0004_indices_listados'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CierreGestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('corte', models.DateTimeField(help_text='Incluye los movimientos con fecha anterior a este instante')),
+                ('total_ingresos', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('total_egresos', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('cantidad_ingresos', models.PositiveIntegerField(default=0)),
+                ('cantidad_egresos', models.PositiveIntegerField(default=0)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('gestion', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='cierre', to='cargos.gestion')),
+            ],
+            options={
+                'verbose_name_plural': 'Cierres de gestión',
+                'ordering': ['-corte'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CierreEvento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_ingresos', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('total_egresos', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('cantidad_ingresos', models.PositiveIntegerField(default=0)),
+                ('cantidad_egresos', models.PositiveIntegerField(default=0)),
+                ('evento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='eventos.evento')),
+                ('cierre', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='eventos', to='tesoreria.cierregestion')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('cierre', 'evento'), name='cierre_evento_unico')],
+            },
+        ),
+    ]
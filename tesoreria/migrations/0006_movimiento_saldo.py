@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:02
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+def calcular_saldos(apps, schema_editor):
+    """Completa el saldo acumulado de los movimientos existentes, en orden (fecha, id)."""
+    Movimiento = apps.get_model('tesoreria', 'Movimiento')
+    saldo, lote = Decimal('0.00'), []
+    for pk, tipo, monto in Movimiento.objects.order_by('fecha', 'pk').values_list('pk', 'tipo', 'monto').iterator():
+        saldo += monto if tipo == 'Ingreso' else -monto
+        lote.append(Movimiento(pk=pk, saldo=saldo))
+        if len(lote) >= 500:
+            Movimiento.objects.bulk_update(lote, ['saldo'])
+            lote = []
+    Movimiento.objects.bulk_update(lote, ['saldo'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tesoreria', '0005_cierres_gestion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movimiento',
+            name='saldo',
+            field=models.DecimalField(decimal_places=2, editable=False, help_text='Balance acumulado (ingresos - egresos) hasta este movimiento inclusive; ver tesoreria.libro', max_digits=14, null=True),
+        ),
+        migrations.RunPython(calcular_saldos, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,7 @@
+from decimal import Decimal
 from django.db import models
+from django.utils import timezone
+from cargos.models import Gestion
 from eventos.models import Evento
 
 class Movimiento(models.Model):
@@ -10,11 +13,72 @@ class Movimiento(models.Model):
     tipo = models.CharField(max_length=10, choices=TIPO_CHOICES)
     descripcion = models.CharField(max_length=200)
     monto = models.DecimalField(max_digits=10, decimal_places=2)
-    fecha = models.DateTimeField(auto_now_add=True)
+    fecha = models.DateTimeField(default=timezone.now, editable=False)
     evento = models.ForeignKey(Evento, on_delete=models.SET_NULL, null=True, blank=True)
+    venta = models.OneToOneField(
+        'ventas.Venta',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='movimiento',
+        help_text="Venta que originó el movimiento (si corresponde)"
+    )
+    saldo = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        null=True,
+        editable=False,
+        help_text="Balance acumulado (ingresos - egresos) hasta este movimiento inclusive; ver tesoreria.libro"
+    )
 
     def __str__(self):
         return f"{self.tipo}: ${self.monto} - {self.descripcion}"
 
     class Meta:
         ordering = ['-fecha']
+        indexes = [
+            # Listados de tesorería: por tipo ordenados por fecha, y balance por evento
+            models.Index(fields=['fecha'], name='movimiento_fecha_idx'),
+            models.Index(fields=['tipo', 'fecha'], name='movimiento_tipo_fecha_idx'),
+            models.Index(fields=['evento', 'tipo'], name='movimiento_evento_tipo_idx'),
+        ]
+
+
+class CierreGestion(models.Model):
+    """
+    Cierre de una gestión: saldos acumulados de tesorería (desde el primer
+    movimiento) de los movimientos con fecha anterior a `corte`.
+
+    Los saldos actuales se calculan desde el último cierre sumando sólo los
+    movimientos posteriores. Si se edita o elimina un movimiento anterior al
+    corte, el cierre se ajusta por diferencia (ver tesoreria.cierres).
+    """
+    gestion = models.OneToOneField(Gestion, on_delete=models.CASCADE, related_name='cierre')
+    corte = models.DateTimeField(help_text="Incluye los movimientos con fecha anterior a este instante")
+    total_ingresos = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    total_egresos = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    cantidad_ingresos = models.PositiveIntegerField(default=0)
+    cantidad_egresos = models.PositiveIntegerField(default=0)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-corte']
+        verbose_name_plural = "Cierres de gestión"
+
+    def __str__(self):
+        return f"Cierre {self.gestion} ({self.corte:%d/%m/%Y})"
+
+
+class CierreEvento(models.Model):
+    """Saldos acumulados de un evento en un cierre de gestión."""
+    cierre = models.ForeignKey(CierreGestion, on_delete=models.CASCADE, related_name='eventos')
+    evento = models.ForeignKey(Evento, on_delete=models.CASCADE, related_name='+')
+    total_ingresos = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    total_egresos = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    cantidad_ingresos = models.PositiveIntegerField(default=0)
+    cantidad_egresos = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cierre', 'evento'], name='cierre_evento_unico'),
+        ]
@@ -0,0 +1,73 @@
+"""
+Catálogo de las terminales de venta: productos activos con precio, stock y puesto
+en el ranking de ventas, como JSON armado una vez por versión del catálogo.
+
+La versión es la del feed de stock (ventas.stock: toda escritura que cambia stock,
+precio, nombre o estado de un producto agrega una fila a CambioStock) junto con la
+generación de productos de panel.cache_reportes, que cubre también las bajas. El
+último catálogo armado queda en memoria del proceso, ya comprimido y con su ETag:
+mientras la versión no cambie, una terminal que lo pide recibe un 304 sin que se
+lea ningún producto.
+"""
+import gzip
+import hashlib
+import json
+import threading
+from django.db import connection
+from ventas.models import Producto
+from ventas.stock import version_actual
+from panel.cache_reportes import generaciones, PRODUCTOS
+
+_lock = threading.Lock()
+_actual = None
+
+
+class Catalogo:
+    """Catálogo serializado: JSON, su versión gzip y el ETag fuerte de cada una."""
+
+    def __init__(self, clave, contenido):
+        self.clave = clave
+        self.contenido = contenido
+        # mtime=0: los mismos datos comprimen siempre a los mismos bytes
+        self.comprimido = gzip.compress(contenido, compresslevel=6, mtime=0)
+        self.huella = hashlib.sha256(contenido).hexdigest()[:32]
+
+    def etag(self, comprimido):
+        # Cada codificación es una representación distinta: un ETag fuerte para cada una
+        return f'"{self.huella}-gzip"' if comprimido else f'"{self.huella}"'
+
+    def etags(self):
+        return {self.etag(False), self.etag(True)}
+
+
+def _armar(version):
+    productos = Producto.objects.filter(activo=True).order_by('-total_vendido', 'nombre').values_list(
+        'id', 'nombre', 'precio_venta', 'stock',
+    )
+    datos = {
+        'version': version,
+        'productos': [
+            {'id': pk, 'nombre': nombre, 'precio_venta': str(precio), 'stock': stock, 'ranking': puesto}
+            for puesto, (pk, nombre, precio, stock) in enumerate(productos, start=1)
+        ],
+    }
+    return json.dumps(datos, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def catalogo_actual():
+    """
+    Catálogo de la versión vigente: el que ya está en memoria si la versión no cambió,
+    o uno recién armado. La versión del feed se lee antes que los productos: a lo sumo
+    la terminal recibe de nuevo por el feed cambios que el catálogo ya incluía.
+    """
+    global _actual
+    version = version_actual()
+    # La base forma parte de la clave: los tests y el benchmark usan otras
+    clave = (connection.settings_dict['NAME'], version, *generaciones(PRODUCTOS))
+    catalogo = _actual
+    if catalogo is not None and catalogo.clave == clave:
+        return catalogo
+    with _lock:
+        if _actual is None or _actual.clave != clave:
+            _actual = Catalogo(clave, _armar(version))
+        return _actual
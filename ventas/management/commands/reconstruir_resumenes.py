@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from ventas.models import ResumenDiario, ResumenEventoProducto
+from ventas.resumenes import reconstruir_resumenes, reconstruir_contadores
+from panel.cache_reportes import invalidar, VENTAS, PRODUCTOS
+from panel.trabajos import encolar
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula desde cero las tablas de resumen de ventas (por día y por evento) "
+        "y los contadores de ventas de cada producto."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--en-segundo-plano', action='store_true',
+            help="Encola la reconstrucción para el worker (`procesar_trabajos`) en lugar de ejecutarla acá",
+        )
+
+    def handle(self, *args, **options):
+        if options['en_segundo_plano']:
+            trabajo = encolar('reconstruir_resumenes')
+            self.stdout.write(self.style.SUCCESS(f"Reconstrucción encolada (trabajo #{trabajo.pk})."))
+            return
+        reconstruir_resumenes()
+        productos = reconstruir_contadores()
+        invalidar(VENTAS, PRODUCTOS)
+        self.stdout.write(self.style.SUCCESS(
+            f"Resúmenes reconstruidos: {ResumenDiario.objects.count()} diarios, "
+            f"{ResumenEventoProducto.objects.count()} por evento, {productos} producto(s)."
+        ))
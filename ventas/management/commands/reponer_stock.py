@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from panel.importaciones import leer_reposicion
+from ventas.servicios import reponer_stock
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa una planilla CSV/XLSX de compra (producto, cantidad, precio_compra): "
+        "suma el stock y registra los egresos en una sola transacción."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help="Ruta del archivo .csv o .xlsx")
+        parser.add_argument('--evento', type=int, help="ID del evento al que se imputan los egresos")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['archivo'], 'rb') as archivo:
+                lineas, errores = leer_reposicion(archivo, options['archivo'])
+            if errores:
+                raise ValueError('; '.join(errores))
+            resumen = reponer_stock(lineas, evento_id=options['evento'])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Reposición registrada: {resumen['lineas']} líneas, {resumen['unidades']} unidades "
+            f"de {resumen['productos']} productos, egresos por ${resumen['total']}."
+        ))
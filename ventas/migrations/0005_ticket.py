@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:29
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0004_totales_desnormalizados'),
+        ('ventas', '0004_alter_producto_options_remove_venta_precio_compra_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Ticket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('medio_de_pago', models.CharField(choices=[('Efectivo', 'Efectivo'), ('Mercado Pago', 'Mercado Pago')], default='Efectivo', max_length=20)),
+                ('fecha_hora', models.DateTimeField(auto_now_add=True)),
+                ('total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text='Total bruto del ticket', max_digits=12)),
+                ('evento', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='eventos.evento')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='venta',
+            name='ticket',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='ventas', to='ventas.ticket'),
+        ),
+    ]
@@ -0,0 +1,97 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:32
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import F, Sum, Count, DecimalField, ExpressionWrapper
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def reconstruir(apps, schema_editor):
+    """Llena las tablas de resumen recién creadas a partir de las ventas existentes."""
+    Venta = apps.get_model('ventas', 'Venta')
+    ResumenDiario = apps.get_model('ventas', 'ResumenDiario')
+    ResumenEventoProducto = apps.get_model('ventas', 'ResumenEventoProducto')
+    importe = DecimalField(max_digits=12, decimal_places=2)
+    totales = dict(
+        ventas=Count('id'),
+        unidades=Sum('cantidad'),
+        bruto=Sum(ExpressionWrapper(F('cantidad') * F('precio_unitario_venta'), output_field=importe)),
+        neto=Sum(ExpressionWrapper(
+            F('cantidad') * (F('precio_unitario_venta') - F('precio_unitario_compra')), output_field=importe
+        )),
+    )
+
+    def importes(r):
+        return dict(
+            cantidad_ventas=r['ventas'], total_unidades=r['unidades'] or 0,
+            total_bruto=r['bruto'] or Decimal('0.00'), total_neto=r['neto'] or Decimal('0.00'),
+        )
+
+    diarios = (
+        Venta.objects.order_by()
+        .annotate(dia=TruncDate('fecha_hora', tzinfo=timezone.get_current_timezone()))
+        .values('dia', 'producto_id', 'medio_de_pago')
+        .annotate(**totales)
+    )
+    ResumenDiario.objects.bulk_create([
+        ResumenDiario(fecha=r['dia'], producto_id=r['producto_id'], medio_de_pago=r['medio_de_pago'], **importes(r))
+        for r in diarios.iterator()
+    ], batch_size=500)
+
+    por_evento = (
+        Venta.objects.filter(evento__isnull=False).order_by()
+        .values('evento_id', 'producto_id', 'medio_de_pago')
+        .annotate(**totales)
+    )
+    ResumenEventoProducto.objects.bulk_create([
+        ResumenEventoProducto(
+            evento_id=r['evento_id'], producto_id=r['producto_id'], medio_de_pago=r['medio_de_pago'], **importes(r),
+        )
+        for r in por_evento.iterator()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('eventos', '0004_totales_desnormalizados'),
+        ('ventas', '0005_ticket'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('medio_de_pago', models.CharField(choices=[('Efectivo', 'Efectivo'), ('Mercado Pago', 'Mercado Pago')], max_length=20)),
+                ('cantidad_ventas', models.IntegerField(default=0)),
+                ('total_unidades', models.IntegerField(default=0)),
+                ('total_bruto', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('total_neto', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_diarios', to='ventas.producto')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'producto', 'medio_de_pago'), name='resumen_diario_unico')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenEventoProducto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('medio_de_pago', models.CharField(choices=[('Efectivo', 'Efectivo'), ('Mercado Pago', 'Mercado Pago')], max_length=20)),
+                ('cantidad_ventas', models.IntegerField(default=0)),
+                ('total_unidades', models.IntegerField(default=0)),
+                ('total_bruto', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('total_neto', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('evento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes', to='eventos.evento')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_evento', to='ventas.producto')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('evento', 'producto', 'medio_de_pago'), name='resumen_evento_producto_unico')],
+            },
+        ),
+        migrations.RunPython(reconstruir, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0008_indices_listados'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='clave',
+            field=models.CharField(blank=True, editable=False, help_text='Clave de idempotencia generada por la terminal (evita duplicar reintentos)', max_length=64, null=True, unique=True),
+        ),
+    ]
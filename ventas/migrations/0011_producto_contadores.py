@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:11
+
+import django.db.models.expressions
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def reconstruir(apps, schema_editor):
+    """Completa total_vendido y total_ventas de los productos existentes con un único UPDATE."""
+    Producto = apps.get_model('ventas', 'Producto')
+    Venta = apps.get_model('ventas', 'Venta')
+    ventas = Venta.objects.filter(producto=OuterRef('pk')).order_by().values('producto')
+    Producto.objects.update(
+        total_vendido=Coalesce(Subquery(ventas.annotate(suma=Sum('cantidad')).values('suma')), 0),
+        total_ventas=Coalesce(Subquery(ventas.annotate(cuenta=Count('id')).values('cuenta')), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0010_producto_stock_no_negativo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='total_vendido',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Unidades vendidas'),
+        ),
+        migrations.AddField(
+            model_name='producto',
+            name='total_ventas',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Cantidad de ventas'),
+        ),
+        migrations.AddField(
+            model_name='producto',
+            name='valor_inventario',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(models.F('stock'), '*', models.F('precio_compra')), output_field=models.DecimalField(decimal_places=2, max_digits=14)),
+        ),
+        migrations.RunPython(reconstruir, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0011_producto_contadores'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='cambiostock',
+            name='producto',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='ventas.producto'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from decimal import Decimal
 from django.db import models, transaction
+from django.utils import timezone
 from django.core.exceptions import ObjectDoesNotExist
 from eventos.models import Evento
 from tesoreria.models import Movimiento
@@ -27,12 +28,30 @@ class Producto(models.Model):
         validators=[MinValueValidator(0)]
     )
     activo = models.BooleanField(default=True, help_text="¿El producto está disponible?")
+    # Contadores de ventas mantenidos por diferencia (ventas.servicios y panel.signals);
+    # `manage.py reconstruir_resumenes` los recalcula desde cero
+    total_vendido = models.PositiveIntegerField(default=0, editable=False, help_text="Unidades vendidas")
+    total_ventas = models.PositiveIntegerField(default=0, editable=False, help_text="Cantidad de ventas")
+    # Lo calcula la base en cada escritura del producto: los totales de inventario son un SUM
+    valor_inventario = models.GeneratedField(
+        expression=models.F('stock') * models.F('precio_compra'),
+        output_field=models.DecimalField(max_digits=14, decimal_places=2),
+        db_persist=True,
+    )
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     fecha_actualizacion = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['nombre']
         verbose_name_plural = "Productos"
+        indexes = [
+            # Parcial: SQLite no usa un índice sobre `activo` para el filtro booleano que genera Django
+            models.Index(fields=['nombre'], condition=models.Q(activo=True), name='producto_activo_nombre_idx'),
+        ]
+        constraints = [
+            # Respaldo en la base de los descuentos condicionales de stock (ventas.servicios.descontar_stock)
+            models.CheckConstraint(condition=models.Q(stock__gte=0), name='producto_stock_no_negativo'),
+        ]
 
     def __str__(self):
         return self.nombre
@@ -49,17 +68,20 @@ class Producto(models.Model):
         """Ganancia por unidad vendida"""
         return self.precio_venta - self.precio_compra
 
-    @property
-    def valor_inventario(self):
-        """Valor total del inventario de este producto"""
-        return self.stock * self.precio_compra
+    def guardar_campos(self, campos):
+        """
+        Guarda sólo `campos` (y la fecha de actualización). Un save() completo escribiría
+        también el stock y los contadores leídos antes, pisando los UPDATE por diferencia
+        de las ventas que se registraron mientras tanto.
+        """
+        self.save(update_fields=[*campos, 'fecha_actualizacion'])
 
     def actualizar_stock(self, cantidad):
         """Actualiza el stock de forma segura"""
         self.stock += cantidad
         if self.stock < 0:
             self.stock = 0
-        self.save()
+        self.guardar_campos(['stock'])
 
     def hay_stock_suficiente(self, cantidad):
         """Verifica si hay stock suficiente"""
@@ -83,12 +105,23 @@ class Venta(models.Model):
     producto = models.ForeignKey(Producto, on_delete=models.CASCADE)
     cantidad = models.PositiveIntegerField(default=1)
     medio_de_pago = models.CharField(max_length=20, choices=MEDIO_PAGO_CHOICES, default='Efectivo')
-    fecha_hora = models.DateTimeField(auto_now_add=True)
+    # Por defecto el momento del alta; una venta sincronizada desde una terminal trae la suya
+    fecha_hora = models.DateTimeField(default=timezone.now, editable=False)
     evento = models.ForeignKey(Evento, on_delete=models.SET_NULL, null=True, blank=True)
+    ticket = models.ForeignKey('Ticket', on_delete=models.CASCADE, null=True, blank=True, related_name='ventas')
 
     precio_unitario_venta = models.DecimalField(max_digits=10, decimal_places=2, editable=False, null=True, blank=True)
     precio_unitario_compra = models.DecimalField(max_digits=10, decimal_places=2, editable=False, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Historial / dashboard: orden por fecha y filtros por evento o medio de pago + rango de fechas
+            models.Index(fields=['fecha_hora'], name='venta_fecha_idx'),
+            models.Index(fields=['evento', 'fecha_hora'], name='venta_evento_fecha_idx'),
+            models.Index(fields=['medio_de_pago', 'fecha_hora'], name='venta_medio_fecha_idx'),
+            models.Index(fields=['precio_unitario_venta'], name='venta_precio_idx'),
+        ]
+
     def __str__(self):
         return f"{self.producto.nombre} - {self.cantidad}u ({self.medio_de_pago})"
 
@@ -116,3 +149,72 @@ class Venta(models.Model):
             self.precio_unitario_venta = self.producto.precio_venta
             self.precio_unitario_compra = self.producto.precio_compra
         super().save(*args, **kwargs)
+
+
+class Ticket(models.Model):
+    """Cabecera que agrupa las líneas (ventas) cobradas juntas en una misma operación."""
+    medio_de_pago = models.CharField(max_length=20, choices=Venta.MEDIO_PAGO_CHOICES, default='Efectivo')
+    # Por defecto el momento del alta; un ticket sincronizado desde una terminal trae el suyo
+    fecha_hora = models.DateTimeField(default=timezone.now, editable=False)
+    evento = models.ForeignKey(Evento, on_delete=models.SET_NULL, null=True, blank=True)
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'), help_text="Total bruto del ticket")
+    clave = models.CharField(
+        max_length=64, unique=True, null=True, blank=True, editable=False,
+        help_text="Clave de idempotencia generada por la terminal (evita duplicar reintentos)"
+    )
+
+    def __str__(self):
+        return f"Ticket #{self.pk} - ${self.total} ({self.medio_de_pago})"
+
+
+class CambioStock(models.Model):
+    """
+    Registro append-only de productos cuyo stock o estado cambió.
+    Su id autoincremental funciona como versión monotónica del stock.
+    """
+    # Sin cascada ni restricción: borrar un producto no puede quitar filas del feed (la
+    # versión volvería atrás y SQLite reutilizaría sus ids); la baja se registra como un cambio más
+    producto = models.ForeignKey(Producto, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    fecha = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"v{self.pk} - producto {self.producto_id}"
+
+
+# ----- tablas de resumen (rollups) mantenidas en cada escritura de ventas -----
+class ResumenDiario(models.Model):
+    """Ventas acumuladas por día, producto y medio de pago."""
+    fecha = models.DateField()
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='resumenes_diarios')
+    medio_de_pago = models.CharField(max_length=20, choices=Venta.MEDIO_PAGO_CHOICES)
+    cantidad_ventas = models.IntegerField(default=0)
+    total_unidades = models.IntegerField(default=0)
+    total_bruto = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    total_neto = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'producto', 'medio_de_pago'], name='resumen_diario_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} - {self.producto_id} ({self.medio_de_pago})"
+
+
+class ResumenEventoProducto(models.Model):
+    """Ventas acumuladas por evento, producto y medio de pago."""
+    evento = models.ForeignKey(Evento, on_delete=models.CASCADE, related_name='resumenes')
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='resumenes_evento')
+    medio_de_pago = models.CharField(max_length=20, choices=Venta.MEDIO_PAGO_CHOICES)
+    cantidad_ventas = models.IntegerField(default=0)
+    total_unidades = models.IntegerField(default=0)
+    total_bruto = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    total_neto = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['evento', 'producto', 'medio_de_pago'], name='resumen_evento_producto_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.evento_id} - {self.producto_id} ({self.medio_de_pago})"
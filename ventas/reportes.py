@@ -0,0 +1,123 @@
+"""
+Consultas de reportes sobre ventas resueltas en la base de datos.
+
+Todas las funciones reciben un queryset de Venta (ya filtrado por la vista) y
+devuelven agregados calculados con expresiones SQL sobre los precios unitarios
+guardados en cada venta, sin recorrer las filas en Python.
+"""
+from decimal import Decimal
+from django.db.models import F, Q, Sum, Count, Avg, Max, DecimalField, ExpressionWrapper, Value
+from django.db.models.functions import Coalesce
+
+IMPORTE = DecimalField(max_digits=12, decimal_places=2)
+
+# cantidad * precio_unitario_venta
+IMPORTE_BRUTO = ExpressionWrapper(F('cantidad') * F('precio_unitario_venta'), output_field=IMPORTE)
+
+# cantidad * (precio_unitario_venta - precio_unitario_compra)
+IMPORTE_NETO = ExpressionWrapper(
+    F('cantidad') * (F('precio_unitario_venta') - F('precio_unitario_compra')), output_field=IMPORTE
+)
+
+CERO = Value(Decimal('0.00'), output_field=IMPORTE)
+
+
+def _suma(expresion, **kwargs):
+    return Coalesce(Sum(expresion, **kwargs), CERO)
+
+
+def totales_ventas(ventas):
+    """
+    Totales generales del queryset en una sola consulta:
+    bruto, neto, efectivo, mercado_pago, ventas, unidades y promedio de unidades por venta.
+    """
+    return ventas.order_by().aggregate(
+        bruto=_suma(IMPORTE_BRUTO),
+        neto=_suma(IMPORTE_NETO),
+        efectivo=_suma(IMPORTE_BRUTO, filter=Q(medio_de_pago='Efectivo')),
+        mercado_pago=_suma(IMPORTE_BRUTO, filter=Q(medio_de_pago='Mercado Pago')),
+        ventas=Count('id'),
+        unidades=Coalesce(Sum('cantidad'), 0),
+        promedio_unidades=Avg('cantidad'),
+    )
+
+
+def totales_por_evento(ventas):
+    """Bruto, neto y cantidad de ventas agrupados por evento (ordenado por bruto descendente)."""
+    return (
+        ventas.order_by()
+        .values('evento_id', 'evento__nombre')
+        .annotate(bruto=_suma(IMPORTE_BRUTO), neto=_suma(IMPORTE_NETO), ventas=Count('id'))
+        .order_by('-bruto')
+    )
+
+
+def totales_por_producto(ventas):
+    """Unidades, bruto, neto y precios unitarios agrupados por producto (ordenado por unidades)."""
+    return (
+        ventas.order_by()
+        .values('producto_id', 'producto__nombre')
+        .annotate(
+            unidades=Sum('cantidad'),
+            bruto=_suma(IMPORTE_BRUTO),
+            neto=_suma(IMPORTE_NETO),
+            precio_venta=Max('precio_unitario_venta'),
+            precio_compra=Max('precio_unitario_compra'),
+        )
+        .order_by('-unidades', 'producto__nombre')
+    )
+
+
+def totales_por_medio(ventas):
+    """Cantidad de ventas y bruto agrupados por medio de pago."""
+    return (
+        ventas.order_by()
+        .values('medio_de_pago')
+        .annotate(ventas=Count('id'), bruto=_suma(IMPORTE_BRUTO))
+        .order_by('medio_de_pago')
+    )
+
+
+# ----- mismas agregaciones leyendo de las tablas de resumen -----
+def totales_resumen(resumenes):
+    """Equivalente a `totales_ventas` sobre un queryset de ResumenDiario o ResumenEventoProducto."""
+    totales = resumenes.order_by().aggregate(
+        bruto=_suma('total_bruto'),
+        neto=_suma('total_neto'),
+        efectivo=_suma('total_bruto', filter=Q(medio_de_pago='Efectivo')),
+        mercado_pago=_suma('total_bruto', filter=Q(medio_de_pago='Mercado Pago')),
+        ventas=Coalesce(Sum('cantidad_ventas'), 0),
+        unidades=Coalesce(Sum('total_unidades'), 0),
+    )
+    totales['promedio_unidades'] = totales['unidades'] / totales['ventas'] if totales['ventas'] else None
+    return totales
+
+
+def resumen_por_evento(resumenes):
+    """Equivalente a `totales_por_evento` sobre un queryset de ResumenEventoProducto."""
+    return (
+        resumenes.order_by()
+        .values('evento_id', 'evento__nombre')
+        .annotate(bruto=_suma('total_bruto'), neto=_suma('total_neto'), ventas=Sum('cantidad_ventas'))
+        .order_by('-bruto')
+    )
+
+
+def resumen_por_producto(resumenes):
+    """Unidades, bruto y neto por producto sobre un queryset de resumen (ordenado por unidades)."""
+    return (
+        resumenes.order_by()
+        .values('producto_id', 'producto__nombre')
+        .annotate(unidades=Sum('total_unidades'), bruto=_suma('total_bruto'), neto=_suma('total_neto'))
+        .order_by('-unidades', 'producto__nombre')
+    )
+
+
+def resumen_por_medio(resumenes):
+    """Equivalente a `totales_por_medio` sobre un queryset de resumen."""
+    return (
+        resumenes.order_by()
+        .values('medio_de_pago')
+        .annotate(ventas=Sum('cantidad_ventas'), bruto=_suma('total_bruto'))
+        .order_by('medio_de_pago')
+    )
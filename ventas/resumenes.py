@@ -0,0 +1,143 @@
+"""
+Mantenimiento de las tablas de resumen de ventas (ResumenDiario y ResumenEventoProducto).
+
+Cada escritura de ventas suma (o resta) su aporte a las filas de resumen
+correspondientes con un par de consultas por tabla, sin importar cuántas
+ventas haya en la historia. `reconstruir_resumenes` las recalcula desde cero;
+`reconstruir_contadores` hace lo mismo con los contadores de ventas de cada producto.
+"""
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Sum, Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from ventas.models import Producto, ResumenDiario, ResumenEventoProducto, Venta
+from ventas.reportes import IMPORTE_BRUTO, IMPORTE_NETO
+
+
+def _claves_venta(venta):
+    """Claves de las filas de resumen a las que aporta una venta."""
+    fecha = timezone.localdate(venta.fecha_hora) if venta.fecha_hora else timezone.localdate()
+    # Los ids pueden llegar como texto (p. ej. evento_id tomado de request.POST): se normalizan
+    # para que coincidan con las claves leídas de la base
+    producto_id = int(venta.producto_id)
+    diario = (fecha, producto_id, venta.medio_de_pago)
+    evento = (int(venta.evento_id), producto_id, venta.medio_de_pago) if venta.evento_id else None
+    return diario, evento
+
+
+def _acumular_tabla(modelo, campos, deltas):
+    """
+    Aplica `deltas` ({clave: [ventas, unidades, bruto, neto]}) sobre `modelo`.
+    Las filas existentes se actualizan con un único UPDATE de expresiones F y las
+    faltantes se crean en lote.
+    """
+    deltas = {k: d for k, d in deltas.items() if any(d)}
+    if not deltas:
+        return
+
+    filtro = Q()
+    for clave in deltas:
+        filtro |= Q(**dict(zip(campos, clave)))
+    existentes = {
+        tuple(fila[c] for c in campos): fila['pk']
+        for fila in modelo.objects.filter(filtro).values('pk', *campos)
+    }
+
+    actualizar, crear = [], []
+    for clave, (ventas, unidades, bruto, neto) in deltas.items():
+        if clave in existentes:
+            actualizar.append(modelo(
+                pk=existentes[clave],
+                cantidad_ventas=F('cantidad_ventas') + ventas,
+                total_unidades=F('total_unidades') + unidades,
+                total_bruto=F('total_bruto') + bruto,
+                total_neto=F('total_neto') + neto,
+            ))
+        else:
+            crear.append(modelo(
+                **dict(zip(campos, clave)),
+                cantidad_ventas=ventas, total_unidades=unidades, total_bruto=bruto, total_neto=neto,
+            ))
+
+    if actualizar:
+        modelo.objects.bulk_update(actualizar, ['cantidad_ventas', 'total_unidades', 'total_bruto', 'total_neto'])
+    if crear:
+        modelo.objects.bulk_create(crear)
+    if any(d[0] < 0 for d in deltas.values()):
+        modelo.objects.filter(filtro, cantidad_ventas__lte=0).delete()
+
+
+def acumular_ventas(ventas, signo=1):
+    """Suma (signo=1) o resta (signo=-1) el aporte de `ventas` a las tablas de resumen."""
+    diarios, por_evento = {}, {}
+    for venta in ventas:
+        aporte = (signo, signo * venta.cantidad, signo * venta.total(), signo * venta.ganancia())
+        clave_diaria, clave_evento = _claves_venta(venta)
+        destinos = [(diarios, clave_diaria)] + ([(por_evento, clave_evento)] if clave_evento else [])
+        for acumulado, clave in destinos:
+            actual = acumulado.setdefault(clave, [0, 0, Decimal('0.00'), Decimal('0.00')])
+            for i, valor in enumerate(aporte):
+                actual[i] += valor
+
+    for intento in range(2):
+        try:
+            with transaction.atomic():
+                _acumular_tabla(ResumenDiario, ('fecha', 'producto_id', 'medio_de_pago'), diarios)
+                _acumular_tabla(ResumenEventoProducto, ('evento_id', 'producto_id', 'medio_de_pago'), por_evento)
+            return
+        except IntegrityError:
+            # Otra terminal creó la misma fila entre la lectura y el INSERT: reintentar como UPDATE
+            if intento:
+                raise
+
+
+def reconstruir_resumenes():
+    """Recalcula desde cero ambas tablas de resumen a partir de las ventas."""
+    totales = dict(ventas=Count('id'), unidades=Sum('cantidad'), bruto=Sum(IMPORTE_BRUTO), neto=Sum(IMPORTE_NETO))
+
+    with transaction.atomic():
+        ResumenDiario.objects.all().delete()
+        ResumenEventoProducto.objects.all().delete()
+
+        diarios = (
+            Venta.objects.order_by()
+            .annotate(dia=TruncDate('fecha_hora', tzinfo=timezone.get_current_timezone()))
+            .values('dia', 'producto_id', 'medio_de_pago')
+            .annotate(**totales)
+        )
+        ResumenDiario.objects.bulk_create([
+            ResumenDiario(
+                fecha=r['dia'], producto_id=r['producto_id'], medio_de_pago=r['medio_de_pago'],
+                cantidad_ventas=r['ventas'], total_unidades=r['unidades'] or 0,
+                total_bruto=r['bruto'] or Decimal('0.00'), total_neto=r['neto'] or Decimal('0.00'),
+            )
+            for r in diarios.iterator()
+        ], batch_size=500)
+
+        por_evento = (
+            Venta.objects.filter(evento__isnull=False).order_by()
+            .values('evento_id', 'producto_id', 'medio_de_pago')
+            .annotate(**totales)
+        )
+        ResumenEventoProducto.objects.bulk_create([
+            ResumenEventoProducto(
+                evento_id=r['evento_id'], producto_id=r['producto_id'], medio_de_pago=r['medio_de_pago'],
+                cantidad_ventas=r['ventas'], total_unidades=r['unidades'] or 0,
+                total_bruto=r['bruto'] or Decimal('0.00'), total_neto=r['neto'] or Decimal('0.00'),
+            )
+            for r in por_evento.iterator()
+        ], batch_size=500)
+
+
+def reconstruir_contadores():
+    """
+    Recalcula total_vendido y total_ventas de todos los productos con un único UPDATE.
+    Devuelve la cantidad de productos actualizados.
+    """
+    ventas = Venta.objects.filter(producto=OuterRef('pk')).order_by().values('producto')
+    return Producto.objects.update(
+        total_vendido=Coalesce(Subquery(ventas.annotate(suma=Sum('cantidad')).values('suma')), 0),
+        total_ventas=Coalesce(Subquery(ventas.annotate(cuenta=Count('id')).values('cuenta')), 0),
+    )
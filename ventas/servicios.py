@@ -0,0 +1,370 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from eventos.models import Evento
+from tesoreria.models import Movimiento
+from tesoreria.cierres import ajustar_cierres
+from tesoreria.libro import asentar, insertar
+from ventas.models import Producto, Venta, Ticket
+from ventas.resumenes import acumular_ventas
+from ventas.stock import registrar_cambios
+from panel.cache_reportes import invalidar, VENTAS, MOVIMIENTOS, PRODUCTOS, EVENTOS
+from panel.base_datos import reintentar_si_bloqueada
+from panel.busqueda import indexar_movimientos
+
+
+# Adelanto del reloj de una terminal que se acepta (la venta queda con la hora del servidor)
+TOLERANCIA_RELOJ_TERMINAL = timedelta(minutes=5)
+
+# Antigüedad máxima de una venta encolada sin conexión
+ANTIGUEDAD_MAXIMA_SINCRONIZACION = timedelta(days=7)
+
+
+class TicketDuplicado(Exception):
+    """La clave de idempotencia ya corresponde a un ticket registrado (reintento de una terminal)."""
+
+    def __init__(self, ticket):
+        super().__init__(f'El ticket con clave {ticket.clave} ya fue registrado (#{ticket.pk})')
+        self.ticket = ticket
+
+
+def descontar_stock(cantidades):
+    """
+    Descuenta stock con un UPDATE condicional por producto
+    (`SET stock = stock - n WHERE id = ? AND activo AND stock >= n`), en orden de id.
+    El mismo UPDATE suma la venta a los contadores del producto (total_vendido, total_ventas):
+    cada producto de `cantidades` es una venta.
+
+    No hay lectura previa ni bloqueo: la condición del UPDATE es la validación y la
+    cantidad de filas afectadas indica si alcanzó el stock. Debe ejecutarse dentro de
+    una transacción; si algún producto no pudo descontarse lanza ValueError y el
+    rollback deshace los demás.
+
+    Devuelve {producto_id: producto} leídos después del descuento (stock ya actualizado).
+    """
+    fallidos = [
+        producto_id
+        for producto_id in sorted(cantidades)
+        if not Producto.objects.filter(pk=producto_id, activo=True, stock__gte=cantidades[producto_id]).update(
+            stock=F('stock') - cantidades[producto_id],
+            total_vendido=F('total_vendido') + cantidades[producto_id],
+            total_ventas=F('total_ventas') + 1,
+        )
+    ]
+    productos = Producto.objects.in_bulk(list(cantidades))
+
+    if fallidos:
+        errores = []
+        for producto_id in fallidos:
+            producto = productos.get(producto_id)
+            if producto is None:
+                errores.append(f'Producto {producto_id} no encontrado')
+            elif not producto.activo:
+                errores.append(f'{producto.nombre}: el producto no está activo')
+            else:
+                errores.append(
+                    f'{producto.nombre}: stock insuficiente. '
+                    f'Disponible: {producto.stock}, Solicitado: {cantidades[producto_id]}'
+                )
+        raise ValueError('; '.join(errores))
+
+    registrar_cambios(productos.keys())
+    return productos
+
+
+def fecha_de_terminal(fecha_hora):
+    """
+    Valida la fecha de venta que informa una terminal para un ticket encolado sin
+    conexión. Un adelanto de reloj dentro de TOLERANCIA_RELOJ_TERMINAL se toma como
+    el momento actual. Lanza ValueError si es futura o más vieja que
+    ANTIGUEDAD_MAXIMA_SINCRONIZACION.
+    """
+    ahora = timezone.now()
+    if fecha_hora > ahora + TOLERANCIA_RELOJ_TERMINAL:
+        raise ValueError('La fecha de la venta es posterior al momento actual')
+    if fecha_hora < ahora - ANTIGUEDAD_MAXIMA_SINCRONIZACION:
+        raise ValueError(f'La venta tiene más de {ANTIGUEDAD_MAXIMA_SINCRONIZACION.days} días sin sincronizar')
+    return min(fecha_hora, ahora)
+
+
+def _registrar_ventas(cantidades, medio_de_pago, evento_id, con_ticket=False, clave=None, fecha_hora=None):
+    """
+    Camino de escritura común a las ventas sueltas y a los tickets (dentro de una transacción).
+
+    Descuenta el stock (y suma los contadores de ventas de cada producto), escribe las
+    ventas y sus movimientos en lote (indexados para la búsqueda) y actualiza los totales
+    del evento y las tablas de resumen. Las escrituras en lote no disparan
+    las signals de Venta, por eso acá se replica lo que ellas hacen.
+
+    `fecha_hora` es la de una venta hecha antes (sincronizada desde una terminal); sin
+    ella las ventas quedan con el momento actual.
+
+    Devuelve (ticket o None, ventas, stock_restante) con stock_restante {producto_id: stock}.
+    """
+    productos = descontar_stock(cantidades)
+    momento = fecha_hora or timezone.now()
+
+    ventas = [
+        Venta(
+            producto=productos[producto_id],
+            fecha_hora=momento,
+            cantidad=cantidad,
+            medio_de_pago=medio_de_pago,
+            evento_id=evento_id,
+            precio_unitario_venta=productos[producto_id].precio_venta,
+            precio_unitario_compra=productos[producto_id].precio_compra,
+        )
+        for producto_id, cantidad in cantidades.items()
+    ]
+    bruto = sum((v.total() for v in ventas), Decimal('0.00'))
+    neto = sum((v.ganancia() for v in ventas), Decimal('0.00'))
+
+    ticket = None
+    if con_ticket:
+        ticket = Ticket.objects.create(
+            medio_de_pago=medio_de_pago, evento_id=evento_id, total=bruto, clave=clave, fecha_hora=momento,
+        )
+        for venta in ventas:
+            venta.ticket = ticket
+    ventas = Venta.objects.bulk_create(ventas)
+
+    movimientos = [
+        Movimiento(
+            tipo='Ingreso',
+            descripcion=f'Venta de {v.producto.nombre} (venta_id={v.pk})',
+            monto=v.total(),
+            fecha=momento,
+            evento_id=evento_id,
+            venta=v,
+        )
+        for v in ventas
+    ]
+    if fecha_hora is None:
+        movimientos = Movimiento.objects.bulk_create(asentar(movimientos))
+    else:
+        # Con fecha pasada no van al final del libro: cada uno se asienta en su posición
+        # y se suma a los cierres de gestión posteriores, como harían las signals
+        movimientos = Movimiento.objects.bulk_create(movimientos)
+        for movimiento in movimientos:
+            insertar(movimiento)
+            ajustar_cierres(movimiento)
+    indexar_movimientos(movimientos)
+
+    Evento.aplicar_delta(evento_id, bruto, neto, len(ventas), sum(cantidades.values()))
+    acumular_ventas(ventas)
+    # Las escrituras en lote no disparan signals: se invalidan los reportes a mano
+    invalidar(VENTAS, MOVIMIENTOS, PRODUCTOS, EVENTOS)
+
+    return ticket, ventas, {producto_id: p.stock for producto_id, p in productos.items()}
+
+
+@reintentar_si_bloqueada
+def registrar_venta(producto_id, cantidad, medio_de_pago='Efectivo', evento_id=None):
+    """
+    Registra la venta de un solo producto.
+
+    Devuelve (venta, stock_restante). Lanza ValueError si la cantidad es inválida,
+    el producto no existe o no está activo, o no hay stock suficiente.
+    """
+    producto_id, cantidad = int(producto_id), int(cantidad)
+    if cantidad <= 0:
+        raise ValueError('La cantidad debe ser mayor a 0')
+
+    with transaction.atomic():
+        _, ventas, stock_restante = _registrar_ventas({producto_id: cantidad}, medio_de_pago, evento_id)
+    return ventas[0], stock_restante[producto_id]
+
+
+@reintentar_si_bloqueada
+def registrar_ticket(lineas, medio_de_pago='Efectivo', evento_id=None, clave=None, fecha_hora=None):
+    """
+    Registra un ticket con varias líneas en una única transacción.
+
+    `lineas` es un iterable de pares (producto_id, cantidad); las líneas repetidas
+    del mismo producto se agrupan. El stock de cada producto se descuenta con un
+    UPDATE condicional (ver `descontar_stock`) y luego ventas y movimientos se
+    escriben en lote.
+
+    `clave` es la clave de idempotencia generada por la terminal: si ya existe un
+    ticket con esa clave no se registra nada y se lanza TicketDuplicado.
+    `fecha_hora` es la de un ticket cobrado antes (ver `fecha_de_terminal`).
+
+    Devuelve (ticket, ventas, stock_restante) donde stock_restante es {producto_id: stock}.
+    Lanza ValueError si alguna línea es inválida o no hay stock suficiente.
+    """
+    cantidades = {}
+    for producto_id, cantidad in lineas:
+        producto_id, cantidad = int(producto_id), int(cantidad)
+        if cantidad <= 0:
+            raise ValueError('La cantidad debe ser mayor a 0')
+        cantidades[producto_id] = cantidades.get(producto_id, 0) + cantidad
+
+    if not cantidades:
+        raise ValueError('El ticket no tiene productos')
+    if fecha_hora is not None:
+        fecha_hora = fecha_de_terminal(fecha_hora)
+
+    if clave:
+        existente = Ticket.objects.filter(clave=clave).first()
+        if existente:
+            raise TicketDuplicado(existente)
+
+    try:
+        with transaction.atomic():
+            ticket, ventas, stock_restante = _registrar_ventas(
+                cantidades, medio_de_pago, evento_id, con_ticket=True, clave=clave, fecha_hora=fecha_hora,
+            )
+    except IntegrityError:
+        # Otra petición con la misma clave ganó la carrera: el índice único rechazó este ticket
+        existente = Ticket.objects.filter(clave=clave).first() if clave else None
+        if existente is None:
+            raise
+        raise TicketDuplicado(existente)
+
+    return ticket, ventas, stock_restante
+
+
+@reintentar_si_bloqueada
+def sincronizar_tickets(tickets):
+    """
+    Registra en una sola transacción un lote de tickets encolados por una terminal sin conexión.
+
+    Cada ticket es un dict con clave, lineas [(producto_id, cantidad)], medio_de_pago, evento_id
+    y fecha_hora (el momento en que se cobró en la terminal, o None si no la informó).
+    Cada uno se registra en su propio savepoint: uno rechazado (sin stock, producto
+    inactivo) no impide el resto. Las claves ya registradas se informan como
+    duplicadas sin volver a escribir nada, así el lote puede reenviarse completo.
+
+    Devuelve una lista con {clave, estado, ticket_id | error} en el orden recibido,
+    donde estado es 'registrado', 'duplicado' o 'rechazado'.
+    """
+    resultados = []
+    with transaction.atomic():
+        registrados = dict(
+            Ticket.objects.filter(clave__in=[t['clave'] for t in tickets]).values_list('clave', 'pk')
+        )
+        for datos in tickets:
+            clave = datos['clave']
+            if clave in registrados:
+                resultados.append({'clave': clave, 'estado': 'duplicado', 'ticket_id': registrados[clave]})
+                continue
+            try:
+                ticket, _, _ = registrar_ticket(
+                    datos['lineas'], datos['medio_de_pago'], datos['evento_id'], clave=clave,
+                    fecha_hora=datos.get('fecha_hora'),
+                )
+            except TicketDuplicado as e:
+                resultados.append({'clave': clave, 'estado': 'duplicado', 'ticket_id': e.ticket.pk})
+            except ValueError as e:
+                resultados.append({'clave': clave, 'estado': 'rechazado', 'error': str(e)})
+            else:
+                registrados[clave] = ticket.pk
+                resultados.append({'clave': clave, 'estado': 'registrado', 'ticket_id': ticket.pk})
+    return resultados
+
+
+# Filas por sentencia en las escrituras en lote de una reposición
+TAMANIO_LOTE_REPOSICION = 500
+
+
+@reintentar_si_bloqueada
+def reponer_stock(lineas, evento_id=None):
+    """
+    Registra una compra de mercadería: suma stock y asienta los egresos, en una sola transacción.
+
+    `lineas` es un iterable de (producto, cantidad, precio_compra) donde producto es
+    el id (int) o el nombre exacto, y precio_compra puede ser None para usar el
+    precio de compra actual. Cada línea genera un Egreso; el stock de todos los
+    productos se incrementa con un único UPDATE (CASE con F('stock') + n).
+
+    El precio de compra de un producto con precio en la reposición se reemplaza por
+    ese precio: no se promedia con el costo del stock que ya había. Los productos sin
+    precio en ninguna línea no escriben precio_compra. Todas las líneas con precio de
+    un mismo producto tienen que coincidir.
+
+    Es todo o nada: si alguna línea es inválida lanza ValueError con todos los errores.
+    Devuelve un resumen {lineas, productos, unidades, total}.
+    """
+    lineas = list(lineas)
+    if not lineas:
+        raise ValueError('La reposición no tiene líneas')
+
+    ids = {ref for ref, _, _ in lineas if isinstance(ref, int)}
+    nombres = {ref for ref, _, _ in lineas if not isinstance(ref, int)}
+
+    with transaction.atomic():
+        encontrados = list(Producto.objects.filter(Q(pk__in=ids) | Q(nombre__in=nombres)))
+        por_id = {p.pk: p for p in encontrados}
+        por_nombre = {}
+        for producto in encontrados:
+            por_nombre.setdefault(producto.nombre, []).append(producto)
+
+        # precios: precio de compra nuevo y línea que lo dio, sólo de los productos con precio
+        errores, compras, cantidades, precios = [], [], {}, {}
+        for numero, (ref, cantidad, precio_compra) in enumerate(lineas, start=1):
+            if isinstance(ref, int):
+                candidatos = [por_id[ref]] if ref in por_id else []
+            else:
+                candidatos = por_nombre.get(ref, [])
+            if len(candidatos) != 1:
+                motivo = 'no encontrado' if not candidatos else 'nombre ambiguo, use el id'
+                errores.append(f'Línea {numero}: producto {ref!r} {motivo}')
+                continue
+            producto = candidatos[0]
+            precio = producto.precio_compra if precio_compra is None else precio_compra
+            if cantidad <= 0:
+                errores.append(f'Línea {numero}: la cantidad debe ser mayor a 0')
+            elif precio < 0:
+                errores.append(f'Línea {numero}: el precio de compra no puede ser negativo')
+            elif precio_compra is not None and precios.get(producto.pk, (precio,))[0] != precio:
+                errores.append(
+                    f'Línea {numero}: precio de compra distinto al de la línea {precios[producto.pk][1]} '
+                    f'para {producto.nombre!r}'
+                )
+            else:
+                compras.append((producto, cantidad, precio))
+                cantidades[producto.pk] = cantidades.get(producto.pk, 0) + cantidad
+                if precio_compra is not None:
+                    precios.setdefault(producto.pk, (precio, numero))
+        if errores:
+            raise ValueError('; '.join(errores))
+
+        ahora = timezone.now()
+        con_precio, sin_precio = [], []
+        for producto_id, cantidad in cantidades.items():
+            producto = por_id[producto_id]
+            producto.stock = F('stock') + cantidad
+            producto.fecha_actualizacion = ahora
+            if producto_id in precios:
+                producto.precio_compra = precios[producto_id][0]
+                con_precio.append(producto)
+            else:
+                sin_precio.append(producto)
+        # bulk_update escribe los mismos campos en todas las filas: sin precio, precio_compra no se toca
+        Producto.objects.bulk_update(
+            con_precio, ['stock', 'precio_compra', 'fecha_actualizacion'], batch_size=TAMANIO_LOTE_REPOSICION,
+        )
+        Producto.objects.bulk_update(sin_precio, ['stock', 'fecha_actualizacion'], batch_size=TAMANIO_LOTE_REPOSICION)
+        registrar_cambios(cantidades.keys())
+
+        indexar_movimientos(Movimiento.objects.bulk_create(asentar([
+            Movimiento(
+                tipo='Egreso',
+                descripcion=f'Compra de stock: {cantidad} x {producto.nombre}',
+                monto=(cantidad * precio).quantize(Decimal('0.01')),
+                evento_id=evento_id,
+            )
+            for producto, cantidad, precio in compras
+        ]), batch_size=TAMANIO_LOTE_REPOSICION))
+
+        # Las escrituras en lote no disparan signals: se invalidan los reportes a mano
+        invalidar(MOVIMIENTOS, PRODUCTOS)
+
+    return {
+        'lineas': len(compras),
+        'productos': len(cantidades),
+        'unidades': sum(cantidades.values()),
+        'total': sum((cantidad * precio for _, cantidad, precio in compras), Decimal('0.00')),
+    }
@@ -0,0 +1,115 @@
+"""
+Feed de cambios de stock para las terminales de venta.
+
+Cada escritura que modifica el stock (o el estado) de productos agrega filas a
+CambioStock; el id más alto es la versión actual. Las terminales piden sólo los
+productos cambiados desde la versión que ya tienen y pueden quedarse esperando
+(long-poll / Server-Sent Events) hasta que aparezca un cambio.
+
+Mientras esperan, todas las terminales de un proceso comparten una sola lectura
+de la versión por INTERVALO_VERIFICACION (`version_reciente`), no una cada una.
+"""
+import asyncio
+import threading
+import time
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from ventas.models import CambioStock, Producto
+
+# Cada cuántos segundos se revisa la base mientras se espera (cubre cambios hechos por otros procesos)
+INTERVALO_VERIFICACION = 1.0
+
+# Filas del feed que se conservan; una terminal más atrasada recibe el catálogo completo
+CAMBIOS_RETENIDOS = 10000
+
+_condicion = threading.Condition()
+
+# Última versión leída en este proceso y cuándo (monotonic); None obliga a leerla otra vez
+_reciente = {'version': 0, 'leida': None}
+_lectura = threading.Lock()
+
+
+def _olvidar_version():
+    _reciente['leida'] = None
+
+
+def _notificar():
+    _olvidar_version()
+    with _condicion:
+        _condicion.notify_all()
+
+
+def registrar_cambios(producto_ids):
+    """Agrega al feed los productos modificados y despierta a las terminales al confirmar la transacción."""
+    producto_ids = sorted(set(producto_ids))
+    if not producto_ids:
+        return
+    cambios = CambioStock.objects.bulk_create([CambioStock(producto_id=pid) for pid in producto_ids])
+    ultimo = cambios[-1].pk
+    if ultimo and ultimo % 1000 < len(cambios):
+        # Poda ocasional: las versiones viejas sólo sirven a terminales muy atrasadas
+        CambioStock.objects.filter(pk__lte=ultimo - CAMBIOS_RETENIDOS).delete()
+    _olvidar_version()
+    transaction.on_commit(_notificar)
+
+
+def version_actual():
+    return CambioStock.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+
+def version_reciente():
+    """
+    La versión actual, leída de la base a lo sumo una vez por INTERVALO_VERIFICACION
+    en todo el proceso. Un cambio confirmado en este proceso se ve al instante; uno de
+    otro proceso, con hasta un intervalo de demora.
+    """
+    with _lectura:
+        leida = _reciente['leida']
+        if leida is None or time.monotonic() - leida >= INTERVALO_VERIFICACION:
+            _reciente['version'] = version_actual()
+            _reciente['leida'] = time.monotonic()
+        return _reciente['version']
+
+
+def cambios_desde(version):
+    """
+    Devuelve (version, productos, completo). Si `version` es None o ya fue podada
+    se devuelve el catálogo completo; si no, sólo los productos cambiados después de ella.
+    """
+    actual = version_actual()
+    productos = Producto.objects.order_by('pk')
+
+    completo = version is None
+    if not completo:
+        primero = CambioStock.objects.order_by('pk').values_list('pk', flat=True).first()
+        completo = primero is not None and version < primero - 1
+    if not completo:
+        if version >= actual:
+            return actual, [], False
+        cambiados = CambioStock.objects.filter(pk__gt=version, pk__lte=actual).values('producto_id')
+        productos = productos.filter(pk__in=cambiados)
+
+    return actual, list(productos.values('id', 'stock', 'activo')), completo
+
+
+def esperar_cambios(version, timeout):
+    """Bloquea hasta que la versión supere `version` o pase `timeout` segundos; devuelve la versión actual."""
+    limite = time.monotonic() + timeout
+    while True:
+        actual = version_reciente()
+        restante = limite - time.monotonic()
+        if actual > version or restante <= 0:
+            return actual
+        with _condicion:
+            _condicion.wait(min(restante, INTERVALO_VERIFICACION))
+
+
+async def esperar_cambios_async(version, timeout):
+    """Como `esperar_cambios`, pero sin ocupar un hilo mientras espera (vistas ASGI)."""
+    limite = time.monotonic() + timeout
+    while True:
+        actual = await sync_to_async(version_reciente)()
+        restante = limite - time.monotonic()
+        if actual > version or restante <= 0:
+            return actual
+        await asyncio.sleep(min(restante, INTERVALO_VERIFICACION))